@@ -0,0 +1,47 @@
+"""balance transactions rollup
+
+Revision ID: 5a1c2e7f9b30
+Revises: 4ed8aed199b1, d3b10997a1f2
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a1c2e7f9b30'
+# после схемы, где создаётся balance_transactions; пустой корень d3b10997a1f2
+# вливается сюда же, чтобы голова у цепочки была одна
+down_revision: Union[str, Sequence[str], None] = ('4ed8aed199b1', 'd3b10997a1f2')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'balance_transactions',
+        sa.Column('entries_count', sa.Integer(), server_default='1', nullable=False),
+    )
+    op.add_column(
+        'balance_transactions',
+        sa.Column('period_date', sa.Date(), nullable=True),
+    )
+    op.create_index(
+        'uq_balance_transactions_rollup',
+        'balance_transactions',
+        ['user_id', 'type', 'period_date'],
+        unique=True,
+        postgresql_where=sa.text('period_date IS NOT NULL'),
+        sqlite_where=sa.text('period_date IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_balance_transactions_rollup', table_name='balance_transactions')
+    op.drop_column('balance_transactions', 'period_date')
+    op.drop_column('balance_transactions', 'entries_count')
@@ -0,0 +1,194 @@
+"""partition balance transactions by month
+
+Revision ID: 7c4e1b9d2a60
+Revises: 5a1c2e7f9b30
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from datetime import date, datetime, time
+from typing import Sequence, Union
+from zoneinfo import ZoneInfo
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e1b9d2a60'
+down_revision: Union[str, Sequence[str], None] = '5a1c2e7f9b30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MOSCOW_TZ = ZoneInfo('Europe/Moscow')
+# сколько секций создать наперёд; дальше их заводит LedgerMaintenance
+PARTITIONS_AHEAD = 2
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_month_partition(month: date) -> None:
+    start = datetime.combine(month, time.min, tzinfo=MOSCOW_TZ)
+    end = datetime.combine(_add_months(month, 1), time.min, tzinfo=MOSCOW_TZ)
+    op.execute(
+        f"CREATE TABLE balance_transactions_p{month:%Y%m} "
+        f"PARTITION OF balance_transactions "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def _create_archive_table() -> None:
+    op.create_table('balance_transactions_archive',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('type', postgresql.ENUM('GAME_CLICK', 'REFERRAL', 'SHOP_PURCHASE', 'ADMIN_ADJUST', 'AMOCRM_BONUS', 'OTHER', name='transaction_type', create_type=False), nullable=False),
+    sa.Column('period_month', sa.Date(), nullable=False),
+    sa.Column('credit_sum', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('debit_sum', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('entries_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'type', 'period_month')
+    )
+
+
+def _create_indexes() -> None:
+    op.create_index(
+        'uq_balance_transactions_rollup',
+        'balance_transactions',
+        ['user_id', 'type', 'period_date', 'created_at'],
+        unique=True,
+        postgresql_where=sa.text('period_date IS NOT NULL'),
+        sqlite_where=sa.text('period_date IS NOT NULL'),
+    )
+    op.create_index(
+        'ix_balance_transactions_user_type_created',
+        'balance_transactions',
+        ['user_id', 'type', 'created_at'],
+        unique=False,
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _create_archive_table()
+
+    if op.get_bind().dialect.name != 'postgresql':
+        # без секций: только новые индексы
+        op.drop_index('uq_balance_transactions_rollup', table_name='balance_transactions')
+        op.drop_index('ix_balance_transactions_user_id', table_name='balance_transactions')
+        _create_indexes()
+        return
+
+    # Старую таблицу переименовываем, создаём секционированную с тем же
+    # именем и переносим строки. Первичный ключ секционированной таблицы
+    # обязан включать ключ секционирования — (id, created_at).
+    op.execute('ALTER TABLE balance_transactions RENAME TO balance_transactions_old')
+    op.execute(
+        'ALTER TABLE balance_transactions_old '
+        'RENAME CONSTRAINT balance_transactions_pkey TO balance_transactions_old_pkey'
+    )
+    op.execute('DROP INDEX uq_balance_transactions_rollup')
+    op.execute('DROP INDEX ix_balance_transactions_user_id')
+    op.execute('ALTER SEQUENCE balance_transactions_id_seq OWNED BY NONE')
+
+    op.execute(
+        """
+        CREATE TABLE balance_transactions (
+            id integer NOT NULL DEFAULT nextval('balance_transactions_id_seq'),
+            user_id integer NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            delta integer NOT NULL,
+            resulting_balance integer NOT NULL,
+            type transaction_type NOT NULL,
+            description varchar(512),
+            entries_count integer NOT NULL DEFAULT 1,
+            period_date date,
+            created_at timestamp with time zone NOT NULL,
+            CONSTRAINT balance_transactions_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute(
+        'CREATE TABLE balance_transactions_default '
+        'PARTITION OF balance_transactions DEFAULT'
+    )
+
+    oldest = op.get_bind().execute(
+        sa.text('SELECT min(created_at) FROM balance_transactions_old')
+    ).scalar()
+    current = datetime.now(MOSCOW_TZ).date().replace(day=1)
+    month = oldest.astimezone(MOSCOW_TZ).date().replace(day=1) if oldest else current
+    while month <= _add_months(current, PARTITIONS_AHEAD):
+        _create_month_partition(month)
+        month = _add_months(month, 1)
+
+    # у агрегированных строк created_at — начало московского дня period_date
+    op.execute(
+        """
+        INSERT INTO balance_transactions (
+            id, user_id, delta, resulting_balance, type, description,
+            entries_count, period_date, created_at
+        )
+        SELECT
+            id, user_id, delta, resulting_balance, type, description,
+            entries_count, period_date,
+            CASE
+                WHEN period_date IS NOT NULL
+                THEN period_date::timestamp AT TIME ZONE 'Europe/Moscow'
+                ELSE created_at
+            END
+        FROM balance_transactions_old
+        """
+    )
+    op.execute('DROP TABLE balance_transactions_old')
+    op.execute('ALTER SEQUENCE balance_transactions_id_seq OWNED BY balance_transactions.id')
+
+    # индексы на родителе создаются в каждой секции, в том числе в будущих
+    _create_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # архивные месяцы обратно в журнал не разворачиваются
+    op.drop_table('balance_transactions_archive')
+
+    op.drop_index('ix_balance_transactions_user_type_created', table_name='balance_transactions')
+    op.drop_index('uq_balance_transactions_rollup', table_name='balance_transactions')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE balance_transactions RENAME TO balance_transactions_partitioned')
+        op.execute(
+            'ALTER TABLE balance_transactions_partitioned '
+            'RENAME CONSTRAINT balance_transactions_pkey TO balance_transactions_partitioned_pkey'
+        )
+        op.execute('ALTER SEQUENCE balance_transactions_id_seq OWNED BY NONE')
+        op.execute(
+            """
+            CREATE TABLE balance_transactions (
+                id integer NOT NULL DEFAULT nextval('balance_transactions_id_seq'),
+                user_id integer NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+                delta integer NOT NULL,
+                resulting_balance integer NOT NULL,
+                type transaction_type NOT NULL,
+                description varchar(512),
+                entries_count integer NOT NULL DEFAULT 1,
+                period_date date,
+                created_at timestamp with time zone NOT NULL,
+                CONSTRAINT balance_transactions_pkey PRIMARY KEY (id)
+            )
+            """
+        )
+        op.execute('INSERT INTO balance_transactions SELECT * FROM balance_transactions_partitioned')
+        op.execute('DROP TABLE balance_transactions_partitioned')
+        op.execute('ALTER SEQUENCE balance_transactions_id_seq OWNED BY balance_transactions.id')
+
+    op.create_index(op.f('ix_balance_transactions_user_id'), 'balance_transactions', ['user_id'], unique=False)
+    op.create_index(
+        'uq_balance_transactions_rollup',
+        'balance_transactions',
+        ['user_id', 'type', 'period_date'],
+        unique=True,
+        postgresql_where=sa.text('period_date IS NOT NULL'),
+        sqlite_where=sa.text('period_date IS NOT NULL'),
+    )
@@ -0,0 +1,43 @@
+"""ledger checkpoints
+
+Revision ID: 9e2f6a4c8b13
+Revises: 7c4e1b9d2a60
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2f6a4c8b13'
+down_revision: Union[str, Sequence[str], None] = '7c4e1b9d2a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ledger_checkpoints',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_tx_id', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('ledger_sum', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('drift', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('checked_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(
+        'ix_balance_transactions_user_id_id',
+        'balance_transactions',
+        ['user_id', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_balance_transactions_user_id_id', table_name='balance_transactions')
+    op.drop_table('ledger_checkpoints')
@@ -0,0 +1,53 @@
+"""balance history covering indexes
+
+Revision ID: b8f3d0e6c275
+Revises: 9e2f6a4c8b13
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f3d0e6c275'
+down_revision: Union[str, Sequence[str], None] = '9e2f6a4c8b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# колонки, которые отдаёт история проводок, сверх ключа индекса
+HISTORY_INCLUDE = [
+    'type',
+    'delta',
+    'resulting_balance',
+    'description',
+    'entries_count',
+    'period_date',
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # один индекс на историю: фильтр по типу проверяется по INCLUDE-колонке,
+    # отдельный (user_id, type, created_at) больше не нужен
+    op.drop_index('ix_balance_transactions_user_type_created', table_name='balance_transactions')
+    op.create_index(
+        'ix_balance_transactions_user_created_id',
+        'balance_transactions',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+        postgresql_include=HISTORY_INCLUDE,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_balance_transactions_user_created_id', table_name='balance_transactions')
+    op.create_index(
+        'ix_balance_transactions_user_type_created',
+        'balance_transactions',
+        ['user_id', 'type', 'created_at'],
+        unique=False,
+    )
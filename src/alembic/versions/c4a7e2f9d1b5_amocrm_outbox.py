@@ -0,0 +1,47 @@
+"""amocrm outbox
+
+Revision ID: c4a7e2f9d1b5
+Revises: b8f3d0e6c275
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7e2f9d1b5'
+down_revision: Union[str, Sequence[str], None] = 'b8f3d0e6c275'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('amocrm_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.Enum('ORDER_CREATED', name='amo_outbox_kind'), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'SENT', 'DEAD', name='amo_outbox_status'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_amocrm_outbox_order_id'), 'amocrm_outbox', ['order_id'], unique=False)
+    op.create_index('ix_amocrm_outbox_status_next_attempt', 'amocrm_outbox', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_amocrm_outbox_status_next_attempt', table_name='amocrm_outbox')
+    op.drop_index(op.f('ix_amocrm_outbox_order_id'), table_name='amocrm_outbox')
+    op.drop_table('amocrm_outbox')
+    sa.Enum(name='amo_outbox_status').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='amo_outbox_kind').drop(op.get_bind(), checkfirst=True)
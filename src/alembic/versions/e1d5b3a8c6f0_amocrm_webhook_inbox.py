@@ -0,0 +1,43 @@
+"""amocrm webhook inbox
+
+Revision ID: e1d5b3a8c6f0
+Revises: c4a7e2f9d1b5
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1d5b3a8c6f0'
+down_revision: Union[str, Sequence[str], None] = 'c4a7e2f9d1b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('amocrm_webhook_inbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('amocrm_event_id', sa.String(length=255), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'DONE', 'FAILED', name='amo_webhook_status'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('received_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('amocrm_event_id', name='uq_amocrm_webhook_inbox_amocrm_event_id')
+    )
+    op.create_index('ix_amocrm_webhook_inbox_status_next_attempt', 'amocrm_webhook_inbox', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_amocrm_webhook_inbox_status_next_attempt', table_name='amocrm_webhook_inbox')
+    op.drop_table('amocrm_webhook_inbox')
+    sa.Enum(name='amo_webhook_status').drop(op.get_bind(), checkfirst=True)
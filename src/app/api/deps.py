@@ -1,62 +1,210 @@
 # src/app/api/deps.py
 from __future__ import annotations
 
-from fastapi import Depends, Header, HTTPException, status, Request
+from typing import Any
+
+from fastapi import Depends, Header, HTTPException, Response, status, Request
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.app.core.config import settings
+from src.app.core.security import (
+  InvalidInitDataError,
+  InvalidSessionTokenError,
+  decode_session_token,
+  issue_session_token,
+  verify_init_data,
+)
 from src.app.db.session import get_db
 from src.app.models.user_models import User, UserRole
 from src.app.repositories.user_repo import UserRepository
-from src.app.services.referral_service import ReferralService
+from src.app.services.activity_tracker import activity_tracker
+from src.app.services.identity_cache import UserIdentity, identity_cache
 
 
 async def get_current_user(
   request: Request,
   db: AsyncSession = Depends(get_db),
   telegram_id: int | None = Header(default=None, alias="X-Telegram-Id"),
+  response: Response = None,  # type: ignore[assignment]
 ) -> User:
   """
-  Простейшая аутентификация по Telegram ID из заголовка X-Telegram-Id.
-  В бою сюда можно прикрутить валидацию initData.
+  Аутентификация запроса mini-app (см. _authenticate) с загрузкой
+  полной строки пользователя.
   """
-  if telegram_id is None:
+  identity, user = await _authenticate(request, db, telegram_id, response)
+  if user is None:
+    user = await db.get(User, identity.id)
+    if user is None:
+      raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="User not found",
+      )
+  identity_cache.put(UserIdentity.from_user(user))
+  return user
+
+
+async def get_current_identity(
+  request: Request,
+  db: AsyncSession = Depends(get_db),
+  telegram_id: int | None = Header(default=None, alias="X-Telegram-Id"),
+  response: Response = None,  # type: ignore[assignment]
+) -> UserIdentity:
+  """
+  То же, что get_current_user, но возвращает лёгкий снимок пользователя.
+  С сессионным токеном или при попадании в IdentityCache к БД не обращаемся
+  вовсе (сессия из get_db не берёт соединение, пока по ней не выполнен запрос).
+  """
+  identity, _ = await _authenticate(request, db, telegram_id, response)
+  return identity
+
+
+async def get_verified_identity(
+  request: Request,
+  db: AsyncSession = Depends(get_db),
+  response: Response = None,  # type: ignore[assignment]
+) -> UserIdentity:
+  """
+  То же, что get_current_identity, но только по сессионному токену или
+  проверенному initData: старый заголовок X-Telegram-Id не принимается
+  даже при включённой auth_allow_telegram_id_header.
+  """
+  identity, _ = await _authenticate(
+    request, db, None, response, allow_telegram_id_header=False
+  )
+  return identity
+
+
+async def require_admin(
+  identity: UserIdentity = Depends(get_verified_identity),
+  db: AsyncSession = Depends(get_db),
+) -> UserIdentity:
+  """
+  Пускает только администраторов (роль ADMIN), подтверждённых подписью.
+  Роль читается из БД на каждый запрос, а не из токена или IdentityCache:
+  снятый с роли админ теряет доступ сразу, а не через TTL.
+  """
+  role = await db.scalar(select(User.role).where(User.id == identity.id))
+  if role != UserRole.ADMIN:
+    raise HTTPException(
+      status_code=status.HTTP_403_FORBIDDEN,
+      detail="Admin role is required",
+    )
+  return identity
+
+
+async def _authenticate(
+  request: Request,
+  db: AsyncSession,
+  telegram_id: int | None,
+  response: Response | None,
+  allow_telegram_id_header: bool = True,
+) -> tuple[UserIdentity, User | None]:
+  """
+  Порядок проверки:
+  1. Authorization: Bearer <token> — сессионный токен, выданный нами;
+     проверяется только подписью, без запроса к БД.
+  2. X-Telegram-Init-Data — initData Telegram WebApp, подпись проверяется
+     токеном бота; в ответ кладём свежий токен в заголовок X-Session-Token.
+  3. X-Telegram-Id — старая схема без проверки, если разрешена настройкой
+     auth_allow_telegram_id_header и вызывающим (allow_telegram_id_header).
+  Вторым элементом возвращается User, если его пришлось загрузить.
+  """
+  authorization = request.headers.get("Authorization", "")
+  scheme, _, token = authorization.partition(" ")
+  if scheme.lower() == "bearer" and token:
+    try:
+      identity = identity_from_token(token)
+    except InvalidSessionTokenError as exc:
+      raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=str(exc),
+      ) from None
+    activity_tracker.touch_app(identity.id)
+    return identity, None
+
+  init_data = request.headers.get("X-Telegram-Init-Data")
+  if init_data:
+    try:
+      tg_user = verify_init_data(init_data)["user"]
+    except InvalidInitDataError as exc:
+      raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=str(exc),
+      ) from None
+
+    user = await resolve_telegram_user(request, db, int(tg_user["id"]), tg_user)
+    identity = UserIdentity.from_user(user)
+    if response is not None:
+      response.headers["X-Session-Token"] = issue_session_token(
+        identity.to_claims()
+      )
+    return identity, user
+
+  if not (allow_telegram_id_header and settings.auth_allow_telegram_id_header):
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
-      detail="X-Telegram-Id header is required",
+      detail="Session token or Telegram initData is required",
     )
 
-  user_repo = UserRepository(db)
-  user = await user_repo.get_by_telegram_id(telegram_id)
+  if telegram_id is not None:
+    identity = identity_cache.get(telegram_id)
+    if identity is not None:
+      activity_tracker.touch_app(identity.id)
+      return identity, None
 
-  # --- пробуем достать реферальный код из заголовка ---
-  referral_code = request.headers.get("X-Referral-Code")
+  user = await resolve_telegram_user(request, db, telegram_id)
+  identity = UserIdentity.from_user(user)
+  identity_cache.put(identity)
+  return identity, user
 
-  if user is None:
-    # по умолчанию — родитель
-    role = UserRole.PARENT
-    referrer_id: int | None = None
-
-    # если пришёл реферальный код — пробуем найти пригласившего
-    if referral_code:
-      ref_service = ReferralService(db)
-      referrer = await ref_service.get_user_by_referral(referral_code)
-      if referrer:
-        role = UserRole.CHILD
-        referrer_id = referrer.id
-
-    # создаём пользователя ОДИН раз, сразу с нужной ролью и referrer_id
-    user = User(
-      telegram_id=telegram_id,
-      role=role,
-      referrer_id=referrer_id,
+
+def identity_from_token(token: str) -> UserIdentity:
+  """Снимок пользователя из сессионного токена; InvalidSessionTokenError, если токен плохой."""
+  try:
+    return UserIdentity.from_claims(decode_session_token(token))
+  except (KeyError, ValueError):
+    raise InvalidSessionTokenError("Malformed session token") from None
+
+
+async def resolve_telegram_user(
+  request: Request,
+  db: AsyncSession,
+  telegram_id: int | None,
+  tg_user: dict[str, Any] | None = None,
+) -> User:
+  """
+  Находит пользователя по telegram_id или создаёт его (с учётом
+  X-Referral-Code и, если есть, данных из проверенного initData).
+  """
+  if telegram_id is None:
+    raise HTTPException(
+      status_code=status.HTTP_401_UNAUTHORIZED,
+      detail="X-Telegram-Id header is required",
     )
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
 
-  # считаем взаимодействие c Mini App
-  await user_repo.touch_app_activity(user)
+  # по умолчанию — родитель; из проверенного initData сразу знаем имя и аватар
+  defaults: dict[str, Any] = {"role": UserRole.PARENT}
+  if tg_user:
+    defaults.update(
+      username=tg_user.get("username"),
+      first_name=tg_user.get("first_name"),
+      last_name=tg_user.get("last_name"),
+      photo_url=tg_user.get("photo_url"),
+    )
+
+  # создаём или получаем пользователя одним запросом; если пришёл
+  # реферальный код и пригласивший найден — новый пользователь будет
+  # ребёнком с referrer_id (у существующих роль не меняется)
+  user = await UserRepository(db).get_or_create(
+    telegram_id,
+    defaults=defaults,
+    referral_code=request.headers.get("X-Referral-Code"),
+  )
   await db.commit()
 
+  # считаем взаимодействие c Mini App (запись в БД — пачкой, в фоне)
+  activity_tracker.touch_app(user.id)
+
   return user
 
@@ -0,0 +1,152 @@
+# src/app/api/routes/admin_router.py
+from __future__ import annotations
+
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.api.deps import require_admin
+from src.app.db.session import get_db
+from src.app.models.amocrm_models import AmoOutboxStatus
+from src.app.repositories.amocrm_outbox_repo import AmoOutboxRepository
+from src.app.schemas.admin_schemas import (
+  AmoOutboxEntryResponse,
+  AmoOutboxRequeueRequest,
+  AmoOutboxRequeueResponse,
+  AmoOutboxStatsResponse,
+  BonusAwardRequest,
+  BonusAwardResponse,
+  ReconciliationReportResponse,
+  UserDriftResponse,
+)
+from src.app.services.amocrm_outbox import amocrm_outbox_dispatcher
+from src.app.services.bonus_award_service import (
+  BonusAward,
+  BonusAwardService,
+  parse_awards_csv,
+)
+from src.app.services.ledger_reconciler import ReconciliationReport, ledger_reconciler
+
+router = APIRouter(
+  prefix="/api/admin",
+  tags=["Admin"],
+  dependencies=[Depends(require_admin)],
+)
+
+
+def _report_response(report: ReconciliationReport) -> ReconciliationReportResponse:
+  data = asdict(report)
+  data["drifts"] = [
+    UserDriftResponse(
+      user_id=item.user_id,
+      balance=item.balance,
+      ledger=item.ledger,
+      drift=item.drift,
+    )
+    for item in report.drifts
+  ]
+  return ReconciliationReportResponse(**data)
+
+
+@router.get("/ledger/reconciliation", response_model=ReconciliationReportResponse)
+async def get_last_reconciliation() -> ReconciliationReportResponse:
+  """Отчёт последней сверки балансов с журналом."""
+  report = ledger_reconciler.last_report
+  if report is None:
+    raise HTTPException(
+      status_code=status.HTTP_404_NOT_FOUND,
+      detail="Reconciliation has not run yet",
+    )
+  return _report_response(report)
+
+
+@router.post("/ledger/reconciliation", response_model=ReconciliationReportResponse)
+async def run_reconciliation(repair: bool = False) -> ReconciliationReportResponse:
+  """
+  Запускает сверку сейчас. С repair=true расхождения исправляются:
+  баланс приводится к сумме журнала.
+  """
+  report = await ledger_reconciler.run(repair=repair)
+  return _report_response(report)
+
+
+@router.post("/bonuses", response_model=BonusAwardResponse)
+async def award_bonuses(payload: BonusAwardRequest) -> BonusAwardResponse:
+  """
+  Массовое начисление (или списание) бонусов. Применяется пачками:
+  пачка проходит целиком или откатывается целиком (см. BonusAwardService).
+  """
+  try:
+    if payload.csv is not None:
+      awards = parse_awards_csv(payload.csv)
+    else:
+      awards = [
+        BonusAward(
+          telegram_id=item.telegram_id,
+          delta=item.delta,
+          description=item.description,
+        )
+        for item in payload.awards or []
+      ]
+    result = await BonusAwardService().award(
+      awards,
+      tx_type=payload.type,
+      allow_negative=payload.allow_negative,
+    )
+  except ValueError as exc:
+    raise HTTPException(
+      status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+      detail=str(exc),
+    ) from None
+
+  return BonusAwardResponse(
+    total=result.total,
+    applied=result.applied,
+    unknown_telegram_ids=result.unknown_telegram_ids,
+    failed_count=len(result.failed),
+    applied_rows=result.applied_rows,
+    failed_rows=result.failed_rows,
+    errors=result.errors,
+  )
+
+
+@router.get("/amocrm/outbox", response_model=AmoOutboxStatsResponse)
+async def get_amocrm_outbox(
+  db: AsyncSession = Depends(get_db),
+) -> AmoOutboxStatsResponse:
+  """Состояние очереди отправки заказов в AmoCRM и последние DEAD-строки."""
+  repo = AmoOutboxRepository(db)
+  counts = await repo.count_by_status()
+  dead = await repo.list_dead()
+  return AmoOutboxStatsResponse(
+    pending=counts[AmoOutboxStatus.PENDING],
+    sent=counts[AmoOutboxStatus.SENT],
+    dead=counts[AmoOutboxStatus.DEAD],
+    dead_entries=[
+      AmoOutboxEntryResponse(
+        id=entry.id,
+        order_id=entry.order_id,
+        attempts=entry.attempts,
+        last_error=entry.last_error,
+        created_at=entry.created_at,
+      )
+      for entry in dead
+    ],
+  )
+
+
+@router.post("/amocrm/outbox/requeue", response_model=AmoOutboxRequeueResponse)
+async def requeue_amocrm_outbox(
+  payload: AmoOutboxRequeueRequest,
+  db: AsyncSession = Depends(get_db),
+) -> AmoOutboxRequeueResponse:
+  """Возвращает DEAD-строки outbox в очередь (все или перечисленные)."""
+  requeued = await AmoOutboxRepository(db).requeue_dead(
+    datetime.now(timezone.utc), ids=payload.ids
+  )
+  await db.commit()
+  if requeued:
+    amocrm_outbox_dispatcher.notify()
+  return AmoOutboxRequeueResponse(requeued=requeued)
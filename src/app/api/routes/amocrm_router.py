@@ -3,12 +3,12 @@ from __future__ import annotations
 import json
 import os
 import time
+from datetime import datetime, timezone
 from typing import Any
 
 import httpx
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     HTTPException,
     Query,
@@ -19,7 +19,7 @@ from pydantic import ValidationError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.app.services.amocrm_client import AmoCRMClient
+from src.app.services.amocrm_client import AmoCRMClient, get_amocrm_client
 from src.app.core.logger import get_logger
 from src.app.db.session import get_db
 from src.app.models import User
@@ -30,8 +30,10 @@ from src.app.models.shop_models import (
     PaymentMethod,
     Product,
 )
+from src.app.repositories.amocrm_webhook_inbox_repo import AmoWebhookInboxRepository
 from src.app.schemas.amocrm_schemas import TransactionWebhook, WebhookResponse
 from src.app.services.amocrm_service import AmoCRMService
+from src.app.services.amocrm_webhook_inbox import amocrm_webhook_workers
 
 logger = get_logger(__name__)
 
@@ -41,8 +43,11 @@ router = APIRouter(
 )
 
 
-def get_amocrm_service(db: AsyncSession = Depends(get_db)) -> AmoCRMService:
-    return AmoCRMService(db)
+def get_amocrm_service(
+    db: AsyncSession = Depends(get_db),
+    client: AmoCRMClient = Depends(get_amocrm_client),
+) -> AmoCRMService:
+    return AmoCRMService(db, client=client)
 
 
 def _get_amocrm_oauth_config() -> tuple[str, str, str, str]:
@@ -66,18 +71,21 @@ def _get_amocrm_oauth_config() -> tuple[str, str, str, str]:
 
 
 @router.get("/oauth/start")
-async def amocrm_oauth_start():
-    client = AmoCRMClient()
+async def amocrm_oauth_start(
+    client: AmoCRMClient = Depends(get_amocrm_client),
+):
     url = client.build_authorization_url()
     return {"auth_url": url}
 
 
 @router.get("/oauth/callback")
-async def amocrm_oauth_callback(code: str | None = None):
+async def amocrm_oauth_callback(
+    code: str | None = None,
+    client: AmoCRMClient = Depends(get_amocrm_client),
+):
     if not code:
         raise HTTPException(400, "Missing code")
 
-    client = AmoCRMClient()
     token = await client.exchange_code_for_tokens(code)
     return {
         "access_token": token.access_token,
@@ -89,9 +97,13 @@ async def amocrm_oauth_callback(code: str | None = None):
 @router.post("/webhooks/transaction", response_model=WebhookResponse)
 async def receive_transaction_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
-    service: AmoCRMService = Depends(get_amocrm_service),
+    db: AsyncSession = Depends(get_db),
 ) -> WebhookResponse:
+    """
+    Вебхук только дописывается в inbox (один INSERT ... ON CONFLICT DO
+    NOTHING) — разбирают его воркеры AmoCRMWebhookWorkers в своих сессиях,
+    так что ответ AmoCRM уходит сразу, а событие переживает рестарт.
+    """
     raw_body: bytes | None = None
 
     try:
@@ -128,20 +140,29 @@ async def receive_transaction_webhook(
         )
 
     try:
-        background_tasks.add_task(service.handle_transaction_webhook, webhook)
-        return WebhookResponse(
-            status="ok",
-            message="Webhook accepted for processing",
+        inserted = await AmoWebhookInboxRepository(db).append(
+            webhook.event_id, payload, datetime.now(timezone.utc)
         )
-    except HTTPException:
-        raise
+        await db.commit()
     except Exception as e:
-        logger.error("Ошибка при обработке вебхука транзакции: %s", e, exc_info=True)
+        logger.error("Ошибка при сохранении вебхука транзакции: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process transaction webhook",
         )
 
+    if not inserted:
+        return WebhookResponse(
+            status="ok",
+            message="Webhook already received",
+        )
+
+    amocrm_webhook_workers.notify()
+    return WebhookResponse(
+        status="ok",
+        message="Webhook accepted for processing",
+    )
+
 
 @router.post("/orders/{order_id}/send", response_model=WebhookResponse)
 async def send_order_to_amocrm_endpoint(
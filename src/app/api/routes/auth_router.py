@@ -0,0 +1,49 @@
+# src/app/api/routes/auth_router.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.api.deps import resolve_telegram_user
+from src.app.core.config import settings
+from src.app.core.security import (
+    InvalidInitDataError,
+    issue_session_token,
+    verify_init_data,
+)
+from src.app.db.session import get_db
+from src.app.schemas.miniapp_schemas import SessionRequest, SessionResponse
+from src.app.services.identity_cache import UserIdentity, identity_cache
+
+router = APIRouter(prefix="/api/auth", tags=["Auth"])
+
+
+@router.post("/session", response_model=SessionResponse)
+async def create_session(
+    payload: SessionRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+) -> SessionResponse:
+    """
+    Обмен initData Telegram WebApp на сессионный токен.
+    Дальше клиент шлёт Authorization: Bearer <token> (в WebSocket — ?token=<token>),
+    и пользователь определяется по подписи токена без запроса к БД.
+    """
+    try:
+        tg_user = verify_init_data(payload.init_data)["user"]
+    except InvalidInitDataError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(exc),
+        ) from None
+
+    user = await resolve_telegram_user(request, db, int(tg_user["id"]), tg_user)
+    identity = UserIdentity.from_user(user)
+    identity_cache.put(identity)
+
+    return SessionResponse(
+        token=issue_session_token(identity.to_claims()),
+        expires_in=settings.session_token_ttl_seconds,
+        user_id=identity.id,
+        role=identity.role.value,
+    )
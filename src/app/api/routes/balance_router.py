@@ -0,0 +1,83 @@
+# src/app/api/routes/balance_router.py
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.api.deps import get_current_identity
+from src.app.db.session import get_db
+from src.app.models.balance_models import BalanceTransaction, TransactionType
+from src.app.repositories.balance_repo import BalanceRepository
+from src.app.schemas.miniapp_schemas import (
+  BalanceTransactionItem,
+  BalanceTransactionsPage,
+)
+from src.app.services.identity_cache import UserIdentity
+
+router = APIRouter(prefix="/api/balance", tags=["Balance"])
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(tx: BalanceTransaction) -> str:
+  raw = json.dumps([tx.created_at.isoformat(), tx.id]).encode()
+  return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    created_at, tx_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(tx_id)
+  except (ValueError, TypeError):
+    raise HTTPException(
+      status_code=status.HTTP_400_BAD_REQUEST,
+      detail="Invalid cursor",
+    ) from None
+
+
+@router.get("/transactions", response_model=BalanceTransactionsPage)
+async def list_transactions(
+  cursor: str | None = None,
+  limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+  tx_type: list[TransactionType] | None = Query(default=None, alias="type"),
+  db: AsyncSession = Depends(get_db),
+  identity: UserIdentity = Depends(get_current_identity),
+) -> BalanceTransactionsPage:
+  """
+  История бонусов текущего пользователя, новые сверху.
+  Пагинация курсором: next_cursor из ответа передаётся в ?cursor=.
+  Фильтр по типу: ?type=referral&type=shop_purchase.
+  """
+  before = decode_cursor(cursor) if cursor else None
+
+  # одна лишняя строка — чтобы понять, есть ли следующая страница
+  rows = await BalanceRepository(db).list_transactions(
+    identity.id,
+    limit=limit + 1,
+    types=tx_type,
+    before=before,
+  )
+  has_more = len(rows) > limit
+  rows = rows[:limit]
+
+  return BalanceTransactionsPage(
+    items=[
+      BalanceTransactionItem(
+        id=tx.id,
+        delta=tx.delta,
+        resulting_balance=tx.resulting_balance,
+        type=tx.type.value,
+        description=tx.description,
+        entries_count=tx.entries_count,
+        period_date=tx.period_date,
+        created_at=tx.created_at,
+      )
+      for tx in rows
+    ],
+    next_cursor=encode_cursor(rows[-1]) if has_more else None,
+  )
@@ -1,10 +1,6 @@
 # src/app/api/routes/game_router.py
 from __future__ import annotations
 
-from datetime import date, datetime
-from zoneinfo import ZoneInfo
-from src.app.core.constants import MAX_DAILY_ENERGY, MOSCOW_TZ
-
 from fastapi import (
     APIRouter,
     Depends,
@@ -13,27 +9,33 @@ from fastapi import (
     WebSocketDisconnect,
     status,
 )
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.app.api.deps import get_current_user
-from src.app.db.session import get_db
-from src.app.models.balance_models import TransactionType
-from src.app.models.game_models import GameStats
-from src.app.models.user_models import User, UserRole
-from src.app.repositories.balance_repo import BalanceRepository
+from src.app.api.deps import get_current_identity, identity_from_token
+from src.app.core.config import settings
+from src.app.core.constants import (
+    MAX_CLICKS_PER_SECOND,
+    MAX_CLICKS_WINDOW_MS,
+)
+from src.app.core.metrics import metrics
+from src.app.core.security import InvalidSessionTokenError
+from src.app.db.session import get_db, session_scope
+from src.app.models.user_models import UserRole
+from src.app.repositories.game_repo import GameRepository
 from src.app.repositories.user_repo import UserRepository
 from src.app.schemas.miniapp_schemas import GameClickResponse
+from src.app.services.activity_tracker import activity_tracker
+from src.app.services.click_buffer import TapRateGuard, click_buffer
+from src.app.services.identity_cache import UserIdentity
 
 router = APIRouter(prefix="/api/game", tags=["Game"])
 
 
-async def _process_click(db: AsyncSession, user: User) -> GameClickResponse:
+async def _process_click(db: AsyncSession, user: UserIdentity) -> GameClickResponse:
     """
     Общая логика обработки клика:
     - доступ только для role=child
-    - обновление статистики
-    - начисление бонуса
+    - обновление статистики и начисление бонуса (GameRepository.settle_clicks)
     """
 
     if user.role != UserRole.CHILD:
@@ -42,57 +44,14 @@ async def _process_click(db: AsyncSession, user: User) -> GameClickResponse:
             detail="Игра доступна только для ребенка",
         )
 
-        # достаём/создаём статистику
-    stmt = select(GameStats).where(GameStats.user_id == user.id)
-    result = await db.execute(stmt)
-    stats = result.scalar_one_or_none()
-    if stats is None:
-        stats = GameStats(user_id=user.id, total_clicks=0, clicks_today=0)
-        db.add(stats)
-        await db.flush()
-        await db.refresh(stats)
-
-    # дата по Москве
-    today_msk = datetime.now(MOSCOW_TZ).date()
-    if stats.clicks_today_date != today_msk:
-        stats.clicks_today = 0
-        stats.clicks_today_date = today_msk
-
-    # если энергия закончилась — просто возвращаем текущий баланс и энергию 0
-    if stats.clicks_today >= MAX_DAILY_ENERGY:
-        balance_repo = BalanceRepository(db)
-        current_balance = await balance_repo.get_balance(user)
-        return GameClickResponse(
-            new_bonus_balance=current_balance,
-            current_energy=0,
-        )
-
-    # тут энергия ещё есть — считаем клик
-    stats.total_clicks += 1
-    stats.clicks_today += 1
-    stats.last_click_at = datetime.now(MOSCOW_TZ)
-
-    # награда за клик — 1 бонус
-    reward_per_click = 1
-
-    balance_repo = BalanceRepository(db)
-    await balance_repo.change_balance(
-        user=user,
-        delta=reward_per_click,
-        tx_type=TransactionType.GAME_CLICK,
-        description="Game click reward",
-    )
-
-    db.add(stats)
-    await db.flush()
+    # сброс энергии по московской дате, лимит, статистика, баланс и проводка —
+    # одним запросом
+    settlement = await GameRepository(db).settle_clicks(user.id, 1)
     await db.commit()
 
-    new_balance = await balance_repo.get_balance(user)
-    current_energy = max(MAX_DAILY_ENERGY - stats.clicks_today, 0)
-
     return GameClickResponse(
-        new_bonus_balance=new_balance,
-        current_energy=current_energy,
+        new_bonus_balance=settlement.balance,
+        current_energy=settlement.energy,
     )
 
 
@@ -102,7 +61,7 @@ async def _process_click(db: AsyncSession, user: User) -> GameClickResponse:
 @router.post("/click", response_model=GameClickResponse)
 async def game_click(
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: UserIdentity = Depends(get_current_identity),
 ) -> GameClickResponse:
     return await _process_click(db, user)
 
@@ -110,58 +69,129 @@ async def game_click(
 # ---------- WebSocket-игра ----------
 
 
+def _parse_clicks_message(message: dict) -> int:
+    """
+    Проверяет пакетное сообщение {"type": "clicks", "count": N, "window_ms": T}
+    и возвращает количество кликов. Окно и скорость тапов должны быть
+    правдоподобными, иначе ValueError с описанием для клиента.
+    """
+    count = message.get("count")
+    window_ms = message.get("window_ms")
+
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        raise ValueError("count must be a positive integer")
+    if (
+        not isinstance(window_ms, int)
+        or isinstance(window_ms, bool)
+        or not 1 <= window_ms <= MAX_CLICKS_WINDOW_MS
+    ):
+        raise ValueError(
+            f"window_ms must be an integer between 1 and {MAX_CLICKS_WINDOW_MS}"
+        )
+    if count * 1000 > MAX_CLICKS_PER_SECOND * window_ms:
+        raise ValueError("Implausible tap rate")
+
+    return count
+
+
+# открытые игровые сокеты этого процесса
+_active_sockets = 0
+
+
 @router.websocket("/ws")
-async def game_ws(
-    websocket: WebSocket,
-    db: AsyncSession = Depends(get_db),
-) -> None:
+async def game_ws(websocket: WebSocket) -> None:
     """
     Протокол:
-    - клиент подключается к ws://.../api/game/ws с заголовком X-Telegram-Id
+    - клиент подключается к ws://.../api/game/ws?token=<сессионный токен>
+      (или, по старой схеме, с заголовком X-Telegram-Id)
     - сервер валидирует пользователя, проверяет role=child
+    - сверх settings.game_ws_max_connections сокет закрывается с кодом 1013
     - клиент шлёт: {"type": "click"}
+    - клик засчитывается в памяти (ClickBuffer), в БД уходит пачкой
     - сервер отвечает: {
           "event": "click",
           "new_bonus_balance": <int>,
           "current_energy": <int>
       }
+    - или пакетом: {"type": "clicks", "count": N, "window_ms": T} —
+      N тапов за последние T мс, не быстрее MAX_CLICKS_PER_SECOND
+    - сервер отвечает одним сообщением: {
+          "event": "clicks",
+          "accepted": <int>,  # сколько засчитано с учётом энергии и лимита скорости
+          "new_bonus_balance": <int>,
+          "current_energy": <int>
+      }
     """
 
+    global _active_sockets
+
     # принимаем соединение
     await websocket.accept()
 
-    # --- простая "аутентификация" по X-Telegram-Id, как в get_current_user ---
+    # число сокетов ограничено настройкой, а не размером пула соединений БД
+    if _active_sockets >= settings.game_ws_max_connections:
+        metrics.inc("game_ws_rejected_overload")
+        await websocket.close(code=1013)  # 1013 — Try Again Later
+        return
+
+    _active_sockets += 1
+    metrics.set_gauge("game_ws_connections", _active_sockets)
+    try:
+        await _serve_game_socket(websocket)
+    finally:
+        _active_sockets -= 1
+        metrics.set_gauge("game_ws_connections", _active_sockets)
+
+
+async def _authenticate_socket(websocket: WebSocket) -> UserIdentity | None:
+    """
+    Сессионный токен из ?token=... проверяется подписью, без БД.
+    Старый заголовок X-Telegram-Id принимается, пока разрешён настройкой.
+    """
+    token = websocket.query_params.get("token")
+    if token:
+        try:
+            identity = identity_from_token(token)
+        except InvalidSessionTokenError:
+            return None
+        activity_tracker.touch_app(identity.id)
+        return identity
+
+    if not settings.auth_allow_telegram_id_header:
+        return None
+
     telegram_id_header = (
         websocket.headers.get("x-telegram-id")
         or websocket.headers.get("X-Telegram-Id")
     )
     if telegram_id_header is None:
         # не передан телеграм-айди
-        await websocket.close(code=4401)  # 4401 — Unauthorized
-        return
+        return None
 
     try:
         telegram_id = int(telegram_id_header)
     except ValueError:
-        await websocket.close(code=4401)
-        return
+        return None
 
-    user_repo = UserRepository(db)
-    user = await user_repo.get_by_telegram_id(telegram_id)
-
-    if user is None:
+    # соединение из пула берём только на время аутентификации,
+    # дальше клики пишет ClickBuffer своими короткими сессиями
+    async with session_scope("game_ws.auth") as db:
         # минимальное создание пользователя, дефолт — ребенок
-        user = User(
-            telegram_id=telegram_id,
-            role=UserRole.CHILD,
+        user = await UserRepository(db).get_or_create(
+            telegram_id, defaults={"role": UserRole.CHILD}
         )
-        db.add(user)
-        await db.flush()
-        await db.refresh(user)
+        await db.commit()
 
     # трекаем активность mini-app
-    await user_repo.touch_app_activity(user)
-    await db.commit()
+    activity_tracker.touch_app(user.id)
+    return UserIdentity.from_user(user)
+
+
+async def _serve_game_socket(websocket: WebSocket) -> None:
+    user = await _authenticate_socket(websocket)
+    if user is None:
+        await websocket.close(code=4401)  # 4401 — Unauthorized
+        return
 
     # --- доступ только для детей ---
     if user.role != UserRole.CHILD:
@@ -169,40 +199,44 @@ async def game_ws(
         return
 
     # --- игровой цикл ---
+    # клики копятся в буфере и пишутся в БД пачками, ответ уходит сразу
+    rate_guard = TapRateGuard()
+    await click_buffer.attach(user)
     try:
         while True:
             message = await websocket.receive_json()
-
-            if message.get("type") != "click":
+            message_type = message.get("type")
+
+            if message_type == "click":
+                count = 1
+            elif message_type == "clicks":
+                try:
+                    count = _parse_clicks_message(message)
+                except ValueError as exc:
+                    await websocket.send_json({"event": "error", "detail": str(exc)})
+                    continue
+            else:
                 await websocket.send_json(
                     {"event": "error", "detail": "Unsupported message type"}
                 )
                 continue
 
-            # та же логика, что и в HTTP-ручке
-            try:
-                result = await _process_click(db, user)
-            except HTTPException as exc:
-                # на всякий случай, если роль поменялась
-                await websocket.send_json(
-                    {
-                        "event": "error",
-                        "detail": exc.detail,
-                    }
-                )
-                if exc.status_code == status.HTTP_403_FORBIDDEN:
-                    await websocket.close(code=4403)
-                    return
-                continue
-
-            await websocket.send_json(
-                {
-                    "event": "click",
-                    "new_bonus_balance": result.new_bonus_balance,
-                    "current_energy": result.current_energy,
-                }
+            accepted, result = await click_buffer.click_many(
+                user.id, rate_guard.allow(count)
             )
 
+            reply = {
+                "event": message_type,
+                "new_bonus_balance": result.new_bonus_balance,
+                "current_energy": result.current_energy,
+            }
+            if message_type == "clicks":
+                reply["accepted"] = accepted
+            await websocket.send_json(reply)
+
     except WebSocketDisconnect:
         # просто выходим из функции
         return
+    finally:
+        # незаписанные клики сбрасываем в БД сразу при отключении
+        await click_buffer.detach(user.id)
@@ -1,17 +1,18 @@
 # src/app/api/routes/profile_router.py
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.app.api.deps import get_current_user
+from src.app.api.deps import get_current_identity
 from src.app.db.session import get_db
 from src.app.models.balance_models import Balance
 from src.app.models.game_models import GameStats
 from src.app.models.user_models import User, UserRole
 from src.app.repositories.balance_repo import BalanceRepository
 from src.app.schemas.miniapp_schemas import UserProfileResponse
+from src.app.services.identity_cache import UserIdentity, identity_cache
 
 router = APIRouter(prefix="/api/profile", tags=["Profile"])
 
@@ -19,8 +20,14 @@ router = APIRouter(prefix="/api/profile", tags=["Profile"])
 @router.get("/me", response_model=UserProfileResponse)
 async def get_me(
   db: AsyncSession = Depends(get_db),
-  user: User = Depends(get_current_user),
+  identity: UserIdentity = Depends(get_current_identity),
 ) -> UserProfileResponse:
+  # вызывающий определяется по кэшу, из БД читаем только данные профиля
+  user = await db.get(User, identity.id)
+  if user is None:
+    identity_cache.invalidate(identity.telegram_id)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
   # баланс
   balance_repo = BalanceRepository(db)
   bonus_balance = await balance_repo.get_balance(user)
@@ -2,16 +2,17 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from src.app.api.deps import get_current_user
 from src.app.core.config import config
 from src.app.db.session import get_db
-from src.app.models.balance_models import BalanceTransaction, TransactionType
+from src.app.models.balance_models import TransactionType
 from src.app.models.referral_models import Referral
 from src.app.models.user_models import User
+from src.app.repositories.balance_repo import BalanceRepository
 from src.app.schemas.miniapp_schemas import (
   InvitedUserInfo,
   ReferralInfoResponse,
@@ -57,16 +58,10 @@ async def get_my_referrals(
 
   invited_count = len(invited_users)
 
-  # сколько бонусов дано за рефералку
-  stmt_bonus = select(
-    func.coalesce(func.sum(BalanceTransaction.delta), 0)
-  ).where(
-    BalanceTransaction.user_id == user.id,
-    BalanceTransaction.type == TransactionType.REFERRAL,
-    BalanceTransaction.delta > 0,
+  # сколько бонусов дано за рефералку (включая архивные месяцы журнала)
+  bonus_earned = await BalanceRepository(db).get_credited_total(
+    user.id, TransactionType.REFERRAL
   )
-  result_bonus = await db.execute(stmt_bonus)
-  bonus_earned = int(result_bonus.scalar_one() or 0)
 
   return ReferralInfoResponse(
     referral_link=build_referral_link(user),
@@ -23,9 +23,9 @@ from src.app.schemas.miniapp_schemas import (
   ShopItemResponse,
 )
 
+from src.app.repositories.amocrm_outbox_repo import AmoOutboxRepository
 from src.app.repositories.balance_repo import BalanceRepository, NotEnoughBalanceError
-from src.app.services.amocrm_service import AmoCRMService
-from src.app.api.routes.amocrm_router import get_amocrm_service
+from src.app.services.amocrm_outbox import amocrm_outbox_dispatcher
 from src.app.services.loyalty_service import (
     get_loyalty_rule_for_product,
     calc_bonus_writeoff,
@@ -40,10 +40,14 @@ async def create_order(
         payload: CreateOrderRequest,
         db: AsyncSession = Depends(get_db),
         user: User = Depends(get_current_user),
-        amocrm_service: AmoCRMService = Depends(get_amocrm_service),
 ) -> OrderResponse:
   if not payload.items:
     raise HTTPException(status_code=400, detail="Cart is empty")
+  if len(payload.items) > 1:
+    raise HTTPException(
+      status_code=400,
+      detail="Заказ оформляется только одним товаром",
+    )
 
 
   product_ids = [i.item for i in payload.items]
@@ -74,7 +78,7 @@ async def create_order(
 
   # тут уже гарантированно 1 товар
   cart_item = payload.items[0]
-  product = products[cart_item.item_id]
+  product = products[cart_item.item]
   quantity = cart_item.quantity
 
   # базовая цена в рублях
@@ -169,18 +173,18 @@ async def create_order(
   )
   db.add(order_item)
 
+  # в AmoCRM заказ уходит фоном: строка outbox коммитится вместе с заказом,
+  # так что ответ не ждёт AmoCRM и заказ не теряется при её недоступности
+  AmoOutboxRepository(db).enqueue_order(order.id)
+
   await db.flush()
   await db.commit()
-
-  try:
-    await amocrm_service.send_order_to_amocrm(order)
-  except Exception:
-    pass
+  amocrm_outbox_dispatcher.notify()
 
   return OrderResponse(
     id=order.id,
     items=[
-      OrderItemResponse(item=cart_item.item, quantity=cart_item.quantity)
+      OrderItemResponse(item_id=cart_item.item, quantity=cart_item.quantity)
     ],
     total_bonus=total_bonus_to_store,
     total_money=total_money_to_store,
@@ -12,13 +12,55 @@ class Settings(BaseSettings):
     server_reload: bool = Field(True, env="CAMPBOT_SERVER_RELOAD")
     server_log_level: str = Field("info", env="CAMPBOT_SERVER_LOG_LEVEL")
 
-    database_url: str = Field(..., env="DATABASE_URL")
+    # единственная переменная без префикса CAMPBOT_
+    database_url: str = Field(..., validation_alias="DATABASE_URL")
 
     amocrm_client_id: str = Field("", env="CAMPBOT_AMOCRM_CLIENT_ID")
     amocrm_client_secret: str = Field("", env="CAMPBOT_AMOCRM_CLIENT_SECRET")
     amocrm_redirect_uri: str = Field("", env="CAMPBOT_AMOCRM_REDIRECT_URI")
     amocrm_subdomain: str = Field("", env="CAMPBOT_AMOCRM_SUBDOMAIN")
 
+    # общий пул соединений к AmoCRM (keep-alive); HTTP/2 требует пакет h2
+    amocrm_http_timeout_seconds: float = Field(
+        20, env="CAMPBOT_AMOCRM_HTTP_TIMEOUT_SECONDS"
+    )
+    amocrm_http_max_connections: int = Field(
+        20, env="CAMPBOT_AMOCRM_HTTP_MAX_CONNECTIONS"
+    )
+    amocrm_http_max_keepalive_connections: int = Field(
+        10, env="CAMPBOT_AMOCRM_HTTP_MAX_KEEPALIVE_CONNECTIONS"
+    )
+    amocrm_http_keepalive_expiry_seconds: float = Field(
+        60, env="CAMPBOT_AMOCRM_HTTP_KEEPALIVE_EXPIRY_SECONDS"
+    )
+    amocrm_http2: bool = Field(False, env="CAMPBOT_AMOCRM_HTTP2")
+    # лимит запросов к AmoCRM на процесс (API пускает ~7 в секунду на
+    # аккаунт) и повторы при 429/сетевых ошибках: число повторов, база и
+    # потолок экспоненциальной паузы (если AmoCRM не прислала Retry-After)
+    amocrm_rate_limit_per_second: float = Field(
+        7, env="CAMPBOT_AMOCRM_RATE_LIMIT_PER_SECOND"
+    )
+    amocrm_rate_limit_burst: int = Field(7, env="CAMPBOT_AMOCRM_RATE_LIMIT_BURST")
+    amocrm_http_max_retries: int = Field(4, env="CAMPBOT_AMOCRM_HTTP_MAX_RETRIES")
+    amocrm_http_backoff_base_seconds: float = Field(
+        0.5, env="CAMPBOT_AMOCRM_HTTP_BACKOFF_BASE_SECONDS"
+    )
+    amocrm_http_backoff_max_seconds: float = Field(
+        10, env="CAMPBOT_AMOCRM_HTTP_BACKOFF_MAX_SECONDS"
+    )
+    # за сколько до истечения access token обновляется заранее
+    amocrm_token_refresh_margin_seconds: float = Field(
+        300, env="CAMPBOT_AMOCRM_TOKEN_REFRESH_MARGIN_SECONDS"
+    )
+    # автомат на запросы к AmoCRM: сколько сбоев подряд его размыкают и
+    # через сколько секунд пробуется пробный запрос
+    amocrm_circuit_failure_threshold: int = Field(
+        5, env="CAMPBOT_AMOCRM_CIRCUIT_FAILURE_THRESHOLD"
+    )
+    amocrm_circuit_reset_timeout_seconds: float = Field(
+        30, env="CAMPBOT_AMOCRM_CIRCUIT_RESET_TIMEOUT_SECONDS"
+    )
+
     telegram_bot_token: str = Field("", env="CAMPBOT_TELEGRAM_BOT_TOKEN")
     telegram_webhook_url: str = Field("", env="CAMPBOT_TELEGRAM_WEBHOOK_URL")
     telegram_webhook_path: str = Field(
@@ -28,6 +70,151 @@ class Settings(BaseSettings):
 
     storage_path: str = Field("./data", env="CAMPBOT_STORAGE_PATH")
 
+    # буфер кликов игры: как часто и после скольких кликов сбрасывать в БД
+    game_click_flush_interval_ms: int = Field(
+        500, env="CAMPBOT_GAME_CLICK_FLUSH_INTERVAL_MS"
+    )
+    game_click_flush_max_clicks: int = Field(
+        50, env="CAMPBOT_GAME_CLICK_FLUSH_MAX_CLICKS"
+    )
+    # сколько игровых WebSocket-соединений держим одновременно; сверх лимита
+    # новые сокеты закрываются с кодом 1013 (Try Again Later)
+    game_ws_max_connections: int = Field(2000, env="CAMPBOT_GAME_WS_MAX_CONNECTIONS")
+
+    # награды за клики пишутся в журнал одной строкой на пользователя и
+    # московский день (delta и entries_count растут на месте); False — строка на
+    # каждую пачку кликов
+    ledger_aggregate_game_clicks: bool = Field(
+        True, env="CAMPBOT_LEDGER_AGGREGATE_GAME_CLICKS"
+    )
+
+    # кэш telegram_id → снимок пользователя для авторизации mini-app; он на
+    # процесс, поэтому смена роли в другом воркере видна не позже чем через TTL
+    identity_cache_ttl_seconds: int = Field(
+        30, env="CAMPBOT_IDENTITY_CACHE_TTL_SECONDS"
+    )
+    identity_cache_max_size: int = Field(
+        10_000, env="CAMPBOT_IDENTITY_CACHE_MAX_SIZE"
+    )
+
+    # отметки активности пользователей: как часто писать в БД и как давно
+    # записанную отметку не обновлять
+    activity_flush_interval_seconds: float = Field(
+        5, env="CAMPBOT_ACTIVITY_FLUSH_INTERVAL_SECONDS"
+    )
+    activity_min_interval_seconds: float = Field(
+        300, env="CAMPBOT_ACTIVITY_MIN_INTERVAL_SECONDS"
+    )
+
+    # журнал баланса: на PostgreSQL — секции по месяцам created_at. Сколько
+    # секций создавать наперёд, сколько последних месяцев держать «живыми»
+    # (более старые сворачиваются в balance_transactions_archive) и как часто
+    # запускать обслуживание
+    ledger_partitions_ahead: int = Field(2, env="CAMPBOT_LEDGER_PARTITIONS_AHEAD")
+    ledger_retention_months: int = Field(6, env="CAMPBOT_LEDGER_RETENTION_MONTHS")
+    ledger_maintenance_interval_seconds: float = Field(
+        6 * 3600, env="CAMPBOT_LEDGER_MAINTENANCE_INTERVAL_SECONDS"
+    )
+
+    # сверка balances с журналом: период, размер пачки пользователей и
+    # исправлять ли расхождения автоматически (баланс приводится к журналу)
+    ledger_reconcile_interval_seconds: float = Field(
+        3600, env="CAMPBOT_LEDGER_RECONCILE_INTERVAL_SECONDS"
+    )
+    ledger_reconcile_chunk_size: int = Field(
+        1000, env="CAMPBOT_LEDGER_RECONCILE_CHUNK_SIZE"
+    )
+    ledger_reconcile_repair: bool = Field(False, env="CAMPBOT_LEDGER_RECONCILE_REPAIR")
+
+    # массовое начисление бонусов: сколько строк в одной транзакции
+    bonus_award_chunk_size: int = Field(1000, env="CAMPBOT_BONUS_AWARD_CHUNK_SIZE")
+
+    # рассылки: сколько telegram_id получателей читать одной короткой сессией
+    broadcast_recipients_batch_size: int = Field(
+        1000, env="CAMPBOT_BROADCAST_RECIPIENTS_BATCH_SIZE"
+    )
+
+    # outbox заказов в AmoCRM: период опроса очереди, окно накопления пачки
+    # после нового заказа, размер пачки (сделки уходят по 50 за запрос
+    # /leads/complex), сколько попыток до DEAD, экспоненциальная пауза между
+    # ними и аренда строки (через сколько строка упавшего воркера снова
+    # станет доступна)
+    amocrm_outbox_interval_seconds: float = Field(
+        5, env="CAMPBOT_AMOCRM_OUTBOX_INTERVAL_SECONDS"
+    )
+    amocrm_outbox_batch_window_ms: int = Field(
+        500, env="CAMPBOT_AMOCRM_OUTBOX_BATCH_WINDOW_MS"
+    )
+    amocrm_outbox_batch_size: int = Field(50, env="CAMPBOT_AMOCRM_OUTBOX_BATCH_SIZE")
+    amocrm_outbox_max_attempts: int = Field(
+        10, env="CAMPBOT_AMOCRM_OUTBOX_MAX_ATTEMPTS"
+    )
+    amocrm_outbox_backoff_base_seconds: float = Field(
+        30, env="CAMPBOT_AMOCRM_OUTBOX_BACKOFF_BASE_SECONDS"
+    )
+    amocrm_outbox_backoff_max_seconds: float = Field(
+        3600, env="CAMPBOT_AMOCRM_OUTBOX_BACKOFF_MAX_SECONDS"
+    )
+    amocrm_outbox_lease_seconds: float = Field(
+        300, env="CAMPBOT_AMOCRM_OUTBOX_LEASE_SECONDS"
+    )
+
+    # inbox вебхуков транзакций AmoCRM: сколько воркеров его разбирают,
+    # период опроса, размер пачки на воркер, попытки до FAILED, пауза между
+    # ними и аренда строки
+    amocrm_webhook_workers: int = Field(4, env="CAMPBOT_AMOCRM_WEBHOOK_WORKERS")
+    amocrm_webhook_interval_seconds: float = Field(
+        5, env="CAMPBOT_AMOCRM_WEBHOOK_INTERVAL_SECONDS"
+    )
+    amocrm_webhook_batch_size: int = Field(10, env="CAMPBOT_AMOCRM_WEBHOOK_BATCH_SIZE")
+    amocrm_webhook_max_attempts: int = Field(
+        5, env="CAMPBOT_AMOCRM_WEBHOOK_MAX_ATTEMPTS"
+    )
+    amocrm_webhook_backoff_base_seconds: float = Field(
+        10, env="CAMPBOT_AMOCRM_WEBHOOK_BACKOFF_BASE_SECONDS"
+    )
+    amocrm_webhook_backoff_max_seconds: float = Field(
+        600, env="CAMPBOT_AMOCRM_WEBHOOK_BACKOFF_MAX_SECONDS"
+    )
+    amocrm_webhook_lease_seconds: float = Field(
+        120, env="CAMPBOT_AMOCRM_WEBHOOK_LEASE_SECONDS"
+    )
+
+    # сверка статусов сделок AmoCRM: период опроса, размер страницы (максимум
+    # API — 250), насколько назад читать при первом запуске и какие status_id
+    # сделки означают оплату и отмену заказа (142/143 — системные
+    # «Успешно реализовано» и «Закрыто и не реализовано»)
+    amocrm_lead_sync_interval_seconds: float = Field(
+        300, env="CAMPBOT_AMOCRM_LEAD_SYNC_INTERVAL_SECONDS"
+    )
+    amocrm_lead_sync_page_size: int = Field(
+        250, env="CAMPBOT_AMOCRM_LEAD_SYNC_PAGE_SIZE"
+    )
+    amocrm_lead_sync_lookback_seconds: int = Field(
+        86400, env="CAMPBOT_AMOCRM_LEAD_SYNC_LOOKBACK_SECONDS"
+    )
+    amocrm_lead_sync_paid_status_ids: list[int] = Field(
+        [142], env="CAMPBOT_AMOCRM_LEAD_SYNC_PAID_STATUS_IDS"
+    )
+    amocrm_lead_sync_canceled_status_ids: list[int] = Field(
+        [143], env="CAMPBOT_AMOCRM_LEAD_SYNC_CANCELED_STATUS_IDS"
+    )
+
+    # авторизация mini-app: initData Telegram → подписанный сессионный токен.
+    # Секрет подписи обязателен (не короче 32 байт), без него сервер не стартует
+    session_secret: str = Field("", env="CAMPBOT_SESSION_SECRET")
+    session_token_ttl_seconds: int = Field(
+        3600, env="CAMPBOT_SESSION_TOKEN_TTL_SECONDS"
+    )
+    init_data_max_age_seconds: int = Field(
+        86400, env="CAMPBOT_INIT_DATA_MAX_AGE_SECONDS"
+    )
+    # старая схема с голым X-Telegram-Id (без проверки) — только для
+    # разработки; админские маршруты её не принимают никогда
+    auth_allow_telegram_id_header: bool = Field(
+        False, env="CAMPBOT_AUTH_ALLOW_TELEGRAM_ID_HEADER"
+    )
+
     @property
     def amocrm_base_url(self) -> str:
         sub = self.amocrm_subdomain.strip().rstrip("/")
@@ -35,7 +222,10 @@ class Settings(BaseSettings):
             return ""
         return f"https://{sub}.amocrm.ru"
 
+    # переменные окружения — CAMPBOT_<ИМЯ_ПОЛЯ>: pydantic-settings v2 не
+    # читает env= у Field, там имя указано только для справки
     model_config = SettingsConfigDict(
+        env_prefix="CAMPBOT_",
         env_file=str(ENV_PATH),
         env_file_encoding="utf-8",
         extra="ignore",
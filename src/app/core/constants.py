@@ -8,3 +8,14 @@ MAX_DAILY_ENERGY: int = 1000
 
 # Часовой пояс Москвы
 MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+
+# Пакетные клики в WebSocket-игре ({"type": "clicks", "count": N, "window_ms": T})
+# Правдоподобный предел скорости тапов одного ребёнка
+MAX_CLICKS_PER_SECOND: int = 20
+# Максимальное окно, которое клиент может накопить в одном сообщении
+MAX_CLICKS_WINDOW_MS: int = 10_000
+
+# Ключи pg_advisory_xact_lock фоновых задач журнала баланса: их запускает
+# каждый процесс приложения, а выполняться одновременно они не должны
+LEDGER_MAINTENANCE_LOCK_KEY: int = 7_301_001
+LEDGER_RECONCILE_LOCK_KEY: int = 7_301_002
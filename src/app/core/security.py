@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Any
+from urllib.parse import parse_qsl
+
+from src.app.core.config import settings
+
+
+class InvalidInitDataError(Exception):
+    pass
+
+
+class InvalidSessionTokenError(Exception):
+    pass
+
+
+class SessionSecretError(RuntimeError):
+    """Секрет подписи сессионных токенов не задан или слишком короткий."""
+
+
+# HMAC-SHA256: ключ короче блока хэша заметно проще подобрать
+SESSION_SECRET_MIN_BYTES = 32
+
+
+# ---------- Telegram WebApp initData ----------
+
+
+def verify_init_data(
+    init_data: str,
+    bot_token: str | None = None,
+    max_age_seconds: int | None = None,
+) -> dict[str, Any]:
+    """
+    Проверяет подпись initData Telegram WebApp и возвращает её поля
+    (user — уже разобранный JSON).
+
+    Алгоритм из документации Telegram: data_check_string — пары key=value
+    без hash, отсортированные по ключу и склеенные через \\n;
+    secret_key = HMAC_SHA256("WebAppData", bot_token);
+    hash = hex(HMAC_SHA256(secret_key, data_check_string)).
+    """
+    bot_token = bot_token if bot_token is not None else settings.telegram_bot_token
+    if max_age_seconds is None:
+        max_age_seconds = settings.init_data_max_age_seconds
+    if not bot_token:
+        raise InvalidInitDataError("Bot token is not configured")
+
+    fields = dict(parse_qsl(init_data, keep_blank_values=True))
+    received_hash = fields.pop("hash", None)
+    if not received_hash:
+        raise InvalidInitDataError("initData has no hash")
+
+    data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    expected_hash = hmac.new(
+        secret_key, data_check_string.encode(), hashlib.sha256
+    ).hexdigest()
+    if not hmac.compare_digest(expected_hash, received_hash):
+        raise InvalidInitDataError("initData signature mismatch")
+
+    try:
+        auth_date = int(fields.get("auth_date", ""))
+    except ValueError:
+        raise InvalidInitDataError("initData has no auth_date") from None
+    if max_age_seconds and time.time() - auth_date > max_age_seconds:
+        raise InvalidInitDataError("initData is expired")
+
+    result: dict[str, Any] = dict(fields)
+    try:
+        result["user"] = json.loads(fields["user"])
+        int(result["user"]["id"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidInitDataError("initData has no user") from None
+    return result
+
+
+# ---------- сессионные токены ----------
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _session_key() -> bytes:
+    key = settings.session_secret.encode()
+    if len(key) < SESSION_SECRET_MIN_BYTES:
+        raise SessionSecretError(
+            f"CAMPBOT_SESSION_SECRET must be at least {SESSION_SECRET_MIN_BYTES} bytes"
+        )
+    return key
+
+
+def check_session_secret() -> None:
+    """Проверка при старте: без секрета токены не выдаются и не принимаются."""
+    _session_key()
+
+
+def issue_session_token(claims: dict[str, Any], ttl_seconds: int | None = None) -> str:
+    """
+    Короткоживущий токен вида <payload>.<signature> (base64url, HMAC-SHA256).
+    Проверяется только подписью, без обращения к БД.
+    """
+    ttl = ttl_seconds if ttl_seconds is not None else settings.session_token_ttl_seconds
+    payload = dict(claims, exp=int(time.time()) + ttl)
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    signature = hmac.new(_session_key(), body.encode(), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(signature)}"
+
+
+def decode_session_token(token: str) -> dict[str, Any]:
+    try:
+        body, signature = token.split(".")
+        expected = hmac.new(_session_key(), body.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise InvalidSessionTokenError("Invalid session token signature")
+        payload = json.loads(_b64decode(body))
+    except InvalidSessionTokenError:
+        raise
+    except (ValueError, TypeError):
+        raise InvalidSessionTokenError("Malformed session token") from None
+
+    if not isinstance(payload, dict) or payload.get("exp", 0) < time.time():
+        raise InvalidSessionTokenError("Session token is expired")
+    return payload
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_name(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+def is_postgres(db: AsyncSession) -> bool:
+    return dialect_name(db) == "postgresql"
+
+
+def upsert_insert(db: AsyncSession, table: Any) -> Any:
+    """
+    INSERT с поддержкой ON CONFLICT для текущего диалекта.
+    Рабочая БД — PostgreSQL, тесты гоняются на SQLite; оба умеют
+    on_conflict_do_update/on_conflict_do_nothing и RETURNING.
+    """
+    if is_postgres(db):
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def advisory_xact_lock(db: AsyncSession, key: int) -> None:
+    """
+    Берёт pg_advisory_xact_lock(key): держится до конца транзакции и
+    сериализует одну и ту же работу между процессами. Брать первым
+    запросом транзакции — тогда следующие запросы видят всё, что успел
+    закоммитить предыдущий владелец. На SQLite пишущие транзакции и так
+    идут по одной, там ничего не делает.
+    """
+    if is_postgres(db):
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
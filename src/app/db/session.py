@@ -1,8 +1,10 @@
 from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 
 from src.app.core.config import settings
+from src.app.core.metrics import metrics
 
 
 engine = create_async_engine(
@@ -21,3 +23,22 @@ AsyncSessionLocal = async_sessionmaker(
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+@asynccontextmanager
+async def session_scope(
+    name: str,
+    session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Короткая сессия для кода вне HTTP-запроса (WebSocket, фоновые задачи).
+    Время, на которое сессия держит соединение из пула, пишется в метрику
+    db_session_hold.<name>, число открытых сессий — в db_sessions_open.
+    """
+    metrics.add_gauge("db_sessions_open", 1)
+    try:
+        with metrics.timer(f"db_session_hold.{name}"):
+            async with session_factory() as session:
+                yield session
+    finally:
+        metrics.add_gauge("db_sessions_open", -1)
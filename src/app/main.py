@@ -2,19 +2,34 @@ from __future__ import annotations
 
 import asyncio
 from contextlib import asynccontextmanager, suppress
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from src.app.api.deps import require_admin
+from src.app.api.routes.admin_router import router as admin_router
 from src.app.api.routes.amocrm_router import router as amocrm_router
+from src.app.api.routes.auth_router import router as auth_router
+from src.app.api.routes.balance_router import router as balance_router
 from src.app.api.routes.user_router import router as user_router
 from src.app.api.routes.game_router import router as game_router
 
+from src.app.services.activity_tracker import activity_tracker
+from src.app.services.amocrm_circuit import CircuitState, amocrm_circuit_breaker
+from src.app.services.amocrm_http import amocrm_http
+from src.app.services.amocrm_lead_sync import amocrm_lead_sync
+from src.app.services.amocrm_outbox import amocrm_outbox_dispatcher
+from src.app.services.amocrm_webhook_inbox import amocrm_webhook_workers
+from src.app.services.click_buffer import click_buffer
+from src.app.services.ledger_maintenance import ledger_maintenance
+from src.app.services.ledger_reconciler import ledger_reconciler
 from src.telegram.bot import create_bot_and_dispatcher, start_bot
 from src.app.core.config import config
 from src.app.core.logger import configure_root_logger, get_logger
+from src.app.core.metrics import metrics
+from src.app.core.security import check_session_secret
 
 from src.app.core.config import BASE_DIR, ENV_PATH
 
@@ -34,10 +49,21 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         f"Читаю .env {config.amocrm_base_url}, Base = {BASE_DIR}, path = {ENV_PATH}"
     )
 
+    check_session_secret()
+
     bot, dp = create_bot_and_dispatcher()
 
     _bot_task = asyncio.create_task(start_bot(bot, dp))
 
+    await click_buffer.start()
+    await activity_tracker.start()
+    await ledger_maintenance.start()
+    await ledger_reconciler.start()
+    await amocrm_http.start()
+    await amocrm_outbox_dispatcher.start()
+    await amocrm_webhook_workers.start()
+    await amocrm_lead_sync.start()
+
     try:
         yield
     finally:
@@ -47,6 +73,17 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
             with suppress(asyncio.CancelledError):
                 await _bot_task
 
+        # клики, ещё не записанные в БД, сбрасываем до остановки процесса
+        await click_buffer.stop()
+        await activity_tracker.stop()
+        await ledger_maintenance.stop()
+        await ledger_reconciler.stop()
+        await amocrm_outbox_dispatcher.stop()
+        await amocrm_webhook_workers.stop()
+        await amocrm_lead_sync.stop()
+        # пул соединений AmoCRM закрываем после всех, кто через него ходит
+        await amocrm_http.stop()
+
 
 app = FastAPI(lifespan=lifespan, title="CampBot Server")
 
@@ -61,13 +98,25 @@ app.add_middleware(
 )
 
 app.include_router(amocrm_router, prefix="/api/v1")
+app.include_router(auth_router)
 app.include_router(user_router)
 app.include_router(game_router)
+app.include_router(balance_router)
+app.include_router(admin_router)
 
 
 @app.get("/health", tags=["Health"])
-async def health_check() -> dict[str, str]:
-    return {"status": "healthy"}
+async def health_check() -> dict[str, Any]:
+    # AmoCRM недоступна — приложение работает, заказы копятся в outbox
+    amocrm = amocrm_circuit_breaker.snapshot()
+    degraded = amocrm["state"] != CircuitState.CLOSED.value
+    return {"status": "degraded" if degraded else "healthy", "amocrm": amocrm}
+
+
+# в снимке — очереди, ошибки AmoCRM и нагрузка; наружу только админам
+@app.get("/metrics", tags=["Health"], dependencies=[Depends(require_admin)])
+async def metrics_snapshot() -> dict:
+    return metrics.snapshot()
 
 
 @app.exception_handler(Exception)
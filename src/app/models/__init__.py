@@ -1,9 +1,9 @@
 from src.app.db.base import Base  # noqa
 
 from .user_models import User, UserRole  # noqa
-from .balance_models import Balance, BalanceTransaction, TransactionType  # noqa
+from .balance_models import Balance, BalanceTransaction, BalanceTransactionArchive, LedgerCheckpoint, TransactionType  # noqa
 from .game_models import GameStats  # noqa
 from .referral_models import Referral  # noqa
 from .shop_models import Product, Order, OrderItem, OrderStatus, PaymentMethod  # noqa
 from .broadcast_models import Broadcast, BroadcastType, BroadcastStatus  # noqa
-from .amocrm_models import AmoTransaction, AmoTransactionStatus  # noqa
+from .amocrm_models import AmoOutbox, AmoOutboxKind, AmoOutboxStatus, AmoTransaction, AmoTransactionStatus, AmoWebhookInbox, AmoWebhookStatus, SyncCursor  # noqa
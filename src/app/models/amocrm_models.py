@@ -4,9 +4,11 @@ from datetime import datetime
 from enum import Enum
 
 from sqlalchemy import (
+    BigInteger,
     DateTime,
     Enum as SQLEnum,
     ForeignKey,
+    Index,
     Integer,
     JSON,
     String,
@@ -62,3 +64,131 @@ class AmoTransaction(Base):
     )
 
     order: Mapped["Order | None"] = relationship("Order")
+
+
+class AmoOutboxStatus(str, Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    # попытки исчерпаны — ждёт ручного разбора (см. /api/admin/amocrm/outbox)
+    DEAD = "dead"
+
+
+class AmoOutboxKind(str, Enum):
+    ORDER_CREATED = "order_created"
+
+
+class AmoOutbox(Base):
+    """
+    Исходящие сообщения в AmoCRM (transactional outbox).
+
+    Строка пишется в той же транзакции, что и заказ, и разбирается фоновым
+    AmoCRMOutboxDispatcher: заказ не теряется, если AmoCRM недоступна или
+    процесс упал сразу после коммита.
+    """
+
+    __tablename__ = "amocrm_outbox"
+
+    __table_args__ = (
+        # выборка очереди: PENDING с наступившим next_attempt_at
+        Index("ix_amocrm_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    kind: Mapped[AmoOutboxKind] = mapped_column(
+        SQLEnum(AmoOutboxKind, name="amo_outbox_kind"),
+        nullable=False,
+        default=AmoOutboxKind.ORDER_CREATED,
+    )
+    order_id: Mapped[int | None] = mapped_column(
+        ForeignKey("orders.id", ondelete="CASCADE"), index=True
+    )
+    payload: Mapped[dict | None] = mapped_column(JSON)
+
+    status: Mapped[AmoOutboxStatus] = mapped_column(
+        SQLEnum(AmoOutboxStatus, name="amo_outbox_status"),
+        nullable=False,
+        default=AmoOutboxStatus.PENDING,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # когда строку можно брать в работу; при захвате сдвигается на время аренды,
+    # так что строка упавшего воркера вернётся в очередь сама
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow
+    )
+    last_error: Mapped[str | None] = mapped_column(Text)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow
+    )
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class AmoWebhookStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    # попытки исчерпаны
+    FAILED = "failed"
+
+
+class AmoWebhookInbox(Base):
+    """
+    Входящие вебхуки транзакций AmoCRM (durable inbox).
+
+    Ручка только дописывает сюда сырое тело одним INSERT ... ON CONFLICT
+    DO NOTHING (повторная доставка того же события ничего не стоит), а
+    разбирают строки воркеры AmoCRMWebhookWorkers в своих сессиях.
+    """
+
+    __tablename__ = "amocrm_webhook_inbox"
+
+    __table_args__ = (
+        UniqueConstraint(
+            "amocrm_event_id",
+            name="uq_amocrm_webhook_inbox_amocrm_event_id",
+        ),
+        Index(
+            "ix_amocrm_webhook_inbox_status_next_attempt",
+            "status",
+            "next_attempt_at",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    amocrm_event_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+
+    status: Mapped[AmoWebhookStatus] = mapped_column(
+        SQLEnum(AmoWebhookStatus, name="amo_webhook_status"),
+        nullable=False,
+        default=AmoWebhookStatus.PENDING,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow
+    )
+    last_error: Mapped[str | None] = mapped_column(Text)
+
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow
+    )
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class SyncCursor(Base):
+    """
+    Позиция инкрементальной синхронизации с внешней системой, по имени
+    синхронизации. Для сделок AmoCRM (AmoCRMLeadSync) — updated_at последней
+    прочитанной сделки, unix-время.
+    """
+
+    __tablename__ = "sync_cursors"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow
+    )
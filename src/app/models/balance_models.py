@@ -1,9 +1,20 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
-from sqlalchemy import DateTime, Enum as SQLEnum, ForeignKey, Integer, Numeric, String
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    DateTime,
+    Enum as SQLEnum,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.app.db.base import Base
@@ -38,12 +49,53 @@ class Balance(Base):
     user: Mapped["User"] = relationship("User", back_populates="balance")
 
 
+# колонки, которые отдаёт история проводок (GET /api/balance/transactions),
+# сверх ключа индекса — в INCLUDE, чтобы страница читалась index-only scan
+_HISTORY_INCLUDE = [
+    "type",
+    "delta",
+    "resulting_balance",
+    "description",
+    "entries_count",
+    "period_date",
+]
+
+
 class BalanceTransaction(Base):
     __tablename__ = "balance_transactions"
+    # На PostgreSQL таблица секционирована по месяцам created_at (см. миграцию
+    # 7c4e1b9d2a60 и LedgerMaintenance); первичный ключ там — (id, created_at),
+    # и в каждом уникальном индексе обязан быть created_at.
+    __table_args__ = (
+        # одна агрегированная строка на пользователя, тип и день; created_at у
+        # неё — начало московского дня, так что он однозначно задан period_date
+        Index(
+            "uq_balance_transactions_rollup",
+            "user_id",
+            "type",
+            "period_date",
+            "created_at",
+            unique=True,
+            postgresql_where=text("period_date IS NOT NULL"),
+            sqlite_where=text("period_date IS NOT NULL"),
+        ),
+        # История проводок постранично, новые сверху (keyset по created_at,
+        # id); фильтр по типу проверяется по INCLUDE-колонке того же индекса.
+        # Индекс один: каждый лишний — ещё запись на каждую проводку.
+        Index(
+            "ix_balance_transactions_user_created_id",
+            "user_id",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_include=_HISTORY_INCLUDE,
+        ),
+        # проводки пользователя новее точки сверки (LedgerReconciler)
+        Index("ix_balance_transactions_user_id_id", "user_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
 
     delta: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -57,8 +109,73 @@ class BalanceTransaction(Base):
 
     description: Mapped[str | None] = mapped_column(String(512))
 
+    # сколько начислений свёрнуто в строку; у обычных проводок — 1
+    entries_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1"
+    )
+    # московский день агрегированной строки (клики игры); у обычных проводок — NULL
+    period_date: Mapped[date | None] = mapped_column(Date)
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, default=datetime.utcnow
     )
 
     user: Mapped["User"] = relationship("User", back_populates="transactions")
+
+
+class BalanceTransactionArchive(Base):
+    """
+    Свёртка проводок закрытых месяцев: после архивации строки месяца удаляются
+    из balance_transactions (на PostgreSQL — вместе с секцией), а здесь
+    остаются суммы по пользователю, типу и месяцу.
+    """
+
+    __tablename__ = "balance_transactions_archive"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    type: Mapped[TransactionType] = mapped_column(
+        SQLEnum(TransactionType, name="transaction_type"), primary_key=True
+    )
+    # первое число московского месяца
+    period_month: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    # начисления и списания отдельно: суммы «сколько заработано» не должны
+    # зависеть от списаний
+    credit_sum: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    debit_sum: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    entries_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+
+class LedgerCheckpoint(Base):
+    """
+    Точка сверки баланса пользователя с журналом (см. LedgerReconciler):
+    сумма delta всех проводок с id <= last_tx_id (плюс архив). Следующая
+    сверка читает только проводки новее last_tx_id.
+    """
+
+    __tablename__ = "ledger_checkpoints"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    last_tx_id: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    ledger_sum: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    # расхождение balances.amount с журналом на момент последней сверки
+    drift: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    checked_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow
+    )
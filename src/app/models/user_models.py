@@ -91,8 +91,13 @@ class User(Base):
         "Balance", uselist=False, back_populates="user"
     )
 
+    # журнал может быть огромным — только постранично через
+    # BalanceRepository.list_transactions; удаление каскадом делает БД
     transactions: Mapped[list["BalanceTransaction"]] = relationship(
-        "BalanceTransaction", back_populates="user"
+        "BalanceTransaction",
+        back_populates="user",
+        lazy="raise",
+        passive_deletes=True,
     )
 
     game_stats: Mapped["GameStats | None"] = relationship(
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
 from typing import Any
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import Boolean, func, literal_column, select, update
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.app.db.dialect import is_postgres, upsert_insert
 from src.app.models.amocrm_models import AmoTransaction, AmoTransactionStatus
 
 
@@ -21,41 +24,72 @@ class AmoTransactionRepository:
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def create_from_payload(
+    async def ingest(
         self,
         payload: dict[str, Any],
         amocrm_event_id: str | None,
         amocrm_lead_id: int | None,
         order_id: int | None = None,
-    ) -> AmoTransaction:
-        if amocrm_event_id:
-            existing = await self.get_by_event_id(amocrm_event_id)
-            if existing:
-                return existing
+    ) -> Row:
+        """
+        Записывает событие одним INSERT ... ON CONFLICT (amocrm_event_id)
+        DO UPDATE ... RETURNING id, status, inserted. Повторная доставка того
+        же события — один запрос, который вернёт уже существующую строку
+        (inserted=False) с её статусом; параллельные дубли не гоняются за
+        уникальным ключом.
 
-        tx = AmoTransaction(
+        inserted на PostgreSQL — xmax = 0 (строку вставил этот запрос), на
+        SQLite — совпадение created_at с моментом вставки.
+        """
+        table = AmoTransaction.__table__
+        now = datetime.now(timezone.utc)
+        stmt = upsert_insert(self.db, table).values(
             amocrm_event_id=amocrm_event_id,
             amocrm_lead_id=amocrm_lead_id,
             order_id=order_id,
             payload=jsonable_encoder(payload),
             status=AmoTransactionStatus.NEW,
+            created_at=now,
+            updated_at=now,
+        )
+        if is_postgres(self.db):
+            inserted = literal_column("(xmax = 0)", Boolean)
+        else:
+            inserted = table.c.created_at == now
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.amocrm_event_id],
+            # DO UPDATE, а не DO NOTHING: иначе RETURNING пуст для дубля;
+            # заказ, найденный при повторе, дописываем, не затирая старый
+            set_={
+                "order_id": func.coalesce(table.c.order_id, stmt.excluded.order_id),
+                "updated_at": now,
+            },
+        ).returning(
+            table.c.id,
+            table.c.status,
+            inserted.label("inserted"),
+        )
+        result = await self.db.execute(stmt)
+        return result.one()
+
+    async def mark_processed(self, tx_id: int, order_id: int | None = None) -> None:
+        values: dict[str, Any] = {
+            "status": AmoTransactionStatus.PROCESSED,
+            "error_message": None,
+        }
+        if order_id is not None:
+            values["order_id"] = order_id
+        await self._update(tx_id, values)
+
+    async def mark_error(self, tx_id: int, message: str) -> None:
+        await self._update(
+            tx_id, {"status": AmoTransactionStatus.ERROR, "error_message": message}
+        )
+
+    async def _update(self, tx_id: int, values: dict[str, Any]) -> None:
+        table = AmoTransaction.__table__
+        await self.db.execute(
+            update(table)
+            .where(table.c.id == tx_id)
+            .values(updated_at=datetime.now(timezone.utc), **values)
         )
-        self.db.add(tx)
-        await self.db.flush()
-        await self.db.refresh(tx)
-        return tx
-
-    async def mark_processed(self, tx: AmoTransaction) -> AmoTransaction:
-        tx.status = AmoTransactionStatus.PROCESSED
-        self.db.add(tx)
-        await self.db.flush()
-        await self.db.refresh(tx)
-        return tx
-
-    async def mark_error(self, tx: AmoTransaction, message: str) -> AmoTransaction:
-        tx.status = AmoTransactionStatus.ERROR
-        tx.error_message = message
-        self.db.add(tx)
-        await self.db.flush()
-        await self.db.refresh(tx)
-        return tx
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.models.amocrm_models import AmoOutbox, AmoOutboxKind, AmoOutboxStatus
+from src.app.repositories import lease_queue
+
+
+class AmoOutboxRepository:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    def enqueue_order(
+        self,
+        order_id: int,
+        payload: dict[str, Any] | None = None,
+    ) -> AmoOutbox:
+        """
+        Ставит заказ в очередь на отправку. Ничего не коммитит: строка должна
+        попасть в БД той же транзакцией, что и сам заказ.
+        """
+        entry = AmoOutbox(
+            kind=AmoOutboxKind.ORDER_CREATED,
+            order_id=order_id,
+            payload=payload,
+            status=AmoOutboxStatus.PENDING,
+            attempts=0,
+            next_attempt_at=datetime.now(timezone.utc),
+        )
+        self.db.add(entry)
+        return entry
+
+    async def claim_due(
+        self,
+        now: datetime,
+        limit: int,
+        lease: timedelta,
+    ) -> Sequence[Row]:
+        """
+        Забирает до limit созревших строк с арендой на lease
+        (см. lease_queue.claim_due).
+        """
+        table = AmoOutbox.__table__
+        return await lease_queue.claim_due(
+            self.db,
+            table,
+            AmoOutboxStatus.PENDING,
+            now,
+            limit,
+            lease,
+            returning=(
+                table.c.id,
+                table.c.kind,
+                table.c.order_id,
+                table.c.payload,
+                table.c.attempts,
+            ),
+        )
+
+    async def mark_sent(self, entry_ids: Iterable[int], now: datetime) -> None:
+        table = AmoOutbox.__table__
+        await self.db.execute(
+            update(table)
+            .where(table.c.id.in_(list(entry_ids)))
+            .values(status=AmoOutboxStatus.SENT, sent_at=now, last_error=None)
+        )
+
+    async def mark_failed(
+        self,
+        entry_id: int,
+        error: str,
+        retry_at: datetime | None,
+    ) -> None:
+        """retry_at=None — попытки исчерпаны, строка уходит в DEAD."""
+        await lease_queue.mark_failed(
+            self.db,
+            AmoOutbox.__table__,
+            AmoOutboxStatus.DEAD,
+            entry_id,
+            error,
+            retry_at,
+        )
+
+    async def defer(self, entry_ids: Iterable[int], retry_at: datetime) -> None:
+        """
+        Откладывает строки, не засчитывая попытку: запрос в AmoCRM не
+        отправлялся (разомкнут автомат).
+        """
+        table = AmoOutbox.__table__
+        await self.db.execute(
+            update(table)
+            .where(table.c.id.in_(list(entry_ids)))
+            .values(attempts=table.c.attempts - 1, next_attempt_at=retry_at)
+        )
+
+    async def requeue_dead(
+        self,
+        now: datetime,
+        ids: Iterable[int] | None = None,
+    ) -> int:
+        """Возвращает DEAD-строки в очередь с обнулённым счётчиком попыток."""
+        table = AmoOutbox.__table__
+        stmt = (
+            update(table)
+            .where(table.c.status == AmoOutboxStatus.DEAD)
+            .values(status=AmoOutboxStatus.PENDING, attempts=0, next_attempt_at=now)
+        )
+        if ids is not None:
+            stmt = stmt.where(table.c.id.in_(list(ids)))
+        result = await self.db.execute(stmt)
+        return result.rowcount or 0
+
+    async def count_by_status(self) -> dict[AmoOutboxStatus, int]:
+        table = AmoOutbox.__table__
+        result = await self.db.execute(
+            select(table.c.status, func.count()).group_by(table.c.status)
+        )
+        counts = {status: 0 for status in AmoOutboxStatus}
+        counts.update({status: count for status, count in result.all()})
+        return counts
+
+    async def list_dead(self, limit: int = 100) -> Sequence[AmoOutbox]:
+        result = await self.db.scalars(
+            select(AmoOutbox)
+            .where(AmoOutbox.status == AmoOutboxStatus.DEAD)
+            .order_by(AmoOutbox.id.desc())
+            .limit(limit)
+        )
+        return result.all()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Sequence
+
+from sqlalchemy import update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.db.dialect import upsert_insert
+from src.app.models.amocrm_models import AmoWebhookInbox, AmoWebhookStatus
+from src.app.repositories import lease_queue
+
+
+class AmoWebhookInboxRepository:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def append(
+        self,
+        amocrm_event_id: str,
+        payload: dict[str, Any],
+        now: datetime,
+    ) -> bool:
+        """
+        Дописывает вебхук в inbox одним INSERT ... ON CONFLICT DO NOTHING.
+        False — такое событие уже приходило (AmoCRM повторяет доставку).
+        Ничего не коммитит.
+        """
+        table = AmoWebhookInbox.__table__
+        stmt = (
+            upsert_insert(self.db, table)
+            .values(
+                amocrm_event_id=amocrm_event_id,
+                payload=payload,
+                status=AmoWebhookStatus.PENDING,
+                attempts=0,
+                next_attempt_at=now,
+                received_at=now,
+            )
+            .on_conflict_do_nothing(index_elements=[table.c.amocrm_event_id])
+            .returning(table.c.id)
+        )
+        result = await self.db.execute(stmt)
+        return result.scalar_one_or_none() is not None
+
+    async def claim_due(
+        self,
+        now: datetime,
+        limit: int,
+        lease: timedelta,
+    ) -> Sequence[Row]:
+        """
+        Забирает до limit созревших строк с арендой на lease
+        (см. lease_queue.claim_due).
+        """
+        table = AmoWebhookInbox.__table__
+        return await lease_queue.claim_due(
+            self.db,
+            table,
+            AmoWebhookStatus.PENDING,
+            now,
+            limit,
+            lease,
+            returning=(
+                table.c.id,
+                table.c.amocrm_event_id,
+                table.c.payload,
+                table.c.attempts,
+            ),
+        )
+
+    async def mark_done(self, entry_id: int, now: datetime) -> None:
+        table = AmoWebhookInbox.__table__
+        await self.db.execute(
+            update(table)
+            .where(table.c.id == entry_id)
+            .values(status=AmoWebhookStatus.DONE, processed_at=now, last_error=None)
+        )
+
+    async def mark_failed(
+        self,
+        entry_id: int,
+        error: str,
+        retry_at: datetime | None,
+    ) -> None:
+        """retry_at=None — попытки исчерпаны, строка уходит в FAILED."""
+        await lease_queue.mark_failed(
+            self.db,
+            AmoWebhookInbox.__table__,
+            AmoWebhookStatus.FAILED,
+            entry_id,
+            error,
+            retry_at,
+        )
@@ -1,9 +1,18 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+from sqlalchemy import Integer, String, cast, func, literal, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.app.models.balance_models import Balance, BalanceTransaction, TransactionType
+from src.app.db.dialect import is_postgres, upsert_insert
+from src.app.models.balance_models import (
+    Balance,
+    BalanceTransaction,
+    BalanceTransactionArchive,
+    TransactionType,
+)
 from src.app.models.user_models import User
 
 
@@ -16,7 +25,12 @@ class BalanceRepository:
         self.db = db
 
     async def _get_balance_row(self, user_id: int) -> Balance:
-        stmt = select(Balance).where(Balance.user_id == user_id)
+        # populate_existing: баланс меняется Core-запросами в обход identity map
+        stmt = (
+            select(Balance)
+            .where(Balance.user_id == user_id)
+            .execution_options(populate_existing=True)
+        )
         result = await self.db.execute(stmt)
         balance = result.scalar_one_or_none()
         if balance is None:
@@ -27,9 +41,62 @@ class BalanceRepository:
         return balance
 
     async def get_balance(self, user: User) -> int:
-        balance = await self._get_balance_row(user.id)
+        return await self.get_balance_by_user_id(user.id)
+
+    async def get_balance_by_user_id(self, user_id: int) -> int:
+        balance = await self._get_balance_row(user_id)
         return balance.amount
 
+    async def list_transactions(
+        self,
+        user_id: int,
+        limit: int,
+        types: Sequence[TransactionType] | None = None,
+        before: tuple[datetime, int] | None = None,
+    ) -> list[BalanceTransaction]:
+        """
+        Страница истории проводок, новые сверху. Keyset-пагинация: before —
+        (created_at, id) последней строки предыдущей страницы; OFFSET не
+        используется, так что любая страница — короткий проход по индексу
+        (user_id, created_at DESC, id DESC).
+        """
+        stmt = select(BalanceTransaction).where(BalanceTransaction.user_id == user_id)
+        if types:
+            stmt = stmt.where(BalanceTransaction.type.in_(types))
+        if before is not None:
+            stmt = stmt.where(
+                tuple_(BalanceTransaction.created_at, BalanceTransaction.id)
+                < tuple_(
+                    literal(before[0], BalanceTransaction.created_at.type),
+                    literal(before[1], Integer),
+                )
+            )
+        stmt = stmt.order_by(
+            BalanceTransaction.created_at.desc(), BalanceTransaction.id.desc()
+        ).limit(limit)
+        return list((await self.db.scalars(stmt)).all())
+
+    async def get_credited_total(self, user_id: int, tx_type: TransactionType) -> int:
+        """
+        Сколько всего начислено пользователю проводками типа tx_type:
+        живой журнал (только свежие секции) плюс свёрнутые месяцы из архива.
+        """
+        tx_t = BalanceTransaction.__table__
+        archive_t = BalanceTransactionArchive.__table__
+        live = select(func.coalesce(func.sum(tx_t.c.delta), 0)).where(
+            tx_t.c.user_id == user_id,
+            tx_t.c.type == tx_type,
+            tx_t.c.delta > 0,
+        )
+        archived = select(func.coalesce(func.sum(archive_t.c.credit_sum), 0)).where(
+            archive_t.c.user_id == user_id,
+            archive_t.c.type == tx_type,
+        )
+        total = await self.db.scalar(
+            select(live.scalar_subquery() + archived.scalar_subquery())
+        )
+        return int(total or 0)
+
     async def change_balance(
         self,
         user: User,
@@ -37,24 +104,83 @@ class BalanceRepository:
         tx_type: TransactionType,
         description: str | None = None,
         allow_negative: bool = False,
-    ) -> Balance:
-        balance = await self._get_balance_row(user.id)
+    ) -> int:
+        """
+        Атомарно меняет баланс и пишет проводку, возвращает новый баланс.
+
+        Проверка «хватает ли средств» делается самим UPDATE
+        (WHERE amount + delta >= 0), поэтому два параллельных списания не могут
+        оба пройти. Строка баланса создаётся лениво через upsert. На PostgreSQL
+        баланс и проводка — один запрос (CTE), на SQLite — два подряд в
+        текущей транзакции.
+        """
+        balance_stmt = self._balance_update_stmt(user.id, delta, allow_negative)
 
-        new_amount = balance.amount + delta
-        if new_amount < 0 and not allow_negative:
+        if is_postgres(self.db):
+            balance = balance_stmt.cte("balance")
+            tx_t = BalanceTransaction.__table__
+            stmt = (
+                tx_t.insert()
+                .from_select(
+                    ["user_id", "delta", "resulting_balance", "type", "description"],
+                    select(
+                        literal(user.id, Integer),
+                        literal(delta, Integer),
+                        balance.c.amount,
+                        cast(literal(tx_type.name, String), tx_t.c.type.type),
+                        literal(description, String),
+                    ),
+                )
+                .add_cte(balance)
+                .returning(tx_t.c.resulting_balance)
+            )
+            new_amount = (await self.db.execute(stmt)).scalar_one_or_none()
+            if new_amount is None:
+                raise NotEnoughBalanceError("Not enough balance")
+            return new_amount
+
+        new_amount = (await self.db.execute(balance_stmt)).scalar_one_or_none()
+        if new_amount is None:
             raise NotEnoughBalanceError("Not enough balance")
 
-        balance.amount = new_amount
+        await self.db.execute(
+            BalanceTransaction.__table__.insert().values(
+                user_id=user.id,
+                delta=delta,
+                resulting_balance=new_amount,
+                type=tx_type,
+                description=description,
+            )
+        )
+        return new_amount
 
-        tx = BalanceTransaction(
-            user_id=user.id,
-            delta=delta,
-            resulting_balance=new_amount,
-            type=tx_type,
-            description=description,
+    def _balance_update_stmt(self, user_id: int, delta: int, allow_negative: bool):
+        """
+        UPDATE/UPSERT баланса с RETURNING amount; не возвращает строку,
+        если после изменения баланс ушёл бы в минус.
+        """
+        balances = Balance.__table__
+        now = datetime.now(timezone.utc)
+
+        if delta < 0 and not allow_negative:
+            # строки нет — значит баланс 0, и списывать нечего
+            return (
+                update(balances)
+                .where(
+                    balances.c.user_id == user_id,
+                    balances.c.amount + delta >= 0,
+                )
+                .values(amount=balances.c.amount + delta, updated_at=now)
+                .returning(balances.c.amount)
+            )
+
+        stmt = upsert_insert(self.db, balances).values(
+            user_id=user_id, amount=delta, updated_at=now
         )
-        self.db.add(balance)
-        self.db.add(tx)
-        await self.db.flush()
-        await self.db.refresh(balance)
-        return balance
+        return stmt.on_conflict_do_update(
+            index_elements=[balances.c.user_id],
+            set_={
+                "amount": balances.c.amount + stmt.excluded.amount,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(balances.c.amount)
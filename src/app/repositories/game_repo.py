@@ -1,15 +1,58 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+from dataclasses import dataclass
+from datetime import date, datetime, time
 
-from sqlalchemy import select
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Integer,
+    String,
+    case,
+    cast,
+    func,
+    literal,
+    select,
+    true,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.app.models.balance_models import TransactionType
+from src.app.core.config import settings
+from src.app.core.constants import MAX_DAILY_ENERGY, MOSCOW_TZ
+from src.app.db.dialect import is_postgres, upsert_insert
+from src.app.models.balance_models import Balance, BalanceTransaction, TransactionType
 from src.app.models.game_models import GameStats
 from src.app.models.user_models import User
 from src.app.repositories.balance_repo import BalanceRepository
 
+GAME_CLICK_DESCRIPTION = "Game click reward"
+
+
+def ledger_created_at(now: datetime, today: date) -> datetime:
+    """
+    created_at проводки за клики. У агрегированной строки это начало
+    московского дня: ключ свёртки не меняется в течение дня, и строка
+    всегда попадает в секцию своего месяца.
+    """
+    if settings.ledger_aggregate_game_clicks:
+        return datetime.combine(today, time.min, tzinfo=MOSCOW_TZ)
+    return now
+
+
+@dataclass(frozen=True)
+class ClickSettlement:
+    # сколько кликов засчитано (меньше запрошенного, если кончилась энергия)
+    accepted: int
+    # баланс после начисления
+    balance: int
+    # клики за сегодняшний (московский) день после начисления
+    clicks_today: int
+
+    @property
+    def energy(self) -> int:
+        return max(MAX_DAILY_ENERGY - self.clicks_today, 0)
+
 
 class GameRepository:
     def __init__(self, db: AsyncSession) -> None:
@@ -27,26 +70,260 @@ class GameRepository:
             await self.db.refresh(stats)
         return stats
 
-    async def register_click(self, user: User, reward_per_click: int = 1) -> GameStats:
-        stats = await self._get_stats(user.id)
+    async def register_click(
+        self, user: User, reward_per_click: int = 1
+    ) -> ClickSettlement:
+        return await self.settle_clicks(user.id, 1, reward_per_click=reward_per_click)
+
+    def _game_ledger_insert(self, insert_stmt):
+        """
+        Проводка за клики. В режиме ledger_aggregate_game_clicks строка одна на
+        пользователя и московский день: повторные начисления складываются в неё
+        (delta, entries_count), resulting_balance — баланс после последнего.
+        created_at у такой строки — начало московского дня (см. ledger_created_at).
+        """
+        if not settings.ledger_aggregate_game_clicks:
+            return insert_stmt
+
+        tx_t = BalanceTransaction.__table__
+        return insert_stmt.on_conflict_do_update(
+            index_elements=[
+                tx_t.c.user_id,
+                tx_t.c.type,
+                tx_t.c.period_date,
+                tx_t.c.created_at,
+            ],
+            index_where=tx_t.c.period_date.isnot(None),
+            set_={
+                "delta": tx_t.c.delta + insert_stmt.excluded.delta,
+                "entries_count": (
+                    tx_t.c.entries_count + insert_stmt.excluded.entries_count
+                ),
+                "resulting_balance": insert_stmt.excluded.resulting_balance,
+            },
+        )
+
+    async def settle_clicks(
+        self,
+        user_id: int,
+        clicks: int,
+        now: datetime | None = None,
+        reward_per_click: int = 1,
+    ) -> ClickSettlement:
+        """
+        Атомарно засчитывает клики: сброс дневного счётчика по московской дате,
+        проверка лимита энергии, статистика, баланс и проводка.
+
+        На PostgreSQL это один запрос (CTE из UPDATE/INSERT ... ON CONFLICT ...
+        RETURNING), на SQLite — те же шаги последовательно в текущей транзакции.
+        Коммит остаётся за вызывающим кодом.
+        """
+        if now is None:
+            now = datetime.now(MOSCOW_TZ)
+        today = now.astimezone(MOSCOW_TZ).date()
+
+        if is_postgres(self.db):
+            settlement = await self._settle_clicks_pg(
+                user_id, clicks, now, today, reward_per_click
+            )
+            if settlement is not None:
+                return settlement
+            # первый клик игрока: заводим строку статистики и повторяем
+            await self.db.execute(
+                upsert_insert(self.db, GameStats.__table__)
+                .values(user_id=user_id, total_clicks=0, clicks_today=0)
+                .on_conflict_do_nothing(index_elements=["user_id"])
+            )
+            settlement = await self._settle_clicks_pg(
+                user_id, clicks, now, today, reward_per_click
+            )
+            assert settlement is not None
+            return settlement
+        return await self._settle_clicks_sequential(
+            user_id, clicks, now, today, reward_per_click
+        )
 
-        today = date.today()
-        if stats.clicks_today_date != today:
-            stats.clicks_today_date = today
-            stats.clicks_today = 0
+    async def _settle_clicks_pg(
+        self,
+        user_id: int,
+        clicks: int,
+        now: datetime,
+        today: date,
+        reward_per_click: int,
+    ) -> ClickSettlement | None:
+        """
+        UPDATE game_stats ... FROM (SELECT ... FOR UPDATE) RETURNING даёт и
+        старые, и новые значения счётчика, поэтому число засчитанных кликов
+        известно в том же запросе. Параллельные вкладки сериализуются на
+        блокировке строки статистики. Если строки статистики ещё нет,
+        запрос ничего не меняет и возвращает None.
+        """
+        stats_t = GameStats.__table__
+        balance_t = Balance.__table__
+        tx_t = BalanceTransaction.__table__
 
-        stats.total_clicks += 1
-        stats.clicks_today += 1
-        stats.last_click_at = datetime.utcnow()
+        locked = (
+            select(
+                stats_t.c.id,
+                stats_t.c.clicks_today,
+                stats_t.c.clicks_today_date,
+            )
+            .where(stats_t.c.user_id == user_id)
+            .with_for_update()
+            .subquery("locked")
+        )
 
-        await self.balance_service.change_balance(
-            user=user,
-            delta=reward_per_click,
-            tx_type=TransactionType.GAME_CLICK,
-            description="Game click reward",
+        # дневной счётчик обнуляется, если последний клик был в другой московский день
+        base_today = case(
+            (
+                locked.c.clicks_today_date == literal(today, Date),
+                locked.c.clicks_today,
+            ),
+            else_=0,
+        )
+        new_today = func.greatest(
+            base_today, func.least(base_today + clicks, MAX_DAILY_ENERGY)
+        )
+        stats = (
+            update(stats_t)
+            .where(stats_t.c.id == locked.c.id)
+            .values(
+                clicks_today=new_today,
+                total_clicks=stats_t.c.total_clicks + new_today - base_today,
+                clicks_today_date=literal(today, Date),
+                last_click_at=literal(now, DateTime(timezone=True)),
+            )
+            .returning(
+                stats_t.c.clicks_today,
+                (stats_t.c.clicks_today - base_today).label("accepted"),
+            )
+            .cte("stats")
         )
 
-        self.db.add(stats)
+        balance_insert = upsert_insert(self.db, balance_t).from_select(
+            ["user_id", "amount", "updated_at"],
+            select(
+                literal(user_id, Integer),
+                stats.c.accepted * reward_per_click,
+                literal(now, DateTime(timezone=True)),
+            ),
+            include_defaults=False,
+        )
+        balance = (
+            balance_insert.on_conflict_do_update(
+                index_elements=[balance_t.c.user_id],
+                set_={
+                    "amount": balance_t.c.amount + balance_insert.excluded.amount,
+                    "updated_at": balance_insert.excluded.updated_at,
+                },
+            )
+            .returning(balance_t.c.amount)
+            .cte("balance")
+        )
+
+        period_date = today if settings.ledger_aggregate_game_clicks else None
+        ledger = self._game_ledger_insert(
+            upsert_insert(self.db, tx_t).from_select(
+                [
+                    "user_id",
+                    "delta",
+                    "resulting_balance",
+                    "type",
+                    "description",
+                    "entries_count",
+                    "period_date",
+                    "created_at",
+                ],
+                select(
+                    literal(user_id, Integer),
+                    stats.c.accepted * reward_per_click,
+                    balance.c.amount,
+                    cast(
+                        literal(TransactionType.GAME_CLICK.name, String),
+                        tx_t.c.type.type,
+                    ),
+                    literal(GAME_CLICK_DESCRIPTION, String),
+                    stats.c.accepted,
+                    literal(period_date, Date),
+                    literal(ledger_created_at(now, today), DateTime(timezone=True)),
+                )
+                .select_from(stats.join(balance, true()))
+                .where(stats.c.accepted > 0),
+                include_defaults=False,
+            )
+        ).cte("ledger")
+
+        stmt = (
+            select(stats.c.accepted, balance.c.amount, stats.c.clicks_today)
+            .select_from(stats.join(balance, true()))
+            .add_cte(ledger)
+        )
+        row = (await self.db.execute(stmt)).one_or_none()
+        if row is None:
+            return None
+        return ClickSettlement(
+            accepted=row.accepted,
+            balance=row.amount,
+            clicks_today=row.clicks_today,
+        )
+
+    async def _settle_clicks_sequential(
+        self,
+        user_id: int,
+        clicks: int,
+        now: datetime,
+        today: date,
+        reward_per_click: int,
+    ) -> ClickSettlement:
+        stats = await self._get_stats(user_id)
+
+        base_today = stats.clicks_today if stats.clicks_today_date == today else 0
+        new_today = max(base_today, min(base_today + clicks, MAX_DAILY_ENERGY))
+        accepted = new_today - base_today
+
+        stats.total_clicks += accepted
+        stats.clicks_today = new_today
+        stats.clicks_today_date = today
+        stats.last_click_at = now
         await self.db.flush()
-        await self.db.refresh(stats)
-        return stats
+
+        balance_t = Balance.__table__
+        delta = accepted * reward_per_click
+        balance_insert = upsert_insert(self.db, balance_t).values(
+            user_id=user_id, amount=delta, updated_at=now
+        )
+        amount = (
+            await self.db.execute(
+                balance_insert.on_conflict_do_update(
+                    index_elements=[balance_t.c.user_id],
+                    set_={
+                        "amount": balance_t.c.amount + balance_insert.excluded.amount,
+                        "updated_at": balance_insert.excluded.updated_at,
+                    },
+                ).returning(balance_t.c.amount)
+            )
+        ).scalar_one()
+
+        if accepted:
+            await self.db.execute(
+                self._game_ledger_insert(
+                    upsert_insert(self.db, BalanceTransaction.__table__).values(
+                        user_id=user_id,
+                        delta=delta,
+                        resulting_balance=amount,
+                        type=TransactionType.GAME_CLICK,
+                        description=GAME_CLICK_DESCRIPTION,
+                        entries_count=accepted,
+                        period_date=(
+                            today if settings.ledger_aggregate_game_clicks else None
+                        ),
+                        created_at=ledger_created_at(now, today),
+                    )
+                )
+            )
+
+        return ClickSettlement(
+            accepted=accepted,
+            balance=amount,
+            clicks_today=new_today,
+        )
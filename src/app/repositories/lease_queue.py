@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Sequence
+
+from sqlalchemy import Column, Table, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# last_error — для людей, полный стек есть в логах
+MAX_ERROR_LENGTH = 2000
+
+
+async def claim_due(
+    db: AsyncSession,
+    table: Table,
+    pending_status: Enum,
+    now: datetime,
+    limit: int,
+    lease: timedelta,
+    returning: Sequence[Column[Any]],
+) -> Sequence[Row]:
+    """
+    Общая выборка для очередей с арендой (amocrm_outbox, amocrm_webhook_inbox).
+
+    Забирает до limit строк в статусе pending_status, чей срок наступил:
+    attempts += 1, а next_attempt_at сдвигается на время аренды. Пока аренда
+    не истекла, другие воркеры строку не видят; если воркер упал, не
+    отчитавшись, строка вернётся в очередь сама.
+
+    На PostgreSQL выборка идёт с FOR UPDATE SKIP LOCKED — параллельные
+    воркеры не ждут друг друга и не берут одно и то же.
+    """
+    due = (
+        select(table.c.id)
+        .where(
+            table.c.status == pending_status,
+            table.c.next_attempt_at <= now,
+        )
+        .order_by(table.c.next_attempt_at, table.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(table)
+        .where(table.c.id.in_(due.scalar_subquery()))
+        .values(
+            attempts=table.c.attempts + 1,
+            next_attempt_at=now + lease,
+        )
+        .returning(*returning)
+    )
+    result = await db.execute(stmt)
+    return sorted(result.all(), key=lambda row: row.id)
+
+
+async def mark_failed(
+    db: AsyncSession,
+    table: Table,
+    exhausted_status: Enum,
+    entry_id: int,
+    error: str,
+    retry_at: datetime | None,
+) -> None:
+    """
+    Записывает ошибку попытки. retry_at=None — попытки исчерпаны, строка
+    уходит в exhausted_status; иначе ждёт следующей попытки до retry_at.
+    """
+    values: dict[str, Any] = {"last_error": error[:MAX_ERROR_LENGTH]}
+    if retry_at is None:
+        values["status"] = exhausted_status
+    else:
+        values["next_attempt_at"] = retry_at
+    await db.execute(update(table).where(table.c.id == entry_id).values(**values))
@@ -1,11 +1,24 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from datetime import datetime
 from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    bindparam,
+    case,
+    column,
+    literal,
+    or_,
+    select,
+    update,
+    values,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.app.db.dialect import is_postgres, upsert_insert
 from src.app.models.user_models import User, UserRole
 
 
@@ -21,40 +34,127 @@ class UserRepository:
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def create_or_update_from_telegram(
+    async def get_or_create(
         self,
         telegram_id: int,
-        defaults: dict[str, Any],
+        defaults: dict[str, Any] | None = None,
+        refresh_fields: Sequence[str] = (),
+        referral_code: str | None = None,
     ) -> User:
-        user = await self.get_by_telegram_id(telegram_id)
-
-        if user:
-            for field, value in defaults.items():
-                if value is not None and hasattr(user, field):
-                    setattr(user, field, value)
-            user.last_bot_interaction_at = datetime.utcnow()
-            self.db.add(user)
-            await self.db.flush()
-            await self.db.refresh(user)
-            return user
-
-        user = User(
-            telegram_id=telegram_id,
-            role=defaults.get("role", UserRole.CHILD),
-            username=defaults.get("username"),
-            first_name=defaults.get("first_name"),
-            last_name=defaults.get("last_name"),
-            full_name=defaults.get("full_name"),
-            photo_url=defaults.get("photo_url"),
-            phone=defaults.get("phone"),
-            last_bot_interaction_at=datetime.utcnow(),
+        """
+        Возвращает пользователя по telegram_id, создавая его при необходимости,
+        одним INSERT ... ON CONFLICT (telegram_id) ... RETURNING.
+        Одновременные запросы (mini-app, бот, игра) не ловят нарушение
+        уникальности: проигравший просто получает уже созданную строку.
+
+        defaults — значения только для новой строки. refresh_fields — поля из
+        defaults, которые переписываются и у существующего пользователя
+        (в том числе на NULL: очищенный в Telegram username очищается и тут);
+        UPDATE выполняется, только если хоть одно из них действительно
+        изменилось. Если строка уже была и менять нечего, RETURNING пуст и
+        пользователь дочитывается обычным SELECT. referral_code — при вставке
+        ищется пригласивший: если он есть, пользователь создаётся ребёнком с
+        referrer_id; у существующих пользователей роль и referrer не меняются.
+        """
+        users = User.__table__
+        insert_values: dict[str, Any] = dict(defaults or {})
+        insert_values["telegram_id"] = telegram_id
+
+        if referral_code:
+            referrer_id = (
+                select(users.c.id)
+                .where(users.c.referral_code == referral_code)
+                .scalar_subquery()
+            )
+            default_role = insert_values.get("role", UserRole.PARENT)
+            insert_values["referrer_id"] = referrer_id
+            insert_values["role"] = case(
+                (referrer_id.isnot(None), literal(UserRole.CHILD, users.c.role.type)),
+                else_=literal(default_role, users.c.role.type),
+            )
+
+        stmt = upsert_insert(self.db, users).values(insert_values)
+        if refresh_fields:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[users.c.telegram_id],
+                set_={field: stmt.excluded[field] for field in refresh_fields},
+                where=or_(
+                    *(
+                        users.c[field].is_distinct_from(stmt.excluded[field])
+                        for field in refresh_fields
+                    )
+                ),
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[users.c.telegram_id])
+
+        result = await self.db.execute(
+            select(User)
+            .from_statement(stmt.returning(*users.c))
+            .execution_options(populate_existing=True)
         )
-        self.db.add(user)
-        await self.db.flush()
-        await self.db.refresh(user)
+        user = result.scalar_one_or_none()
+        if user is None:
+            # строка уже есть и не изменилась — ON CONFLICT её не вернул
+            user = await self.get_by_telegram_id(telegram_id)
         return user
 
-    async def touch_app_activity(self, user: User) -> None:
-        user.last_app_interaction_at = datetime.utcnow()
-        self.db.add(user)
-        await self.db.flush()
+    async def bulk_touch_activity(
+        self, column_name: str, stamps: dict[int, datetime]
+    ) -> None:
+        """
+        Проставляет колонку активности (last_app_interaction_at /
+        last_bot_interaction_at) сразу многим пользователям:
+        на PostgreSQL — одним UPDATE ... FROM (VALUES ...), иначе executemany.
+        """
+        if not stamps:
+            return
+
+        users = User.__table__
+        target = users.c[column_name]
+        # updated_at не трогаем: отметка активности — не изменение профиля
+
+        if is_postgres(self.db):
+            activity = values(
+                column("user_id", Integer),
+                column("stamp", DateTime(timezone=True)),
+                name="activity",
+            ).data(list(stamps.items()))
+            await self.db.execute(
+                update(users)
+                .where(users.c.id == activity.c.user_id)
+                .values(
+                    {target: activity.c.stamp, users.c.updated_at: users.c.updated_at}
+                )
+            )
+            return
+
+        await self.db.execute(
+            update(users)
+            .where(users.c.id == bindparam("user_id"))
+            .values(
+                {target: bindparam("stamp"), users.c.updated_at: users.c.updated_at}
+            ),
+            [
+                {"user_id": user_id, "stamp": stamp}
+                for user_id, stamp in stamps.items()
+            ],
+        )
+
+    async def subscribed_telegram_ids(
+        self, after: int | None, limit: int
+    ) -> list[int]:
+        """
+        Следующая страница telegram_id подписчиков по возрастанию, начиная
+        строго после after (keyset по уникальному индексу telegram_id).
+        Читается только колонка, ORM-объекты не создаются.
+        """
+        stmt = (
+            select(User.telegram_id)
+            .where(User.is_subscribed.is_(True))
+            .order_by(User.telegram_id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(User.telegram_id > after)
+        return list(await self.db.scalars(stmt))
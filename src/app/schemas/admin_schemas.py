@@ -0,0 +1,83 @@
+# src/app/schemas/admin_schemas.py
+from __future__ import annotations
+
+from datetime import datetime
+
+from pydantic import BaseModel, Field, model_validator
+
+from src.app.models.balance_models import TransactionType
+
+
+class UserDriftResponse(BaseModel):
+  user_id: int
+  balance: int
+  ledger: int
+  drift: int
+
+
+class ReconciliationReportResponse(BaseModel):
+  started_at: datetime
+  finished_at: datetime | None = None
+  users_checked: int
+  rows_checked: int
+  drifted_users: int
+  drift_abs_total: int
+  repaired: bool
+  # не больше первых 100 расхождений
+  drifts: list[UserDriftResponse]
+
+
+class BonusAwardItem(BaseModel):
+  telegram_id: int
+  delta: int
+  description: str | None = Field(default=None, max_length=512)
+
+
+class BonusAwardRequest(BaseModel):
+  type: TransactionType = TransactionType.ADMIN_ADJUST
+  allow_negative: bool = False
+  # начисления списком или CSV с заголовком telegram_id,delta[,description]
+  awards: list[BonusAwardItem] | None = None
+  csv: str | None = None
+
+  @model_validator(mode="after")
+  def _one_source(self) -> "BonusAwardRequest":
+    if (self.awards is None) == (self.csv is None):
+      raise ValueError("Exactly one of awards or csv is required")
+    return self
+
+
+class BonusAwardResponse(BaseModel):
+  total: int
+  applied: int
+  unknown_telegram_ids: list[int]
+  failed_count: int
+  # диапазоны номеров входных строк (с 1, включительно) по пачкам
+  applied_rows: list[tuple[int, int]]
+  failed_rows: list[tuple[int, int]]
+  errors: list[str]
+
+
+class AmoOutboxEntryResponse(BaseModel):
+  id: int
+  order_id: int | None
+  attempts: int
+  last_error: str | None
+  created_at: datetime
+
+
+class AmoOutboxStatsResponse(BaseModel):
+  pending: int
+  sent: int
+  dead: int
+  # последние DEAD-строки, не больше 100
+  dead_entries: list[AmoOutboxEntryResponse]
+
+
+class AmoOutboxRequeueRequest(BaseModel):
+  # None — вернуть в очередь все DEAD-строки
+  ids: list[int] | None = None
+
+
+class AmoOutboxRequeueResponse(BaseModel):
+  requeued: int
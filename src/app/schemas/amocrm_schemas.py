@@ -25,6 +25,11 @@ class TransactionWebhook(BaseModel):
     class Config:
         extra = "ignore"
 
+    @property
+    def event_id(self) -> str:
+        """Ключ идемпотентности события: тип и id транзакции."""
+        return f"{self.event}:{self.transaction.id}"
+
 
 class StoredTransaction(BaseModel):
     id: int
@@ -1,7 +1,7 @@
 # src/app/schemas/miniapp_schemas.py
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Literal
 
 from pydantic import BaseModel, ConfigDict, Field
@@ -90,3 +90,34 @@ class UserInfoResponse(BaseModel):
   username: str | None = None
   created_at: datetime
   updated_at: datetime
+
+
+class SessionRequest(BaseModel):
+  # строка Telegram.WebApp.initData как есть
+  init_data: str
+
+
+class SessionResponse(BaseModel):
+  token: str
+  token_type: Literal["bearer"] = "bearer"
+  expires_in: int
+  user_id: int
+  role: str
+
+
+class BalanceTransactionItem(BaseModel):
+  id: int
+  delta: int
+  resulting_balance: int
+  type: str
+  description: str | None = None
+  # у агрегированной строки кликов — сколько начислений в ней и за какой день
+  entries_count: int = 1
+  period_date: date | None = None
+  created_at: datetime
+
+
+class BalanceTransactionsPage(BaseModel):
+  items: list[BalanceTransactionItem]
+  # передать в ?cursor= за следующей страницей; None — страниц больше нет
+  next_cursor: str | None = None
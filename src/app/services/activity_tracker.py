@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.repositories.user_repo import UserRepository
+
+logger = get_logger(__name__)
+
+APP_ACTIVITY = "last_app_interaction_at"
+BOT_ACTIVITY = "last_bot_interaction_at"
+
+
+class ActivityTracker:
+    """
+    Отложенная запись last_app_interaction_at / last_bot_interaction_at.
+
+    Отметки копятся в памяти и раз в flush_interval_seconds пишутся одним
+    UPDATE на колонку для всех «грязных» пользователей. Если отметка
+    пользователя уже записана не раньше min_interval_seconds назад, новая
+    не пишется вовсе: напоминания о неактивности смотрят на эти поля с
+    точностью до дня. При остановке приложения буфер сбрасывается.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        flush_interval_seconds: float | None = None,
+        min_interval_seconds: float | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self.flush_interval = (
+            flush_interval_seconds
+            if flush_interval_seconds is not None
+            else settings.activity_flush_interval_seconds
+        )
+        self.min_interval = (
+            min_interval_seconds
+            if min_interval_seconds is not None
+            else settings.activity_min_interval_seconds
+        )
+
+        # колонка → user_id → время последнего взаимодействия (ещё не записано)
+        self._dirty: dict[str, dict[int, datetime]] = {
+            APP_ACTIVITY: {},
+            BOT_ACTIVITY: {},
+        }
+        # колонка → user_id → monotonic-время последней записи в БД
+        self._persisted: dict[str, dict[int, float]] = {
+            APP_ACTIVITY: {},
+            BOT_ACTIVITY: {},
+        }
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Не удалось записать отметки активности при остановке")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось записать отметки активности")
+
+    # ---------- отметки ----------
+
+    def touch_app(self, user_id: int) -> None:
+        self._touch(APP_ACTIVITY, user_id)
+
+    def touch_bot(self, user_id: int) -> None:
+        self._touch(BOT_ACTIVITY, user_id)
+
+    def _touch(self, column: str, user_id: int) -> None:
+        persisted_at = self._persisted[column].get(user_id)
+        if persisted_at is not None and time.monotonic() - persisted_at < self.min_interval:
+            metrics.inc("activity_touch_skipped")
+            return
+        self._dirty[column][user_id] = datetime.now(timezone.utc)
+
+    # ---------- запись в БД ----------
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            batches = {
+                column: stamps for column, stamps in self._dirty.items() if stamps
+            }
+            if not batches:
+                return
+            for column in batches:
+                self._dirty[column] = {}
+
+            try:
+                async with session_scope("activity.flush", self._session_factory) as db:
+                    user_repo = UserRepository(db)
+                    for column, stamps in batches.items():
+                        await user_repo.bulk_touch_activity(column, stamps)
+                    await db.commit()
+            except Exception:
+                # возвращаем отметки, не затирая более свежие
+                for column, stamps in batches.items():
+                    for user_id, stamp in stamps.items():
+                        self._dirty[column].setdefault(user_id, stamp)
+                raise
+
+            now = time.monotonic()
+            for column, stamps in batches.items():
+                persisted = self._persisted[column]
+                # старые записи уже не влияют на пропуск — не держим их в памяти
+                for user_id in [
+                    uid for uid, at in persisted.items() if now - at >= self.min_interval
+                ]:
+                    del persisted[user_id]
+                for user_id in stamps:
+                    persisted[user_id] = now
+                metrics.inc("activity_rows_written", len(stamps))
+
+
+activity_tracker = ActivityTracker()
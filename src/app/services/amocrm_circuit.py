@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import time
+from enum import Enum
+from typing import Any, Callable
+
+from src.app.core.config import settings
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class AmoCRMUnavailable(RuntimeError):
+    """Автомат разомкнут: запрос к AmoCRM не отправлялся."""
+
+    def __init__(self, retry_in: float) -> None:
+        super().__init__(f"AmoCRM circuit is open, retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class AmoCRMCircuitBreaker:
+    """
+    Автоматический выключатель на запросы к AmoCRM.
+
+    После failure_threshold сбоев подряд (таймауты, сетевые ошибки, 5xx)
+    автомат размыкается, и на reset_timeout все запросы сразу получают
+    AmoCRMUnavailable, не дожидаясь таймаута httpx. Затем он полуоткрыт:
+    пропускается один пробный запрос — успех замыкает автомат, сбой снова
+    размыкает. Если пробный запрос так и не отчитался (отменён), через
+    reset_timeout пропускается следующий.
+
+    Слушатели (add_listener) узнают о смене состояния — так outbox после
+    восстановления сразу доотправляет отложенные заказы. Состояние видно в
+    /health и в метрике amocrm_circuit_state (0 — замкнут, 1 — полуоткрыт,
+    2 — разомкнут).
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int | None = None,
+        reset_timeout_seconds: float | None = None,
+    ) -> None:
+        self.failure_threshold = (
+            failure_threshold or settings.amocrm_circuit_failure_threshold
+        )
+        self.reset_timeout = (
+            reset_timeout_seconds
+            if reset_timeout_seconds is not None
+            else settings.amocrm_circuit_reset_timeout_seconds
+        )
+        self._listeners: list[Callable[[CircuitState], None]] = []
+        self.reset()
+
+    def reset(self) -> None:
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: float | None = None
+        self._last_error: str | None = None
+        metrics.set_gauge("amocrm_circuit_state", 0)
+
+    def add_listener(self, callback: Callable[[CircuitState], None]) -> None:
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._set_state(CircuitState.HALF_OPEN)
+        return self._state
+
+    def retry_in(self) -> float:
+        """Через сколько секунд автомат пропустит пробный запрос."""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow(self) -> None:
+        """Пропускает запрос или бросает AmoCRMUnavailable."""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return
+        now = time.monotonic()
+        if state == CircuitState.HALF_OPEN and (
+            self._probe_started_at is None
+            or now - self._probe_started_at >= self.reset_timeout
+        ):
+            self._probe_started_at = now
+            return
+        metrics.inc("amocrm_circuit_rejected")
+        raise AmoCRMUnavailable(self.retry_in() or self.reset_timeout)
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probe_started_at = None
+        if self._state != CircuitState.CLOSED:
+            logger.info("AmoCRM снова отвечает, автомат замкнут")
+            self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self, error: str) -> None:
+        self._failures += 1
+        self._last_error = error
+        if self._state == CircuitState.HALF_OPEN or (
+            self._state == CircuitState.CLOSED
+            and self._failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def snapshot(self) -> dict[str, Any]:
+        state = self.state
+        return {
+            "state": state.value,
+            "failures": self._failures,
+            "retry_in_seconds": round(self.retry_in(), 1),
+            "last_error": self._last_error,
+        }
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._probe_started_at = None
+        metrics.inc("amocrm_circuit_opened")
+        logger.warning(
+            f"AmoCRM: {self._failures} сбоев подряд, автомат разомкнут на "
+            f"{self.reset_timeout} с (последняя ошибка: {self._last_error})"
+        )
+        self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state == self._state and state != CircuitState.OPEN:
+            return
+        self._state = state
+        metrics.set_gauge(
+            "amocrm_circuit_state",
+            {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}[
+                state
+            ],
+        )
+        for callback in self._listeners:
+            try:
+                callback(state)
+            except Exception:
+                logger.exception("Слушатель автомата AmoCRM упал")
+
+
+amocrm_circuit_breaker = AmoCRMCircuitBreaker()
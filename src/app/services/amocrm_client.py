@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import tempfile
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator
 
 import httpx
 from pydantic import BaseModel, ValidationError
@@ -12,9 +15,35 @@ from urllib.parse import urlencode
 
 from src.app.core.config import settings
 from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.services.amocrm_circuit import (
+    AmoCRMCircuitBreaker,
+    amocrm_circuit_breaker,
+)
+from src.app.services.amocrm_http import amocrm_http
+from src.app.services.amocrm_rate_limit import (
+    AmoCRMRateLimiter,
+    amocrm_rate_limiter,
+    backoff_delay,
+    retry_after_seconds,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки файла токена нет
+    fcntl = None
 
 logger = get_logger(__name__)
 
+# /leads/complex принимает не больше 50 сделок за запрос
+LEADS_COMPLEX_MAX_BATCH = 50
+# больше 250 элементов на страницу списки API не отдают
+LEADS_PAGE_MAX_LIMIT = 250
+
+# при этих ошибках запрос до AmoCRM не дошёл — повтор безопасен для любого метода
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
 
 class AmoCRMToken(BaseModel):
     access_token: str
@@ -36,6 +65,17 @@ class AmoCRMToken(BaseModel):
 
 
 class AmoCRMTokenStorage:
+    """
+    Файл с токеном AmoCRM, общий для всех воркеров.
+
+    Токен держится в памяти и перечитывается с диска, только когда у файла
+    изменились mtime или размер (файл обновил другой процесс). Запись
+    атомарная: временный файл рядом и os.replace, так что читатель никогда
+    не видит недописанный JSON и читать можно без блокировки. Обновление
+    токена между процессами сериализуется блокировкой locked() на соседнем
+    .lock-файле (flock; на платформах без fcntl блокировки нет).
+    """
+
     def __init__(self, path: Path | None = None) -> None:
         if path is None:
             storage_root = (
@@ -46,30 +86,101 @@ class AmoCRMTokenStorage:
             path = Path(storage_root) / "amocrm_token.json"
 
         self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
         self.path.parent.mkdir(parents=True, exist_ok=True)
 
+        self._cached: AmoCRMToken | None = None
+        self._cached_stamp: tuple[int, int] | None = None
+
+    def _stamp(self) -> tuple[int, int] | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     def load(self) -> AmoCRMToken | None:
-        if not self.path.exists():
+        stamp = self._stamp()
+        if stamp is None:
+            self._cached = None
+            self._cached_stamp = None
             return None
+        if stamp == self._cached_stamp:
+            return self._cached
+
         try:
             raw = self.path.read_text(encoding="utf-8")
             data = json.loads(raw)
-            return AmoCRMToken.model_validate(data)
+            token = AmoCRMToken.model_validate(data)
         except Exception as e:
             logger.error("Failed to load AmoCRM token file: %s", e, exc_info=True)
             return None
 
+        self._cached = token
+        self._cached_stamp = stamp
+        return token
+
     def save(self, token: AmoCRMToken) -> None:
-        self.path.write_text(token.model_dump_json(), encoding="utf-8")
+        fd, tmp_name = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(token.model_dump_json())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, self.path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_name)
+            raise
+
+        self._cached = token
+        self._cached_stamp = self._stamp()
         logger.info(
             "AmoCRM access token saved to %s, expires_at=%s",
             self.path,
             token.expires_at.isoformat(),
         )
 
+    @asynccontextmanager
+    async def locked(self) -> AsyncIterator[None]:
+        """Эксклюзивная межпроцессная блокировка на время обновления токена."""
+        lock_file = open(self.lock_path, "a")
+        try:
+            if fcntl is not None:
+                # flock блокирующий — ждём его в потоке, не занимая event loop
+                await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+            yield
+        finally:
+            # закрытие файла снимает flock
+            lock_file.close()
+
 
 class AmoCRMClient:
-    def __init__(self) -> None:
+    """
+    Клиент AmoCRM API. HTTP-запросы идут через общий пул соединений
+    (amocrm_http), если не передан свой httpx.AsyncClient; токен
+    подставляется в заголовки каждого запроса. Все запросы проходят через
+    общий лимитер (amocrm_rate_limiter) и повторяются по правилам _send,
+    а пока AmoCRM недоступна, автомат (amocrm_circuit_breaker) отклоняет их
+    сразу с AmoCRMUnavailable.
+    """
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient | None = None,
+        rate_limiter: AmoCRMRateLimiter | None = None,
+        breaker: AmoCRMCircuitBreaker | None = None,
+    ) -> None:
+        self._http = http
+        self.rate_limiter = (
+            rate_limiter if rate_limiter is not None else amocrm_rate_limiter
+        )
+        self.breaker = breaker if breaker is not None else amocrm_circuit_breaker
+        self.max_retries = settings.amocrm_http_max_retries
+        self.backoff_base = settings.amocrm_http_backoff_base_seconds
+        self.backoff_max = settings.amocrm_http_backoff_max_seconds
         base_url = ""
 
         try:
@@ -106,6 +217,14 @@ class AmoCRMClient:
             )
 
         self.token_storage = AmoCRMTokenStorage()
+        self.refresh_margin = timedelta(
+            seconds=settings.amocrm_token_refresh_margin_seconds
+        )
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http if self._http is not None else amocrm_http.client
 
     def build_authorization_url(self, state: str | None = None) -> str:
         if not self.client_id or not self.redirect_uri:
@@ -138,18 +257,17 @@ class AmoCRMClient:
 
         logger.info("AmoCRM: exchange_code_for_tokens payload: %s", payload)
 
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.post(url, json=payload)
+        resp = await self._send("POST", url, json=payload)
 
-            body_text = resp.text
-            logger.error(
-                "AmoCRM /oauth2/access_token response: status=%s, body=%s",
-                resp.status_code,
-                body_text,
-            )
+        body_text = resp.text
+        logger.error(
+            "AmoCRM /oauth2/access_token response: status=%s, body=%s",
+            resp.status_code,
+            body_text,
+        )
 
-            resp.raise_for_status()
-            data = resp.json()
+        resp.raise_for_status()
+        data = resp.json()
 
         try:
             token = AmoCRMToken.from_token_response(data)
@@ -157,7 +275,8 @@ class AmoCRMClient:
             logger.error("Failed to parse AmoCRM token response: %s, data=%s", e, data)
             raise
 
-        self.token_storage.save(token)
+        async with self.token_storage.locked():
+            self.token_storage.save(token)
         return token
 
     async def refresh_access_token(self, refresh_token: str) -> AmoCRMToken:
@@ -178,105 +297,234 @@ class AmoCRMClient:
             "redirect_uri": self.redirect_uri,
         }
 
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.post(url, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await self._send("POST", url, json=payload)
+        resp.raise_for_status()
+        data = resp.json()
 
         token = AmoCRMToken.from_token_response(data)
         self.token_storage.save(token)
         return token
 
     async def get_valid_token(self) -> AmoCRMToken:
+        """
+        Текущий токен из памяти (файл перечитывается, только если изменился).
+        За refresh_margin до истечения токен обновляется; параллельные вызовы
+        ждут одно и то же обновление. Если заблаговременное обновление не
+        удалось, а старый токен ещё действует, возвращается старый.
+        """
         token = self.token_storage.load()
-        now = datetime.now(timezone.utc)
+        if token is None:
+            raise RuntimeError(
+                "AmoCRM access token is not configured. "
+                "Сначала пройди OAuth: GET /api/v1/amocrm/oauth/start, "
+                "затем /api/v1/amocrm/oauth/callback?code=... "
+                "(callback должен вызывать exchange_code_for_tokens)."
+            )
 
-        if token and token.expires_at > now:
+        now = datetime.now(timezone.utc)
+        if token.expires_at - self.refresh_margin > now:
             return token
 
-        if token:
-            logger.info("Refreshing expired AmoCRM access token...")
-            return await self.refresh_access_token(token.refresh_token)
+        try:
+            return await self._refresh_single_flight()
+        except Exception:
+            if token.expires_at > now:
+                logger.warning(
+                    "AmoCRM token refresh failed, current token is still valid",
+                    exc_info=True,
+                )
+                return token
+            raise
 
-        raise RuntimeError(
-            "AmoCRM access token is not configured. "
-            "Сначала пройди OAuth: GET /api/v1/amocrm/oauth/start, "
-            "затем /api/v1/amocrm/oauth/callback?code=... "
-            "(callback должен вызывать exchange_code_for_tokens)."
-        )
+    async def _refresh_single_flight(self) -> AmoCRMToken:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_shared())
+        # shield: отмена одного ожидающего не отменяет общее обновление
+        return await asyncio.shield(self._refresh_task)
+
+    async def _refresh_shared(self) -> AmoCRMToken:
+        async with self.token_storage.locked():
+            # пока ждали блокировку, токен мог обновить другой воркер
+            token = self.token_storage.load()
+            if token is None:
+                raise RuntimeError("AmoCRM token file disappeared during refresh")
+            if token.expires_at - self.refresh_margin > datetime.now(timezone.utc):
+                return token
+
+            logger.info("Refreshing AmoCRM access token...")
+            return await self.refresh_access_token(token.refresh_token)
 
-    async def _get_authorized_client(self) -> httpx.AsyncClient:
+    async def _api_request(
+        self,
+        method: str,
+        path: str,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Запрос к /api/v4 с заголовками авторизации текущего токена."""
         token = await self.get_valid_token()
         headers = {
             "Authorization": f"{token.token_type} {token.access_token}",
             "Content-Type": "application/json",
         }
-        return httpx.AsyncClient(
-            base_url=f"{self.base_url}/api/v4",
+        return await self._send(
+            method,
+            f"{self.base_url}/api/v4{path}",
             headers=headers,
-            timeout=20.0,
+            **kwargs,
         )
 
-    async def create_lead_with_contact(
-        self,
+    async def _send(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        Запрос через общий лимитер с повторами.
+
+        429 повторяется всегда (AmoCRM запрос не обработала): пауза берётся из
+        Retry-After, а без него — экспоненциальная с джиттером, и на это время
+        придерживаются все запросы через лимитер. Ошибки, при которых запрос
+        точно не ушёл (соединение, ожидание пула), повторяются для любых
+        методов; 5xx и прочие сетевые ошибки — только для GET, потому что POST
+        (создание сделки) мог успеть выполниться. Когда попытки кончились,
+        возвращается последний ответ или пробрасывается последняя ошибка.
+
+        Сетевые ошибки, таймауты и 5xx — сбои для автомата; любой другой
+        ответ (и 429 — AmoCRM жива, просто притормаживает) его замыкает.
+        Разомкнутый автомат прерывает и цепочку повторов.
+        """
+        idempotent = method.upper() in ("GET", "HEAD")
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            await self.rate_limiter.acquire()
+            try:
+                resp = await self.http.request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                self.breaker.record_failure(f"{type(exc).__name__}: {exc}")
+                if attempt >= self.max_retries or not (
+                    idempotent or isinstance(exc, NOT_SENT_ERRORS)
+                ):
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                reason = f"{type(exc).__name__}: {exc}"
+            else:
+                if resp.status_code >= 500:
+                    self.breaker.record_failure(f"status {resp.status_code}")
+                else:
+                    self.breaker.record_success()
+
+                if resp.status_code == 429:
+                    metrics.inc("amocrm_http_429")
+                    retry_after = retry_after_seconds(resp)
+                    delay = (
+                        retry_after
+                        if retry_after is not None
+                        else backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                    )
+                    self.rate_limiter.pause(delay)
+                elif idempotent and resp.status_code in RETRY_STATUSES:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                else:
+                    return resp
+                if attempt >= self.max_retries:
+                    return resp
+                reason = f"status {resp.status_code}"
+
+            attempt += 1
+            metrics.inc("amocrm_http_retries")
+            logger.warning(
+                "AmoCRM %s %s: %s, retry %s/%s in %.2fs",
+                method,
+                url,
+                reason,
+                attempt,
+                self.max_retries,
+                delay,
+            )
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def build_complex_lead(
         name: str,
         price: int,
         phone: str | None,
-        lead_custom_fields: list[dict] | None = None,
-        contact_custom_fields: list[dict] | None = None,
         tags: list[str] | None = None,
-    ) -> int | None:
-        client = await self._get_authorized_client()
-        try:
-            contact_payload: dict[str, Any] = {}
-
-            if phone:
-                contact_payload["custom_fields_values"] = [
-                    {
-                        "field_code": "PHONE",
-                        "values": [{"value": phone}],
-                    }
-                ]
-
-            tags_payload = [{"name": t} for t in (tags or [])]
-
-            lead_payload: dict[str, Any] = {
-                "name": name,
-                "price": price,
-            }
-            if tags_payload:
-                lead_payload["tags"] = tags_payload
-
-            payload = [
+        request_id: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Элемент запроса /leads/complex: сделка со встроенным контактом.
+        request_id AmoCRM возвращает в ответе — по нему сопоставляются
+        сделки пачки.
+        """
+        contact_payload: dict[str, Any] = {}
+
+        if phone:
+            contact_payload["custom_fields_values"] = [
                 {
-                    **lead_payload,
-                    "_embedded": {
-                        "contacts": [contact_payload] if contact_payload else [],
-                    },
+                    "field_code": "PHONE",
+                    "values": [{"value": phone}],
                 }
             ]
 
-            resp = await client.post("/leads/complex", json=payload)
+        tags_payload = [{"name": t} for t in (tags or [])]
 
-            if resp.status_code >= 400:
-                logger.error(
-                    "AmoCRM /leads/complex error: status=%s, body=%s",
-                    resp.status_code,
-                    resp.text,
-                )
+        lead_payload: dict[str, Any] = {
+            "name": name,
+            "price": price,
+        }
+        if tags_payload:
+            lead_payload["tags"] = tags_payload
+        if request_id is not None:
+            lead_payload["request_id"] = request_id
+
+        return {
+            **lead_payload,
+            "_embedded": {
+                "contacts": [contact_payload] if contact_payload else [],
+            },
+        }
 
-            resp.raise_for_status()
-            data = resp.json()
+    async def create_leads_complex(
+        self,
+        leads: list[dict[str, Any]],
+    ) -> list[dict[str, Any]]:
+        """
+        Создаёт до LEADS_COMPLEX_MAX_BATCH сделок одним запросом.
+        Возвращает элементы ответа AmoCRM (id, contact_id, request_id, ...).
+        Запрос атомарный: при ошибке валидации хотя бы одной сделки AmoCRM
+        отвечает 400 и не создаёт ни одной.
+        """
+        if len(leads) > LEADS_COMPLEX_MAX_BATCH:
+            raise ValueError(
+                f"/leads/complex accepts at most {LEADS_COMPLEX_MAX_BATCH} leads"
+            )
+
+        resp = await self._api_request("POST", "/leads/complex", json=leads)
+
+        if resp.status_code >= 400:
+            logger.error(
+                "AmoCRM /leads/complex error: status=%s, body=%s",
+                resp.status_code,
+                resp.text,
+            )
 
-            if isinstance(data, list) and data:
-                lead = data[0]
-                lead_id = lead.get("id")
-                logger.info("Created AmoCRM lead id=%s", lead_id)
-                return int(lead_id) if lead_id is not None else None
+        resp.raise_for_status()
+        data = resp.json()
 
+        if not isinstance(data, list):
             logger.error("Unexpected response from AmoCRM /leads/complex: %s", data)
-            return None
+            return []
+        return data
 
+    async def create_lead_with_contact(
+        self,
+        name: str,
+        price: int,
+        phone: str | None,
+        lead_custom_fields: list[dict] | None = None,
+        contact_custom_fields: list[dict] | None = None,
+        tags: list[str] | None = None,
+    ) -> int | None:
+        lead = self.build_complex_lead(name=name, price=price, phone=phone, tags=tags)
+        try:
+            data = await self.create_leads_complex([lead])
         except httpx.HTTPStatusError as e:
             logger.error(
                 "HTTP error during AmoCRM lead creation: %s, response=%s",
@@ -289,5 +537,53 @@ class AmoCRMClient:
                 "Unexpected error during AmoCRM lead creation: %s", e, exc_info=True
             )
             raise
-        finally:
-            await client.aclose()
+
+        if not data:
+            logger.error("Empty response from AmoCRM /leads/complex")
+            return None
+
+        lead_id = data[0].get("id")
+        logger.info("Created AmoCRM lead id=%s", lead_id)
+        return int(lead_id) if lead_id is not None else None
+
+    async def list_leads(
+        self,
+        updated_from: int,
+        page: int = 1,
+        limit: int = LEADS_PAGE_MAX_LIMIT,
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """
+        Страница сделок, изменённых не раньше updated_from (unix-время,
+        filter[updated_at][from] включительно), по возрастанию updated_at.
+        Возвращает сделки и признак, что есть следующая страница.
+        """
+        resp = await self._api_request(
+            "GET",
+            "/leads",
+            params={
+                "filter[updated_at][from]": updated_from,
+                "order[updated_at]": "asc",
+                "page": page,
+                "limit": min(limit, LEADS_PAGE_MAX_LIMIT),
+            },
+        )
+        # пустой результат AmoCRM отдаёт как 204 без тела
+        if resp.status_code == 204:
+            return [], False
+        resp.raise_for_status()
+
+        data = resp.json()
+        leads = data.get("_embedded", {}).get("leads", [])
+        has_next = "next" in data.get("_links", {})
+        return leads, has_next
+
+
+_shared_client: AmoCRMClient | None = None
+
+
+def get_amocrm_client() -> AmoCRMClient:
+    """Общий на процесс AmoCRMClient поверх пула amocrm_http."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AmoCRMClient()
+    return _shared_client
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import httpx
+
+from src.app.core.config import settings
+from src.app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class AmoCRMHttp:
+    """
+    Общий на процесс httpx.AsyncClient для запросов к AmoCRM.
+
+    Один пул соединений с keep-alive вместо нового клиента (и нового
+    TCP+TLS рукопожатия) на каждый запрос. Клиент не знает про токен:
+    Authorization проставляет AmoCRMClient на каждый запрос, так что
+    обновление токена не требует пересоздания клиента.
+
+    Создаётся и закрывается в lifespan приложения; вне его (скрипты,
+    тесты) клиент создаётся лениво при первом обращении, закрыть его
+    можно через stop().
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float | None = None,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry_seconds: float | None = None,
+        http2: bool | None = None,
+    ) -> None:
+        self.timeout = timeout_seconds or settings.amocrm_http_timeout_seconds
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.amocrm_http_max_connections,
+            max_keepalive_connections=(
+                max_keepalive_connections
+                or settings.amocrm_http_max_keepalive_connections
+            ),
+            keepalive_expiry=(
+                keepalive_expiry_seconds
+                if keepalive_expiry_seconds is not None
+                else settings.amocrm_http_keepalive_expiry_seconds
+            ),
+        )
+        self.http2 = http2 if http2 is not None else settings.amocrm_http2
+        self._client: httpx.AsyncClient | None = None
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2 and not _http2_available():
+            # HTTP/2 в httpx — опциональная зависимость (пакет h2)
+            logger.warning("AmoCRM: HTTP/2 включён, но пакет h2 не установлен")
+            http2 = False
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=http2,
+        )
+
+
+amocrm_http = AmoCRMHttp()
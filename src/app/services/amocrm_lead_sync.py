@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+
+from sqlalchemy import case, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.db.dialect import upsert_insert
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.models.amocrm_models import SyncCursor
+from src.app.models.shop_models import Order, OrderStatus
+from src.app.services.amocrm_circuit import AmoCRMUnavailable
+from src.app.services.amocrm_client import AmoCRMClient, get_amocrm_client
+
+logger = get_logger(__name__)
+
+CURSOR_NAME = "amocrm_leads"
+# синхронизация только закрывает незавершённые заказы, оплаченные не трогает
+OPEN_STATUSES = (OrderStatus.NEW, OrderStatus.PENDING_PAYMENT)
+
+
+class AmoCRMLeadSync:
+    """
+    Фоновая сверка статусов заказов со сделками AmoCRM — на случай
+    потерянных вебхуков транзакций.
+
+    Каждый прогон читает сделки, изменённые с сохранённого курсора
+    (sync_cursors, filter[updated_at][from]), страницами по page_size по
+    возрастанию updated_at. Сделки в «оплаченных» и «отменённых» статусах
+    одним UPDATE на страницу переводят свои заказы (поиск по индексу
+    amocrm_lead_id) из NEW/PENDING_PAYMENT в PAID/CANCELED; курсор
+    сдвигается тем же коммитом. Граница from включительная, поэтому сделки
+    на границе страниц читаются повторно — это безвредно. Запросы идут через
+    общий AmoCRMClient, то есть через общий лимитер.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        client: AmoCRMClient | None = None,
+        interval_seconds: float | None = None,
+        page_size: int | None = None,
+        lookback_seconds: int | None = None,
+        paid_status_ids: Iterable[int] | None = None,
+        canceled_status_ids: Iterable[int] | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._client = client
+        self.interval = (
+            interval_seconds
+            if interval_seconds is not None
+            else settings.amocrm_lead_sync_interval_seconds
+        )
+        self.page_size = page_size or settings.amocrm_lead_sync_page_size
+        self.lookback = timedelta(
+            seconds=lookback_seconds
+            if lookback_seconds is not None
+            else settings.amocrm_lead_sync_lookback_seconds
+        )
+        self.target_statuses: dict[int, OrderStatus] = {
+            **{
+                status_id: OrderStatus.CANCELED
+                for status_id in (
+                    canceled_status_ids
+                    if canceled_status_ids is not None
+                    else settings.amocrm_lead_sync_canceled_status_ids
+                )
+            },
+            **{
+                status_id: OrderStatus.PAID
+                for status_id in (
+                    paid_status_ids
+                    if paid_status_ids is not None
+                    else settings.amocrm_lead_sync_paid_status_ids
+                )
+            },
+        }
+        self._task: asyncio.Task | None = None
+
+    @property
+    def client(self) -> AmoCRMClient:
+        return self._client if self._client is not None else get_amocrm_client()
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except AmoCRMUnavailable as exc:
+                # прочитанные страницы уже сохранены курсором, продолжим с него
+                logger.info(f"Сверка сделок AmoCRM отложена: {exc}")
+            except Exception:
+                logger.exception("Не удалось сверить статусы сделок AmoCRM")
+            await asyncio.sleep(self.interval)
+
+    # ---------- сверка ----------
+
+    async def run_once(self) -> int:
+        """Читает сделки с курсора до конца, возвращает число обновлённых заказов."""
+        cursor = await self._load_cursor()
+        page = 1
+        updated = 0
+        with metrics.timer("amocrm_lead_sync"):
+            while True:
+                leads, has_next = await self.client.list_leads(
+                    cursor, page=page, limit=self.page_size
+                )
+                metrics.inc("amocrm_lead_sync_leads", len(leads))
+                newest = max(
+                    (int(lead.get("updated_at") or 0) for lead in leads),
+                    default=cursor,
+                )
+                updated += await self._apply_page(leads, max(newest, cursor))
+                if not has_next:
+                    break
+                if newest > cursor:
+                    # keyset: следующая страница — первая страница с нового курсора
+                    cursor, page = newest, 1
+                else:
+                    # вся страница с одним updated_at — листаем дальше по номеру
+                    page += 1
+
+        if updated:
+            metrics.inc("amocrm_lead_sync_updated", updated)
+            logger.info(f"Сверка сделок AmoCRM: обновлено заказов: {updated}")
+        return updated
+
+    async def _load_cursor(self) -> int:
+        async with session_scope("amocrm_lead_sync", self._session_factory) as db:
+            value = await db.scalar(
+                select(SyncCursor.value).where(SyncCursor.name == CURSOR_NAME)
+            )
+        if value is not None:
+            return value
+        return int((datetime.now(timezone.utc) - self.lookback).timestamp())
+
+    async def _apply_page(self, leads: list[dict[str, Any]], cursor: int) -> int:
+        targets = {
+            int(lead["id"]): self.target_statuses[lead.get("status_id")]
+            for lead in leads
+            if lead.get("status_id") in self.target_statuses
+        }
+
+        orders = Order.__table__
+        async with session_scope("amocrm_lead_sync", self._session_factory) as db:
+            changed = 0
+            if targets:
+                result = await db.execute(
+                    update(orders)
+                    .where(
+                        orders.c.amocrm_lead_id.in_(list(targets)),
+                        orders.c.status.in_(OPEN_STATUSES),
+                    )
+                    .values(
+                        status=case(
+                            {
+                                lead_id: literal(status, orders.c.status.type)
+                                for lead_id, status in targets.items()
+                            },
+                            value=orders.c.amocrm_lead_id,
+                        )
+                    )
+                )
+                changed = result.rowcount or 0
+
+            cursors = SyncCursor.__table__
+            stmt = upsert_insert(db, cursors).values(
+                name=CURSOR_NAME,
+                value=cursor,
+                updated_at=datetime.now(timezone.utc),
+            )
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[cursors.c.name],
+                    set_={
+                        "value": stmt.excluded.value,
+                        "updated_at": stmt.excluded.updated_at,
+                    },
+                )
+            )
+            await db.commit()
+        return changed
+
+
+amocrm_lead_sync = AmoCRMLeadSync()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.models.amocrm_models import AmoOutboxKind
+from src.app.repositories.amocrm_outbox_repo import AmoOutboxRepository
+from src.app.services.amocrm_circuit import (
+    AmoCRMCircuitBreaker,
+    AmoCRMUnavailable,
+    CircuitState,
+    amocrm_circuit_breaker,
+)
+from src.app.services.amocrm_service import AmoCRMService
+
+logger = get_logger(__name__)
+
+
+class AmoCRMOutboxDispatcher:
+    """
+    Фоновая доставка заказов в AmoCRM из таблицы amocrm_outbox.
+
+    create_order пишет строку outbox в одной транзакции с заказом и лишь
+    будит диспетчер (notify), не дожидаясь AmoCRM. Разбуженный диспетчер
+    ждёт batch_window, чтобы заказы успели накопиться, и забирает созревшие
+    строки пачкой (claim с арендой, на PostgreSQL — SKIP LOCKED). Пачка
+    уходит в AmoCRM через AmoCRMService.push_orders (/leads/complex по 50
+    сделок) в одной короткой сессии, после чего каждая строка отмечается
+    по своему результату: SENT, повтор через base * 2^(attempts-1) (не
+    больше backoff_max) или, когда попытки кончились, DEAD — такие строки
+    возвращаются в очередь вручную через /api/admin/amocrm/outbox/requeue.
+
+    Доставка «хотя бы один раз»: повтор после сбоя между созданием сделки и
+    отметкой SENT не создаёт дубль, так как push_orders пропускает заказы
+    с уже проставленным amocrm_lead_id.
+
+    Пока автомат AmoCRM разомкнут, очередь не разбирается: строки ждут в
+    outbox, а отклонённые автоматом откладываются без траты попытки. Когда
+    автомат полуоткрыт, очередная пачка становится пробным запросом, а
+    после замыкания диспетчер сразу доотправляет накопившееся.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        interval_seconds: float | None = None,
+        batch_window_ms: int | None = None,
+        batch_size: int | None = None,
+        max_attempts: int | None = None,
+        backoff_base_seconds: float | None = None,
+        backoff_max_seconds: float | None = None,
+        lease_seconds: float | None = None,
+        service_factory: Callable[[AsyncSession], Any] = AmoCRMService,
+        breaker: AmoCRMCircuitBreaker | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._service_factory = service_factory
+        self.breaker = breaker if breaker is not None else amocrm_circuit_breaker
+        self.interval = (
+            interval_seconds
+            if interval_seconds is not None
+            else settings.amocrm_outbox_interval_seconds
+        )
+        self.batch_window = (
+            batch_window_ms
+            if batch_window_ms is not None
+            else settings.amocrm_outbox_batch_window_ms
+        ) / 1000
+        self.batch_size = batch_size or settings.amocrm_outbox_batch_size
+        self.max_attempts = max_attempts or settings.amocrm_outbox_max_attempts
+        self.backoff_base = (
+            backoff_base_seconds
+            if backoff_base_seconds is not None
+            else settings.amocrm_outbox_backoff_base_seconds
+        )
+        self.backoff_max = (
+            backoff_max_seconds
+            if backoff_max_seconds is not None
+            else settings.amocrm_outbox_backoff_max_seconds
+        )
+        self.lease = timedelta(
+            seconds=lease_seconds
+            if lease_seconds is not None
+            else settings.amocrm_outbox_lease_seconds
+        )
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self.breaker.add_listener(self._on_circuit_change)
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        """В очереди появилась строка — разобрать, не дожидаясь интервала."""
+        self._wakeup.set()
+
+    def _on_circuit_change(self, state: CircuitState) -> None:
+        # AmoCRM снова доступна — разобрать отложенное, не дожидаясь интервала
+        if state == CircuitState.CLOSED:
+            self.notify()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                processed = await self.run_once()
+            except Exception:
+                logger.exception("Не удалось разобрать outbox AmoCRM")
+                processed = 0
+
+            # полная пачка — возможно, в очереди есть ещё, идём сразу
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                continue
+            # разбудил новый заказ — даём соседним заказам попасть в ту же пачку
+            await asyncio.sleep(self.batch_window)
+            self._wakeup.clear()
+
+    # ---------- доставка ----------
+
+    def backoff(self, attempts: int) -> timedelta:
+        delay = self.backoff_base * 2 ** max(attempts - 1, 0)
+        return timedelta(seconds=min(delay, self.backoff_max))
+
+    async def run_once(self, now: datetime | None = None) -> int:
+        """Разбирает одну пачку созревших строк, возвращает их число."""
+        if now is None:
+            now = datetime.now(timezone.utc)
+        if self.breaker.state == CircuitState.OPEN:
+            return 0
+
+        async with session_scope("amocrm_outbox_claim", self._session_factory) as db:
+            entries = await AmoOutboxRepository(db).claim_due(
+                now, self.batch_size, self.lease
+            )
+            await db.commit()
+
+        if entries:
+            await self._deliver(entries, now)
+        return len(entries)
+
+    async def _deliver(self, entries: Sequence[Any], now: datetime) -> None:
+        async with session_scope("amocrm_outbox_send", self._session_factory) as db:
+            try:
+                with metrics.timer("amocrm_outbox_send"):
+                    errors = await self._send(db, entries)
+            except Exception as exc:
+                await db.rollback()
+                logger.exception("Outbox AmoCRM: пачка не отправлена")
+                errors = {entry.id: exc for entry in entries}
+
+            repo = AmoOutboxRepository(db)
+            sent = [entry.id for entry in entries if entry.id not in errors]
+            if sent:
+                await repo.mark_sent(sent, datetime.now(timezone.utc))
+                metrics.inc("amocrm_outbox_sent", len(sent))
+
+            unavailable = {
+                entry_id: exc
+                for entry_id, exc in errors.items()
+                if isinstance(exc, AmoCRMUnavailable)
+            }
+            if unavailable:
+                retry_in = max(exc.retry_in for exc in unavailable.values())
+                await repo.defer(unavailable, now + timedelta(seconds=retry_in))
+                metrics.inc("amocrm_outbox_deferred", len(unavailable))
+
+            for entry in entries:
+                exc = errors.get(entry.id)
+                if exc is None or isinstance(exc, AmoCRMUnavailable):
+                    continue
+                error = f"{type(exc).__name__}: {exc}"
+                if entry.attempts >= self.max_attempts:
+                    await repo.mark_failed(entry.id, error, retry_at=None)
+                    metrics.inc("amocrm_outbox_dead")
+                    logger.error(
+                        f"Outbox AmoCRM #{entry.id} (заказ {entry.order_id}) "
+                        f"отправлен в DEAD после {entry.attempts} попыток: {error}"
+                    )
+                else:
+                    await repo.mark_failed(
+                        entry.id, error, retry_at=now + self.backoff(entry.attempts)
+                    )
+                    metrics.inc("amocrm_outbox_retried")
+                    logger.warning(
+                        f"Outbox AmoCRM #{entry.id}: попытка {entry.attempts} "
+                        f"не удалась: {error}"
+                    )
+            await db.commit()
+
+    async def _send(
+        self,
+        db: AsyncSession,
+        entries: Sequence[Any],
+    ) -> dict[int, Exception]:
+        """Отправляет пачку, возвращает ошибки по id строк outbox."""
+        errors: dict[int, Exception] = {}
+        orders = []
+        for entry in entries:
+            if entry.kind == AmoOutboxKind.ORDER_CREATED:
+                orders.append(entry)
+            else:
+                errors[entry.id] = ValueError(f"Unknown outbox kind: {entry.kind}")
+
+        if orders:
+            results = await self._service_factory(db).push_orders(
+                [entry.order_id for entry in orders]
+            )
+            for entry in orders:
+                result = results.get(entry.order_id)
+                if isinstance(result, Exception):
+                    errors[entry.id] = result
+        return errors
+
+
+amocrm_outbox_dispatcher = AmoCRMOutboxDispatcher()
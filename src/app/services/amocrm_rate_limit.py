@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from src.app.core.config import settings
+from src.app.core.metrics import metrics
+
+
+class AmoCRMRateLimiter:
+    """
+    Token bucket на все исходящие запросы к AmoCRM (лимит API — около
+    7 запросов в секунду на аккаунт).
+
+    Каждый acquire() сразу резервирует токен: баланс может уйти в минус,
+    и тогда вызывающий спит, пока долг не покроется пополнением. Очередь
+    получается честной (в порядке вызовов) без блокировок, а значит не
+    привязана к конкретному event loop. pause() — реакция на 429: долг
+    увеличивается так, чтобы следующие запросы всех вызывающих ушли не
+    раньше, чем через указанное время.
+
+    Метрики: amocrm_rate_limit_queue — сколько запросов сейчас ждут,
+    amocrm_rate_limit_wait — сколько ждал каждый.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float | None = None,
+        burst: int | None = None,
+    ) -> None:
+        self.rate = rate_per_second or settings.amocrm_rate_limit_per_second
+        self.capacity = float(burst or settings.amocrm_rate_limit_burst)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> float:
+        """Ждёт своей очереди на запрос, возвращает время ожидания."""
+        self._refill()
+        self._tokens -= 1
+        wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            self._waiting += 1
+            metrics.set_gauge("amocrm_rate_limit_queue", self._waiting)
+            # при отмене токен не возвращаем: уже уснувших он не разбудит
+            # раньше, а следующий вызов получил бы слот одновременно с кем-то
+            # из очереди — всплеск поверх лимита AmoCRM
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting -= 1
+                metrics.set_gauge("amocrm_rate_limit_queue", self._waiting)
+
+        metrics.observe("amocrm_rate_limit_wait", wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Ни один новый запрос не уйдёт раньше, чем через seconds."""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    """Retry-After в секундах (число или HTTP-дата), None — заголовка нет."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная пауза с полным джиттером: U(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+amocrm_rate_limiter = AmoCRMRateLimiter()
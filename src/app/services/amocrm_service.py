@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from typing import Sequence
+
+import httpx
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from src.app.core.logger import get_logger
 from src.app.models.amocrm_models import AmoTransactionStatus
@@ -14,17 +18,23 @@ from src.app.schemas.amocrm_schemas import (
     TransactionWebhook,
     WebhookResponse,
 )
-from src.app.services.amocrm_client import AmoCRMClient
+from src.app.services.amocrm_client import (
+    AmoCRMClient,
+    LEADS_COMPLEX_MAX_BATCH,
+    get_amocrm_client,
+)
 
 logger = get_logger(__name__)
 
+LEAD_TAGS = ["MiniApp", "Лагерь"]
+
 
 class AmoCRMService:
-    def __init__(self, db: AsyncSession) -> None:
+    def __init__(self, db: AsyncSession, client: AmoCRMClient | None = None) -> None:
         self.db = db
         self.tx_repo = AmoTransactionRepository(db)
         self.order_repo = OrderRepository(db)
-        self.client = AmoCRMClient()
+        self.client = client if client is not None else get_amocrm_client()
 
     async def handle_transaction_webhook(
         self,
@@ -33,19 +43,11 @@ class AmoCRMService:
         stored: StoredTransaction = StoredTransaction.from_webhook(webhook)
         payload = stored.model_dump()
 
-        amocrm_event_id = f"{stored.event_type}:{stored.id}"
-        amocrm_lead_id = stored.customer_id
-
-        order = await self.order_repo.get_last_unpaid_by_amocrm_lead_id(
-            stored.customer_id
-        )
-        order_id = order.id if order else None  # type: ignore[union-attr]
-
-        tx = await self.tx_repo.create_from_payload(
+        # дубль стоит одного запроса: заказ ищем, только если событие не обработано
+        tx = await self.tx_repo.ingest(
             payload=payload,
-            amocrm_event_id=amocrm_event_id,
-            amocrm_lead_id=amocrm_lead_id,
-            order_id=order_id,
+            amocrm_event_id=webhook.event_id,
+            amocrm_lead_id=stored.customer_id,
         )
 
         if tx.status == AmoTransactionStatus.PROCESSED:
@@ -54,16 +56,22 @@ class AmoCRMService:
                 message="Transaction already processed",
             )
 
+        order = await self.order_repo.get_last_unpaid_by_amocrm_lead_id(
+            stored.customer_id
+        )
+
         try:
             await self._process_transaction(stored, order)
-            await self.tx_repo.mark_processed(tx)
+            await self.tx_repo.mark_processed(
+                tx.id, order_id=order.id if order else None
+            )
             return WebhookResponse(
                 status="ok",
                 message="Stored transaction processed",
             )
         except Exception as e:
             logger.exception("AmoCRM transaction processing error")
-            await self.tx_repo.mark_error(tx, str(e))
+            await self.tx_repo.mark_error(tx.id, str(e))
             return WebhookResponse(
                 status="error",
                 message="Failed to process transaction",
@@ -87,27 +95,160 @@ class AmoCRMService:
             await self.order_repo.mark_paid(order, amount=amount)
 
     async def send_order_to_amocrm(self, order: Order) -> None:
-        result = await self.db.execute(
+        """Отправка «как получится»: ошибки только логируются (отладочные ручки)."""
+        try:
+            await self.push_order(order.id)
+        except Exception:
+            logger.exception("Failed to send order %s to AmoCRM", order.id)
+
+    async def push_order(self, order_id: int) -> int | None:
+        """
+        Создаёт в AmoCRM сделку по заказу и сохраняет её id в заказ.
+        Ошибки AmoCRM пробрасываются — повторами занимается вызывающий
+        (AmoCRMOutboxDispatcher). Повторный вызов для заказа, у которого
+        сделка уже есть, ничего не отправляет. None — заказа нет в БД.
+        """
+        result = (await self.push_orders([order_id]))[order_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def push_orders(
+        self,
+        order_ids: Sequence[int],
+    ) -> dict[int, int | None | Exception]:
+        """
+        Пакетная версия push_order: сделки создаются через /leads/complex
+        пачками по LEADS_COMPLEX_MAX_BATCH, id сделок проставляются в заказы
+        одним UPDATE на пачку.
+
+        Запрос /leads/complex атомарный, поэтому если AmoCRM отклонила пачку
+        (4xx — обычно невалидные данные одной из сделок), каждая сделка
+        пачки отправляется отдельно, чтобы плохой заказ не держал остальные.
+        При прочих ошибках (сеть, 5xx, 429) вся пачка получает ошибку —
+        повтор сделает вызывающий с паузой.
+
+        Возвращает по каждому заказу id сделки, None (заказа нет в БД) или
+        исключение, из-за которого сделку создать не удалось.
+        """
+        results: dict[int, int | None | Exception] = {
+            order_id: None for order_id in order_ids
+        }
+
+        stmt = (
             select(Order)
             .options(selectinload(Order.items).selectinload(OrderItem.product))
-            .where(Order.id == order.id)
+            .where(Order.id.in_(list(results)))
+            .order_by(Order.id)
+            .execution_options(populate_existing=True)
         )
-        order_db = result.scalar_one_or_none()
-        if order_db is None:
+        orders = (await self.db.scalars(stmt)).all()
+
+        missing = set(results) - {order.id for order in orders}
+        for order_id in missing:
             logger.error(
                 "Order %s not found in DB when sending to AmoCRM",
-                order.id,
+                order_id,
             )
-            return
 
-        order = order_db
+        pending: list[Order] = []
+        for order in orders:
+            if order.amocrm_lead_id is not None:
+                results[order.id] = order.amocrm_lead_id
+            else:
+                pending.append(order)
 
-        phone = order.customer_phone
-        full_name = order.customer_name
+        for start in range(0, len(pending), LEADS_COMPLEX_MAX_BATCH):
+            chunk = pending[start:start + LEADS_COMPLEX_MAX_BATCH]
+            chunk_results = await self._create_leads(chunk)
+            results.update(chunk_results)
 
-        total_money = float(order.total_money) if order.total_money is not None else 0
-        total_bonus = order.total_bonus
+            created = {
+                order_id: lead_id
+                for order_id, lead_id in chunk_results.items()
+                if isinstance(lead_id, int)
+            }
+            if created:
+                # коммит после каждой пачки: созданные сделки не должны
+                # потеряться из-за ошибки в следующей
+                await self._save_lead_ids(created)
+                await self.db.commit()
+                for order in chunk:
+                    if order.id in created:
+                        set_committed_value(
+                            order, "amocrm_lead_id", created[order.id]
+                        )
+                logger.info(
+                    "Orders sent to AmoCRM: %s",
+                    ", ".join(f"{o}→{lead}" for o, lead in created.items()),
+                )
 
+        return results
+
+    async def _create_leads(
+        self,
+        orders: list[Order],
+    ) -> dict[int, int | Exception]:
+        if len(orders) == 1:
+            return {orders[0].id: await self._create_lead_safe(orders[0])}
+
+        leads = [
+            self.client.build_complex_lead(
+                name=self._lead_name(order),
+                price=self._lead_price(order),
+                phone=order.customer_phone,
+                tags=LEAD_TAGS,
+                request_id=str(order.id),
+            )
+            for order in orders
+        ]
+        try:
+            data = await self.client.create_leads_complex(leads)
+        except httpx.HTTPStatusError as exc:
+            status_code = exc.response.status_code
+            # 401 и 429 — не про данные сделок, поштучно будет только хуже
+            if status_code >= 500 or status_code in (401, 429):
+                return {order.id: exc for order in orders}
+            logger.warning(
+                "AmoCRM rejected a batch of %s leads (status=%s), "
+                "falling back to one request per lead",
+                len(orders),
+                exc.response.status_code,
+            )
+            return {order.id: await self._create_lead_safe(order) for order in orders}
+        except Exception as exc:
+            return {order.id: exc for order in orders}
+
+        lead_ids: dict[int, int] = {}
+        for index, item in enumerate(data):
+            request_id = item.get("request_id")
+            if isinstance(request_id, list):
+                request_id = request_id[0] if request_id else None
+            try:
+                order_id = int(request_id) if request_id is not None else None
+            except (TypeError, ValueError):
+                order_id = None
+            if order_id is None and index < len(orders):
+                order_id = orders[index].id
+            if order_id is not None and item.get("id") is not None:
+                lead_ids[order_id] = int(item["id"])
+
+        return {
+            order.id: lead_ids.get(order.id)
+            or RuntimeError(f"AmoCRM returned no lead id for order {order.id}")
+            for order in orders
+        }
+
+    async def _create_lead_safe(self, order: Order) -> int | Exception:
+        try:
+            lead_id = await self._create_lead(order)
+        except Exception as exc:
+            return exc
+        if lead_id is None:
+            return RuntimeError(f"AmoCRM returned no lead id for order {order.id}")
+        return int(lead_id)
+
+    async def _create_lead(self, order: Order) -> int | None:
         items_description_parts: list[str] = []
         for item in order.items:
             product_name = getattr(item.product, "name", f"ID {item.product_id}")
@@ -125,37 +266,40 @@ class AmoCRMService:
             },
             {
                 "field_name": "Bonus spent",
-                "values": [{"value": total_bonus}],
+                "values": [{"value": order.total_bonus}],
             },
         ]
 
         contact_custom_fields: list[dict] = []
 
-        lead_name = f"Заказ #{order.id}"
-        if full_name:
-            lead_name += f" от {full_name}"
+        return await self.client.create_lead_with_contact(
+            name=self._lead_name(order),
+            price=self._lead_price(order),
+            phone=order.customer_phone,
+            lead_custom_fields=lead_custom_fields,
+            contact_custom_fields=contact_custom_fields,
+            tags=LEAD_TAGS,
+        )
 
-        lead_id: int | None = None
+    async def _save_lead_ids(self, lead_ids: dict[int, int]) -> None:
+        orders_t = Order.__table__
+        await self.db.execute(
+            update(orders_t)
+            .where(orders_t.c.id == bindparam("b_order_id"))
+            .values(amocrm_lead_id=bindparam("b_lead_id")),
+            [
+                {"b_order_id": order_id, "b_lead_id": lead_id}
+                for order_id, lead_id in lead_ids.items()
+            ],
+        )
 
-        try:
-            lead_id = await self.client.create_lead_with_contact(
-                name=lead_name,
-                price=int(total_money),
-                phone=phone,
-                lead_custom_fields=lead_custom_fields,
-                contact_custom_fields=contact_custom_fields,
-                tags=["MiniApp", "Лагерь"],
-            )
-        except Exception:
-            logger.exception("Failed to send order %s to AmoCRM", order.id)
-            return
+    @staticmethod
+    def _lead_name(order: Order) -> str:
+        lead_name = f"Заказ #{order.id}"
+        if order.customer_name:
+            lead_name += f" от {order.customer_name}"
+        return lead_name
 
-        if lead_id is not None:
-            order.amocrm_lead_id = int(lead_id)
-            await self.db.commit()
-            await self.db.refresh(order)
-            logger.info(
-                "Order %s successfully sent to AmoCRM, lead_id=%s",
-                order.id,
-                lead_id,
-            )
+    @staticmethod
+    def _lead_price(order: Order) -> int:
+        return int(float(order.total_money)) if order.total_money is not None else 0
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.repositories.amocrm_webhook_inbox_repo import AmoWebhookInboxRepository
+from src.app.schemas.amocrm_schemas import TransactionWebhook
+from src.app.services.amocrm_service import AmoCRMService
+
+logger = get_logger(__name__)
+
+
+class AmoCRMWebhookWorkers:
+    """
+    Пул воркеров, разбирающих inbox вебхуков транзакций AmoCRM.
+
+    Ручка /amocrm/webhooks/transaction лишь дописывает сырое тело в
+    amocrm_webhook_inbox и будит пул (notify). Каждый из workers воркеров
+    забирает пачку созревших строк (claim с арендой, на PostgreSQL — SKIP
+    LOCKED) и обрабатывает строку в своей сессии: AmoCRMService пишет
+    AmoTransaction и отмечает заказ оплаченным, и тем же коммитом строка
+    inbox становится DONE. Если обработка не удалась, строка повторяется
+    через base * 2^(attempts-1) (не больше backoff_max), а после
+    max_attempts попыток уходит в FAILED.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        workers: int | None = None,
+        interval_seconds: float | None = None,
+        batch_size: int | None = None,
+        max_attempts: int | None = None,
+        backoff_base_seconds: float | None = None,
+        backoff_max_seconds: float | None = None,
+        lease_seconds: float | None = None,
+        service_factory: Callable[[AsyncSession], Any] = AmoCRMService,
+    ) -> None:
+        self._session_factory = session_factory
+        self._service_factory = service_factory
+        self.workers = workers or settings.amocrm_webhook_workers
+        self.interval = (
+            interval_seconds
+            if interval_seconds is not None
+            else settings.amocrm_webhook_interval_seconds
+        )
+        self.batch_size = batch_size or settings.amocrm_webhook_batch_size
+        self.max_attempts = max_attempts or settings.amocrm_webhook_max_attempts
+        self.backoff_base = (
+            backoff_base_seconds
+            if backoff_base_seconds is not None
+            else settings.amocrm_webhook_backoff_base_seconds
+        )
+        self.backoff_max = (
+            backoff_max_seconds
+            if backoff_max_seconds is not None
+            else settings.amocrm_webhook_backoff_max_seconds
+        )
+        self.lease = timedelta(
+            seconds=lease_seconds
+            if lease_seconds is not None
+            else settings.amocrm_webhook_lease_seconds
+        )
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._loop()) for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Пришёл вебхук — разобрать, не дожидаясь интервала."""
+        self._wakeup.set()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                processed = await self.run_once()
+            except Exception:
+                logger.exception("Не удалось разобрать inbox вебхуков AmoCRM")
+                processed = 0
+
+            # полная пачка — возможно, в очереди есть ещё, идём сразу
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                continue
+            self._wakeup.clear()
+
+    # ---------- обработка ----------
+
+    def backoff(self, attempts: int) -> timedelta:
+        delay = self.backoff_base * 2 ** max(attempts - 1, 0)
+        return timedelta(seconds=min(delay, self.backoff_max))
+
+    async def run_once(self, now: datetime | None = None) -> int:
+        """Разбирает одну пачку созревших строк, возвращает их число."""
+        if now is None:
+            now = datetime.now(timezone.utc)
+
+        async with session_scope("amocrm_webhook_claim", self._session_factory) as db:
+            entries = await AmoWebhookInboxRepository(db).claim_due(
+                now, self.batch_size, self.lease
+            )
+            await db.commit()
+
+        for entry in entries:
+            await self._process(entry, now)
+        return len(entries)
+
+    async def _process(self, entry: Any, now: datetime) -> None:
+        async with session_scope("amocrm_webhook_process", self._session_factory) as db:
+            repo = AmoWebhookInboxRepository(db)
+            try:
+                webhook = TransactionWebhook.model_validate(entry.payload)
+            except ValidationError as exc:
+                # тело проверено ручкой; повтор такую строку не исправит
+                await repo.mark_failed(entry.id, f"ValidationError: {exc}", None)
+                await db.commit()
+                metrics.inc("amocrm_webhook_failed")
+                logger.error(f"Inbox AmoCRM #{entry.id}: невалидное тело: {exc}")
+                return
+
+            try:
+                with metrics.timer("amocrm_webhook_process"):
+                    result = await self._service_factory(db).handle_transaction_webhook(
+                        webhook
+                    )
+                error = None if result.status == "ok" else result.message
+            except Exception as exc:
+                await db.rollback()
+                logger.exception(f"Inbox AmoCRM #{entry.id}: ошибка обработки")
+                error = f"{type(exc).__name__}: {exc}"
+
+            if error is None:
+                await repo.mark_done(entry.id, datetime.now(timezone.utc))
+                metrics.inc("amocrm_webhook_done")
+            elif entry.attempts >= self.max_attempts:
+                await repo.mark_failed(entry.id, error, retry_at=None)
+                metrics.inc("amocrm_webhook_failed")
+                logger.error(
+                    f"Inbox AmoCRM #{entry.id} ({entry.amocrm_event_id}) "
+                    f"отправлен в FAILED после {entry.attempts} попыток: {error}"
+                )
+            else:
+                await repo.mark_failed(
+                    entry.id, error, retry_at=now + self.backoff(entry.attempts)
+                )
+                metrics.inc("amocrm_webhook_retried")
+                logger.warning(
+                    f"Inbox AmoCRM #{entry.id}: попытка {entry.attempts} "
+                    f"не удалась: {error}"
+                )
+            # статус AmoTransaction (PROCESSED/ERROR) и строки inbox — одним коммитом
+            await db.commit()
+
+
+amocrm_webhook_workers = AmoCRMWebhookWorkers()
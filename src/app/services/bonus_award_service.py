@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import csv
+import io
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.db.dialect import upsert_insert
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.models.balance_models import Balance, BalanceTransaction, TransactionType
+from src.app.models.user_models import User
+
+logger = get_logger(__name__)
+
+# типы проводок, которые админ может раздавать массово
+BULK_AWARD_TYPES = frozenset(
+    {TransactionType.ADMIN_ADJUST, TransactionType.AMOCRM_BONUS, TransactionType.OTHER}
+)
+# balance_transactions.description — varchar(512)
+DESCRIPTION_MAX_LENGTH = BalanceTransaction.__table__.c.description.type.length
+
+
+class NegativeBalanceError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class BonusAward:
+    telegram_id: int
+    delta: int
+    description: str | None = None
+
+
+@dataclass
+class AwardResult:
+    total: int = 0
+    applied: int = 0
+    # пользователи не найдены — начисления пропущены
+    unknown_telegram_ids: list[int] = field(default_factory=list)
+    # начисления из пачек, откатившихся целиком
+    failed: list[BonusAward] = field(default_factory=list)
+    # номера входных строк (с 1, включительно) закоммиченных и откатившихся пачек
+    applied_rows: list[tuple[int, int]] = field(default_factory=list)
+    failed_rows: list[tuple[int, int]] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def parse_awards_csv(text: str) -> list[BonusAward]:
+    """
+    CSV с заголовком telegram_id,delta[,description] → список начислений.
+    ValueError с номером строки, если строка не разбирается или description
+    длиннее DESCRIPTION_MAX_LENGTH.
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    missing = {"telegram_id", "delta"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV header must contain: {', '.join(sorted(missing))}")
+
+    awards: list[BonusAward] = []
+    for line_no, row in enumerate(reader, start=2):
+        try:
+            award = BonusAward(
+                telegram_id=int(row["telegram_id"]),
+                delta=int(row["delta"]),
+                description=(row.get("description") or "").strip() or None,
+            )
+        except (TypeError, ValueError):
+            raise ValueError(f"Bad CSV row {line_no}: {row}") from None
+        if award.description and len(award.description) > DESCRIPTION_MAX_LENGTH:
+            raise ValueError(
+                f"Bad CSV row {line_no}: description is longer than "
+                f"{DESCRIPTION_MAX_LENGTH} characters"
+            )
+        awards.append(award)
+    return awards
+
+
+class BonusAwardService:
+    """
+    Массовое начисление бонусов списком (telegram_id, delta, description).
+
+    Начисления идут пачками по chunk_size; каждая пачка — одна транзакция из
+    трёх запросов: поиск пользователей, upsert балансов одним INSERT ... ON
+    CONFLICT ... RETURNING и вставка проводок через executemany (SQLAlchemy
+    сворачивает его в многострочные INSERT). Пачка применяется целиком или
+    откатывается целиком, например если у кого-то баланс ушёл бы в минус
+    или упал запрос к БД; следующие пачки при этом продолжают применяться, а
+    в результате видно, какие строки закоммичены, а какие нет.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        chunk_size: int | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self.chunk_size = chunk_size or settings.bonus_award_chunk_size
+
+    async def award(
+        self,
+        awards: Sequence[BonusAward],
+        tx_type: TransactionType = TransactionType.ADMIN_ADJUST,
+        allow_negative: bool = False,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> AwardResult:
+        """progress(обработано, всего) вызывается после каждой пачки."""
+        if tx_type not in BULK_AWARD_TYPES:
+            raise ValueError(
+                f"Transaction type {tx_type.value} cannot be bulk-awarded"
+            )
+
+        result = AwardResult(total=len(awards))
+        for start in range(0, len(awards), self.chunk_size):
+            chunk = awards[start:start + self.chunk_size]
+            done = start + len(chunk)
+            try:
+                applied, unknown = await self._apply_chunk(
+                    chunk, tx_type, allow_negative
+                )
+            except (NegativeBalanceError, SQLAlchemyError) as exc:
+                if isinstance(exc, SQLAlchemyError):
+                    logger.exception(
+                        f"Начисление бонусов: пачка {start + 1}-{done} не применена"
+                    )
+                result.failed.extend(chunk)
+                result.failed_rows.append((start + 1, done))
+                result.errors.append(f"rows {start + 1}-{done}: {exc}")
+                metrics.inc("bonus_award_chunks_failed")
+            else:
+                result.applied += applied
+                result.applied_rows.append((start + 1, done))
+                result.unknown_telegram_ids.extend(unknown)
+
+            if progress is not None:
+                progress(done, len(awards))
+            logger.info(f"Начисление бонусов: {done}/{len(awards)}")
+
+        metrics.inc("bonus_awards_applied", result.applied)
+        return result
+
+    async def _apply_chunk(
+        self,
+        chunk: Sequence[BonusAward],
+        tx_type: TransactionType,
+        allow_negative: bool,
+    ) -> tuple[int, list[int]]:
+        now = datetime.now(timezone.utc)
+
+        async with session_scope("bonus_award.chunk", self._session_factory) as db:
+            rows = await db.execute(
+                select(User.telegram_id, User.id).where(
+                    User.telegram_id.in_({award.telegram_id for award in chunk})
+                )
+            )
+            user_ids: dict[int, int] = {
+                telegram_id: user_id for telegram_id, user_id in rows.all()
+            }
+
+            known = [award for award in chunk if award.telegram_id in user_ids]
+            unknown = sorted(
+                {award.telegram_id for award in chunk} - user_ids.keys()
+            )
+            if not known:
+                return 0, unknown
+
+            totals: dict[int, int] = {}
+            for award in known:
+                user_id = user_ids[award.telegram_id]
+                totals[user_id] = totals.get(user_id, 0) + award.delta
+
+            balance_t = Balance.__table__
+            balance_insert = upsert_insert(db, balance_t).values(
+                [
+                    {"user_id": user_id, "amount": totals[user_id], "updated_at": now}
+                    # один порядок блокировок строк у параллельных пачек
+                    for user_id in sorted(totals)
+                ]
+            )
+            amounts = await db.execute(
+                balance_insert.on_conflict_do_update(
+                    index_elements=[balance_t.c.user_id],
+                    set_={
+                        "amount": balance_t.c.amount + balance_insert.excluded.amount,
+                        "updated_at": balance_insert.excluded.updated_at,
+                    },
+                ).returning(balance_t.c.user_id, balance_t.c.amount)
+            )
+            new_amounts: dict[int, int] = {
+                user_id: amount for user_id, amount in amounts.all()
+            }
+
+            if not allow_negative:
+                negative = [uid for uid, amount in new_amounts.items() if amount < 0]
+                if negative:
+                    await db.rollback()
+                    raise NegativeBalanceError(
+                        f"balance would go negative for user ids {negative[:10]}"
+                    )
+
+            # resulting_balance у каждой проводки — баланс после неё
+            running = {
+                user_id: new_amounts[user_id] - total
+                for user_id, total in totals.items()
+            }
+            ledger_rows = []
+            for award in known:
+                user_id = user_ids[award.telegram_id]
+                running[user_id] += award.delta
+                ledger_rows.append(
+                    {
+                        "user_id": user_id,
+                        "delta": award.delta,
+                        "resulting_balance": running[user_id],
+                        "type": tx_type,
+                        "description": award.description,
+                        "entries_count": 1,
+                        "created_at": now,
+                    }
+                )
+            await db.execute(BalanceTransaction.__table__.insert(), ledger_rows)
+            await db.commit()
+
+        return len(known), unknown
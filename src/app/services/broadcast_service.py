@@ -1,59 +1,92 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta
 
 from aiogram import Bot
-from sqlalchemy import select, and_
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from src.app.core.config import settings
+from src.app.db.session import AsyncSessionLocal, session_scope
 from src.app.models.broadcast_models import Broadcast, BroadcastStatus
 from src.app.models.user_models import User
+from src.app.repositories.user_repo import UserRepository
 from src.app.core.logger import get_logger
 
 logger = get_logger(__name__)
 
 
 class BroadcastService:
-    def __init__(self, db: AsyncSession, bot: Bot) -> None:
+    def __init__(
+        self,
+        db: AsyncSession,
+        bot: Bot,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        batch_size: int | None = None,
+    ) -> None:
         self.db = db
         self.bot = bot
+        self._session_factory = session_factory
+        self.batch_size = batch_size or settings.broadcast_recipients_batch_size
 
     async def send_due_broadcasts(self, now: datetime | None = None) -> None:
+        """
+        Отправляет запланированные рассылки, срок которых наступил.
+
+        Работает через собственные короткие сессии, а не через self.db:
+        получатели читаются пачками по batch_size telegram_id (keyset по
+        telegram_id, без ORM-объектов), и соединение возвращается в пул до
+        отправки пачки, поэтому память и занятость пула не зависят от
+        размера аудитории. Каждая рассылка помечается SENT сразу после
+        отправки, отдельным коммитом.
+        """
         if now is None:
             now = datetime.utcnow()
 
-        stmt = (
-            select(Broadcast)
-            .where(Broadcast.status == BroadcastStatus.SCHEDULED)
-            .where(Broadcast.scheduled_at <= now)
-            .order_by(Broadcast.scheduled_at)
-        )
-        result = await self.db.execute(stmt)
-        broadcasts: list[Broadcast] = list(result.scalars())
-
-        if not broadcasts:
-            return
-
-        users_stmt = select(User).where(User.is_subscribed.is_(True))
-        users_result = await self.db.execute(users_stmt)
-        users: list[User] = list(users_result.scalars())
-
-        for broadcast in broadcasts:
-            for user in users:
-                try:
-                    await self.bot.send_message(
-                        chat_id=user.telegram_id,
-                        text=broadcast.text,
-                    )
-                except Exception as send_err:
-                    logger.info(
-                        f"Ошибка отправки рассылки {broadcast.id} пользователю {user.telegram_id}: {send_err}"
-                    )
-
-            broadcast.status = BroadcastStatus.SENT
-            self.db.add(broadcast)
-
-        await self.db.flush()
+        async with session_scope("broadcasts", self._session_factory) as db:
+            result = await db.execute(
+                select(Broadcast.id, Broadcast.text)
+                .where(Broadcast.status == BroadcastStatus.SCHEDULED)
+                .where(Broadcast.scheduled_at <= now)
+                .order_by(Broadcast.scheduled_at)
+            )
+            broadcasts = result.all()
+
+        for broadcast_id, text in broadcasts:
+            async for telegram_ids in self._iter_recipient_batches():
+                for telegram_id in telegram_ids:
+                    try:
+                        await self.bot.send_message(chat_id=telegram_id, text=text)
+                    except Exception as send_err:
+                        logger.info(
+                            f"Ошибка отправки рассылки {broadcast_id} пользователю {telegram_id}: {send_err}"
+                        )
+
+            async with session_scope("broadcasts", self._session_factory) as db:
+                await db.execute(
+                    update(Broadcast)
+                    .where(Broadcast.id == broadcast_id)
+                    .values(status=BroadcastStatus.SENT, sent_at=now)
+                )
+                await db.commit()
+
+    async def _iter_recipient_batches(self) -> AsyncIterator[list[int]]:
+        """Пачки telegram_id подписчиков, каждая — своей короткой сессией."""
+        after: int | None = None
+        while True:
+            async with session_scope(
+                "broadcast_recipients", self._session_factory
+            ) as db:
+                telegram_ids = await UserRepository(db).subscribed_telegram_ids(
+                    after, self.batch_size
+                )
+            if not telegram_ids:
+                return
+            yield telegram_ids
+            if len(telegram_ids) < self.batch_size:
+                return
+            after = telegram_ids[-1]
 
     async def send_inactive_reminders(
         self,
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.constants import (
+    MAX_CLICKS_PER_SECOND,
+    MAX_CLICKS_WINDOW_MS,
+    MAX_DAILY_ENERGY,
+    MOSCOW_TZ,
+)
+from src.app.core.logger import get_logger
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.models.game_models import GameStats
+from src.app.repositories.balance_repo import BalanceRepository
+from src.app.repositories.game_repo import ClickSettlement, GameRepository
+from src.app.schemas.miniapp_schemas import GameClickResponse
+from src.app.services.identity_cache import UserIdentity
+
+logger = get_logger(__name__)
+
+# награда за клик — 1 бонус
+REWARD_PER_CLICK = 1
+
+
+@dataclass
+class _UserClicks:
+    user: UserIdentity
+    # баланс, подтверждённый БД на момент последней загрузки/сброса
+    balance: int
+    # клики за day, включая ещё не записанные в БД
+    clicks_today: int
+    day: date
+    # клики, принятые в памяти, но ещё не записанные в БД
+    pending: int = 0
+    last_click_at: datetime | None = None
+    # сколько открытых WebSocket-соединений у пользователя
+    connections: int = 0
+
+    @property
+    def projected_balance(self) -> int:
+        return self.balance + self.pending * REWARD_PER_CLICK
+
+    @property
+    def energy(self) -> int:
+        return max(MAX_DAILY_ENERGY - self.clicks_today, 0)
+
+    def to_response(self) -> GameClickResponse:
+        return GameClickResponse(
+            new_bonus_balance=self.projected_balance,
+            current_energy=self.energy,
+        )
+
+
+class TapRateGuard:
+    """
+    Проверка правдоподобной скорости тапов для одного соединения.
+
+    Token bucket: за секунду набирается MAX_CLICKS_PER_SECOND кликов,
+    копится не больше, чем помещается в одно окно MAX_CLICKS_WINDOW_MS.
+    Клики сверх накопленного лимита не засчитываются.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: int = MAX_CLICKS_PER_SECOND,
+        window_ms: int = MAX_CLICKS_WINDOW_MS,
+    ) -> None:
+        self.rate = rate_per_second
+        self.capacity = rate_per_second * window_ms / 1000
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def allow(self, count: int) -> int:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+        allowed = min(count, int(self._tokens))
+        self._tokens -= allowed
+        return allowed
+
+
+class ClickBuffer:
+    """
+    Write-behind буфер кликов игры.
+
+    Клик засчитывается в памяти и сразу возвращает прогнозный баланс и энергию,
+    лимит MAX_DAILY_ENERGY проверяется там же. Накопленные клики пачкой
+    пишутся в game_stats/balances/balance_transactions раз в
+    flush_interval_ms или как только у пользователя набралось
+    flush_max_clicks кликов. При отключении сокета и при остановке
+    приложения буфер сбрасывается принудительно.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        flush_interval_ms: int | None = None,
+        flush_max_clicks: int | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self.flush_interval = (
+            flush_interval_ms or settings.game_click_flush_interval_ms
+        ) / 1000
+        self.flush_max_clicks = flush_max_clicks or settings.game_click_flush_max_clicks
+
+        self._states: dict[int, _UserClicks] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Не удалось сбросить клики игры при остановке")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось сбросить клики игры в БД")
+
+    # ---------- соединения ----------
+
+    async def attach(self, user: UserIdentity) -> GameClickResponse:
+        """Регистрирует соединение пользователя и при необходимости грузит его состояние."""
+        state = self._states.get(user.id)
+        if state is None:
+            loaded = await self._load(user)
+            # пока грузили, состояние мог создать другой сокет того же пользователя
+            state = self._states.setdefault(user.id, loaded)
+
+        state.connections += 1
+        return state.to_response()
+
+    async def detach(self, user_id: int) -> None:
+        """Снимает соединение и сразу записывает накопленные клики пользователя."""
+        state = self._states.get(user_id)
+        if state is None:
+            return
+
+        state.connections -= 1
+        try:
+            await self.flush([user_id])
+        except Exception:
+            logger.exception(
+                "Не удалось записать клики пользователя %s при отключении", user_id
+            )
+
+    async def _load(self, user: UserIdentity) -> _UserClicks:
+        today_msk = datetime.now(MOSCOW_TZ).date()
+
+        async with session_scope("click_buffer.load", self._session_factory) as db:
+            result = await db.execute(
+                select(GameStats).where(GameStats.user_id == user.id)
+            )
+            stats = result.scalar_one_or_none()
+            # get_balance при необходимости создаёт строку баланса
+            balance = await BalanceRepository(db).get_balance_by_user_id(user.id)
+            await db.commit()
+
+        clicks_today = 0
+        if stats is not None and stats.clicks_today_date == today_msk:
+            clicks_today = stats.clicks_today
+
+        return _UserClicks(
+            user=user,
+            balance=balance,
+            clicks_today=clicks_today,
+            day=today_msk,
+        )
+
+    # ---------- клики ----------
+
+    async def click(self, user_id: int) -> GameClickResponse:
+        _, response = await self.click_many(user_id, 1)
+        return response
+
+    async def click_many(
+        self, user_id: int, count: int
+    ) -> tuple[int, GameClickResponse]:
+        """
+        Засчитывает сразу count кликов (пакетное сообщение клиента).
+        Принимается не больше, чем осталось энергии; возвращает,
+        сколько кликов реально засчитано, и новое состояние.
+        """
+        state = self._states.get(user_id)
+        if state is None:
+            raise KeyError(f"User {user_id} is not attached to the click buffer")
+
+        today_msk = datetime.now(MOSCOW_TZ).date()
+        if state.day != today_msk:
+            # клики прошлого дня записываем до сброса энергии
+            if state.pending:
+                try:
+                    await self.flush([user_id])
+                except Exception:
+                    logger.exception(
+                        "Не удалось записать клики пользователя %s за прошлый день",
+                        user_id,
+                    )
+            state.day = today_msk
+            state.clicks_today = state.pending
+
+        # если энергия закончилась — просто возвращаем баланс и энергию 0
+        accepted = min(max(count, 0), state.energy)
+        if accepted == 0:
+            return 0, state.to_response()
+
+        state.pending += accepted
+        state.clicks_today += accepted
+        state.last_click_at = datetime.now(MOSCOW_TZ)
+
+        if state.pending >= self.flush_max_clicks:
+            self._wakeup.set()
+
+        return accepted, state.to_response()
+
+    # ---------- запись в БД ----------
+
+    async def flush(self, user_ids: Iterable[int] | None = None) -> None:
+        """
+        Записывает накопленные клики в одной транзакции на всю пачку.
+        При ошибке клики возвращаются в буфер и будут записаны следующим сбросом.
+        """
+        async with self._flush_lock:
+            ids = list(self._states) if user_ids is None else list(user_ids)
+
+            batch: list[tuple[_UserClicks, int, date, datetime]] = []
+            for user_id in ids:
+                state = self._states.get(user_id)
+                if state is None or state.pending == 0:
+                    continue
+                batch.append(
+                    (state, state.pending, state.day, state.last_click_at)  # type: ignore[arg-type]
+                )
+                state.pending = 0
+
+            if batch:
+                try:
+                    results = await self._write_batch(batch)
+                except Exception:
+                    for state, clicks, _, _ in batch:
+                        state.pending += clicks
+                    raise
+
+                for (state, _, day, _), settlement in zip(batch, results):
+                    state.balance = settlement.balance
+                    if day == state.day:
+                        state.clicks_today = settlement.clicks_today + state.pending
+
+            # забываем пользователей без соединений и без незаписанных кликов
+            for user_id in ids:
+                state = self._states.get(user_id)
+                if state is not None and state.connections <= 0 and not state.pending:
+                    del self._states[user_id]
+
+    async def _write_batch(
+        self,
+        batch: list[tuple[_UserClicks, int, date, datetime]],
+    ) -> list[ClickSettlement]:
+        results: list[ClickSettlement] = []
+
+        async with session_scope("click_buffer.flush", self._session_factory) as db:
+            game_repo = GameRepository(db)
+            for state, clicks, _, last_click_at in batch:
+                settlement = await game_repo.settle_clicks(
+                    state.user.id,
+                    clicks,
+                    now=last_click_at,
+                    reward_per_click=REWARD_PER_CLICK,
+                )
+                results.append(settlement)
+            await db.commit()
+
+        return results
+
+
+click_buffer = ClickBuffer()
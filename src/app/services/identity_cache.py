@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from src.app.core.config import settings
+from src.app.core.metrics import metrics
+from src.app.models.user_models import User, UserRole
+
+# поля, от которых зависит снимок; их изменение сбрасывает кэш
+_IDENTITY_FIELDS = ("role", "parent_id", "referrer_id")
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """Лёгкий снимок пользователя для авторизации запросов mini-app."""
+
+    id: int
+    telegram_id: int
+    role: UserRole
+    referrer_id: int | None = None
+    parent_id: int | None = None
+
+    def to_claims(self) -> dict[str, Any]:
+        return {
+            "uid": self.id,
+            "tg": self.telegram_id,
+            "role": self.role.value,
+            "ref": self.referrer_id,
+            "par": self.parent_id,
+        }
+
+    @classmethod
+    def from_claims(cls, claims: dict[str, Any]) -> "UserIdentity":
+        return cls(
+            id=int(claims["uid"]),
+            telegram_id=int(claims["tg"]),
+            role=UserRole(claims["role"]),
+            referrer_id=claims.get("ref"),
+            parent_id=claims.get("par"),
+        )
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserIdentity":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            role=user.role,
+            referrer_id=user.referrer_id,
+            parent_id=user.parent_id,
+        )
+
+
+class IdentityCache:
+    """
+    TTL/LRU-кэш telegram_id → UserIdentity.
+
+    Живёт в памяти процесса. Записи устаревают через ttl_seconds, при
+    переполнении вытесняются давно не использованные. При изменении роли,
+    родителя или пригласившего через ORM запись сбрасывается (см. слушатели
+    ниже), но только в этом процессе. Изменения из других воркеров и Core
+    UPDATE по users кэш не видит: снимок может отставать до ttl_seconds,
+    поэтому TTL держим коротким. Core-запись, меняющая эти поля, должна сама
+    вызвать identity_cache.invalidate. Права администратора по кэшу не
+    проверяются — require_admin читает роль из БД.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float | None = None,
+        max_size: int | None = None,
+    ) -> None:
+        self.ttl = (
+            ttl_seconds
+            if ttl_seconds is not None
+            else settings.identity_cache_ttl_seconds
+        )
+        self.max_size = max_size or settings.identity_cache_max_size
+        self._items: OrderedDict[int, tuple[float, UserIdentity]] = OrderedDict()
+
+    def get(self, telegram_id: int) -> UserIdentity | None:
+        item = self._items.get(telegram_id)
+        if item is None:
+            metrics.inc("identity_cache_miss")
+            return None
+
+        expires_at, identity = item
+        if expires_at <= time.monotonic():
+            del self._items[telegram_id]
+            metrics.inc("identity_cache_miss")
+            return None
+
+        self._items.move_to_end(telegram_id)
+        metrics.inc("identity_cache_hit")
+        return identity
+
+    def put(self, identity: UserIdentity) -> None:
+        if self.ttl <= 0:
+            return
+        self._items[identity.telegram_id] = (time.monotonic() + self.ttl, identity)
+        self._items.move_to_end(identity.telegram_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._items.pop(telegram_id, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+identity_cache = IdentityCache()
+
+
+# ---------- инвалидация ----------
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_identity_change(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in _IDENTITY_FIELDS):
+        return
+
+    identity_cache.invalidate(target.telegram_id)
+    # до коммита параллельный запрос мог снова положить в кэш старое
+    # значение, поэтому сбрасываем запись ещё раз после коммита
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("identity_invalidations", set()).add(
+            target.telegram_id
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    for telegram_id in session.info.pop("identity_invalidations", ()):
+        identity_cache.invalidate(telegram_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_invalidations(session: Session) -> None:
+    session.info.pop("identity_invalidations", None)
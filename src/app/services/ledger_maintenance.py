@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, time
+
+from sqlalchemy import Date, case, delete, func, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.constants import LEDGER_MAINTENANCE_LOCK_KEY, MOSCOW_TZ
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.db.dialect import advisory_xact_lock, is_postgres, upsert_insert
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.models.balance_models import BalanceTransaction, BalanceTransactionArchive
+
+logger = get_logger(__name__)
+
+LEDGER_TABLE = BalanceTransaction.__tablename__
+DEFAULT_PARTITION = f"{LEDGER_TABLE}_default"
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{LEDGER_TABLE}_p{month:%Y%m}"
+
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    """Границы московского месяца [начало, начало следующего)."""
+    start = datetime.combine(month, time.min, tzinfo=MOSCOW_TZ)
+    end = datetime.combine(add_months(month, 1), time.min, tzinfo=MOSCOW_TZ)
+    return start, end
+
+
+def _moscow_month(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(MOSCOW_TZ)
+    return value.date().replace(day=1)
+
+
+class LedgerMaintenance:
+    """
+    Обслуживание журнала баланса (balance_transactions).
+
+    На PostgreSQL журнал секционирован по московским месяцам created_at:
+    заранее создаём секции на partitions_ahead месяцев вперёд, а месяцы старше
+    retention_months сворачиваем в balance_transactions_archive (суммы по
+    пользователю, типу и месяцу) и отцепляем с удалением — это дешевле, чем
+    DELETE по живой таблице. Строки, попавшие в секцию по умолчанию, и журнал
+    на SQLite архивируются тем же INSERT ... SELECT с обычным DELETE.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        interval_seconds: float | None = None,
+        retention_months: int | None = None,
+        partitions_ahead: int | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self.interval = (
+            interval_seconds
+            if interval_seconds is not None
+            else settings.ledger_maintenance_interval_seconds
+        )
+        self.retention_months = (
+            retention_months
+            if retention_months is not None
+            else settings.ledger_retention_months
+        )
+        self.partitions_ahead = (
+            partitions_ahead
+            if partitions_ahead is not None
+            else settings.ledger_partitions_ahead
+        )
+        self._task: asyncio.Task | None = None
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Не удалось обслужить журнал баланса")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, today: date | None = None) -> list[date]:
+        """Создаёт будущие секции и архивирует закрытые месяцы; возвращает их."""
+        if today is None:
+            today = datetime.now(MOSCOW_TZ).date()
+        await self.ensure_partitions(today)
+        return await self.archive_closed_months(today)
+
+    # ---------- секции ----------
+
+    async def ensure_partitions(self, today: date) -> None:
+        """
+        Секции текущего и partitions_ahead следующих месяцев (только PostgreSQL).
+
+        Если секция создаётся с опозданием (например, после простоя), строки
+        её месяца уже лежат в секции по умолчанию, и CREATE TABLE ... PARTITION
+        OF упал бы. Тогда в той же транзакции секция по умолчанию отцепляется,
+        создаётся новая, строки месяца переносятся в неё через родителя, и
+        секция по умолчанию прицепляется обратно.
+        """
+        current = today.replace(day=1)
+        async with session_scope("ledger.partitions", self._session_factory) as db:
+            if not is_postgres(db):
+                return
+            await advisory_xact_lock(db, LEDGER_MAINTENANCE_LOCK_KEY)
+            has_default = await self._table_exists(db, DEFAULT_PARTITION)
+            for offset in range(self.partitions_ahead + 1):
+                month = add_months(current, offset)
+                if await self._table_exists(db, partition_name(month)):
+                    continue
+                start, end = month_bounds(month)
+                stray = has_default and (
+                    await db.scalar(
+                        text(
+                            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                            "WHERE created_at >= :start AND created_at < :end)"
+                        ),
+                        {"start": start, "end": end},
+                    )
+                )
+                if stray:
+                    await db.execute(
+                        text(
+                            f"ALTER TABLE {LEDGER_TABLE} "
+                            f"DETACH PARTITION {DEFAULT_PARTITION}"
+                        )
+                    )
+                await db.execute(
+                    text(
+                        f"CREATE TABLE {partition_name(month)} "
+                        f"PARTITION OF {LEDGER_TABLE} "
+                        f"FOR VALUES FROM ('{start.isoformat()}') "
+                        f"TO ('{end.isoformat()}')"
+                    )
+                )
+                if stray:
+                    # у секций тот же порядок колонок, что у родителя
+                    moved = await db.execute(
+                        text(
+                            "WITH moved AS ("
+                            f"DELETE FROM {DEFAULT_PARTITION} "
+                            "WHERE created_at >= :start AND created_at < :end "
+                            "RETURNING *) "
+                            f"INSERT INTO {LEDGER_TABLE} SELECT * FROM moved"
+                        ),
+                        {"start": start, "end": end},
+                    )
+                    await db.execute(
+                        text(
+                            f"ALTER TABLE {LEDGER_TABLE} "
+                            f"ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"
+                        )
+                    )
+                    metrics.inc("ledger_default_rows_moved", moved.rowcount or 0)
+                    logger.warning(
+                        "Журнал баланса: секция %s создана с опозданием, "
+                        "перенесено строк из секции по умолчанию: %s",
+                        partition_name(month),
+                        moved.rowcount,
+                    )
+            await db.commit()
+
+    @staticmethod
+    async def _table_exists(db: AsyncSession, name: str) -> bool:
+        return (
+            await db.scalar(
+                text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+            )
+        ) is True
+
+    async def _partition_months(self, db: AsyncSession) -> dict[date, str]:
+        rows = await db.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:parent AS regclass)"
+            ),
+            {"parent": LEDGER_TABLE},
+        )
+        prefix = f"{LEDGER_TABLE}_p"
+        months: dict[date, str] = {}
+        for (name,) in rows:
+            if name.startswith(prefix):
+                suffix = name[len(prefix):]
+                months[date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+        return months
+
+    # ---------- архив ----------
+
+    async def archive_closed_months(self, today: date) -> list[date]:
+        cutoff = add_months(today.replace(day=1), -self.retention_months)
+
+        async with session_scope("ledger.archive", self._session_factory) as db:
+            partitions: dict[date, str] = {}
+            if is_postgres(db):
+                partitions = await self._partition_months(db)
+                # секция по умолчанию маленькая, min по ней дешёвый
+                oldest = None
+                if await self._table_exists(db, DEFAULT_PARTITION):
+                    oldest = await db.scalar(
+                        text(f"SELECT min(created_at) FROM {DEFAULT_PARTITION}")
+                    )
+            else:
+                oldest = await db.scalar(
+                    select(func.min(BalanceTransaction.created_at))
+                )
+
+        months = {month for month in partitions if month < cutoff}
+        if oldest is not None:
+            month = _moscow_month(oldest)
+            while month < cutoff:
+                months.add(month)
+                month = add_months(month, 1)
+
+        for month in sorted(months):
+            await self.archive_month(month, partitions.get(month))
+        return sorted(months)
+
+    async def archive_month(self, month: date, partition: str | None = None) -> None:
+        """
+        Сворачивает проводки месяца в архив и убирает их из журнала одной
+        транзакцией. partition — секция месяца на PostgreSQL: её отцепляем и
+        удаляем целиком вместо DELETE.
+
+        Задачу запускает каждый процесс приложения, поэтому транзакция
+        начинается с advisory-блокировки: иначе два прогона под READ COMMITTED
+        сложили бы одни и те же строки и ON CONFLICT DO UPDATE удвоил бы суммы
+        архива. Второй прогон, дождавшись блокировки, строк месяца уже не видит.
+        """
+        tx_t = BalanceTransaction.__table__
+        archive_t = BalanceTransactionArchive.__table__
+        start, end = month_bounds(month)
+        in_month = (tx_t.c.created_at >= start, tx_t.c.created_at < end)
+
+        async with session_scope("ledger.archive", self._session_factory) as db:
+            await advisory_xact_lock(db, LEDGER_MAINTENANCE_LOCK_KEY)
+            if partition is not None and not await self._table_exists(db, partition):
+                # секцию уже свернул другой процесс
+                return
+            archive_insert = upsert_insert(db, archive_t).from_select(
+                [
+                    "user_id",
+                    "type",
+                    "period_month",
+                    "credit_sum",
+                    "debit_sum",
+                    "entries_count",
+                ],
+                select(
+                    tx_t.c.user_id,
+                    tx_t.c.type,
+                    literal(month, Date),
+                    func.coalesce(
+                        func.sum(case((tx_t.c.delta > 0, tx_t.c.delta), else_=0)), 0
+                    ),
+                    func.coalesce(
+                        func.sum(case((tx_t.c.delta < 0, tx_t.c.delta), else_=0)), 0
+                    ),
+                    func.sum(tx_t.c.entries_count),
+                )
+                .where(*in_month)
+                .group_by(tx_t.c.user_id, tx_t.c.type),
+            )
+            await db.execute(
+                archive_insert.on_conflict_do_update(
+                    index_elements=[
+                        archive_t.c.user_id,
+                        archive_t.c.type,
+                        archive_t.c.period_month,
+                    ],
+                    set_={
+                        "credit_sum": (
+                            archive_t.c.credit_sum + archive_insert.excluded.credit_sum
+                        ),
+                        "debit_sum": (
+                            archive_t.c.debit_sum + archive_insert.excluded.debit_sum
+                        ),
+                        "entries_count": (
+                            archive_t.c.entries_count
+                            + archive_insert.excluded.entries_count
+                        ),
+                    },
+                )
+            )
+
+            if partition is not None:
+                await db.execute(
+                    text(f"ALTER TABLE {LEDGER_TABLE} DETACH PARTITION {partition}")
+                )
+                await db.execute(text(f"DROP TABLE {partition}"))
+            else:
+                await db.execute(delete(tx_t).where(*in_month))
+            await db.commit()
+
+        metrics.inc("ledger_months_archived")
+        logger.info("Журнал баланса: месяц %s перенесён в архив", f"{month:%Y-%m}")
+
+
+ledger_maintenance = LedgerMaintenance()
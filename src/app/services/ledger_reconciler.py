@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.constants import LEDGER_RECONCILE_LOCK_KEY, MOSCOW_TZ
+from src.app.core.logger import get_logger
+from src.app.core.metrics import metrics
+from src.app.db.dialect import advisory_xact_lock, upsert_insert
+from src.app.db.session import AsyncSessionLocal, session_scope
+from src.app.models.balance_models import (
+    Balance,
+    BalanceTransaction,
+    BalanceTransactionArchive,
+    LedgerCheckpoint,
+)
+
+logger = get_logger(__name__)
+
+# сколько расхождений держим в отчёте поимённо
+MAX_REPORTED_DRIFTS = 100
+# проводки моложе этого могут ещё не быть видны все (id выдан, коммита нет),
+# поэтому в точку сверки они не попадают
+SETTLE_LAG = timedelta(minutes=5)
+
+
+@dataclass(frozen=True)
+class UserDrift:
+    user_id: int
+    balance: int
+    ledger: int
+
+    @property
+    def drift(self) -> int:
+        return self.balance - self.ledger
+
+
+@dataclass
+class ReconciliationReport:
+    started_at: datetime
+    finished_at: datetime | None = None
+    users_checked: int = 0
+    rows_checked: int = 0
+    drifted_users: int = 0
+    drift_abs_total: int = 0
+    repaired: bool = False
+    drifts: list[UserDrift] = field(default_factory=list)
+
+
+class LedgerReconciler:
+    """
+    Инкрементальная сверка balances.amount с журналом balance_transactions.
+
+    Для каждого пользователя хранится точка сверки (ledger_checkpoints):
+    last_tx_id и сумма delta всех проводок до него. Прогон идёт по balances
+    пачками по user_id (keyset) и для каждой пачки одним запросом читает
+    только проводки новее точки, так что память ограничена размером пачки,
+    а объём чтения — приростом журнала.
+
+    Точка сдвигается лишь по «устоявшимся» проводкам: агрегированные строки
+    кликов за вчера и сегодня ещё растут на месте, а совсем свежие проводки
+    могли быть не видны из-за незакоммиченных транзакций с меньшим id. Такие
+    строки (и всё после первой из них) учитываются в сравнении, но в точку не
+    входят. У пользователя без точки к журналу добавляется архив
+    (balance_transactions_archive).
+
+    С repair=True баланс приводится к журналу: amount = amount - drift
+    (атомарно, параллельные изменения не теряются).
+
+    Сверку запускает каждый процесс приложения; asyncio.Lock спасает только
+    внутри процесса. Поэтому каждая пачка читается и чинится под
+    advisory-блокировкой: два процесса не вычтут одно и то же расхождение
+    дважды и не затрут точки сверки друг друга.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        interval_seconds: float | None = None,
+        chunk_size: int | None = None,
+        repair: bool | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self.interval = (
+            interval_seconds
+            if interval_seconds is not None
+            else settings.ledger_reconcile_interval_seconds
+        )
+        self.chunk_size = chunk_size or settings.ledger_reconcile_chunk_size
+        self.repair = repair if repair is not None else settings.ledger_reconcile_repair
+        self.last_report: ReconciliationReport | None = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Не удалось сверить балансы с журналом")
+
+    # ---------- сверка ----------
+
+    async def run(
+        self,
+        repair: bool | None = None,
+        now: datetime | None = None,
+    ) -> ReconciliationReport:
+        repair = self.repair if repair is None else repair
+        if now is None:
+            now = datetime.now(timezone.utc)
+
+        async with self._lock:
+            report = ReconciliationReport(started_at=now, repaired=repair)
+            with metrics.timer("ledger_reconcile"):
+                after = 0
+                while True:
+                    last_user_id = await self._reconcile_chunk(
+                        after, now, repair, report
+                    )
+                    if last_user_id is None:
+                        break
+                    after = last_user_id
+
+            report.finished_at = datetime.now(timezone.utc)
+            self.last_report = report
+
+        metrics.inc("ledger_rows_reconciled", report.rows_checked)
+        metrics.set_gauge("ledger_drift_users", report.drifted_users)
+        metrics.set_gauge("ledger_drift_abs_total", report.drift_abs_total)
+        if report.drifted_users:
+            logger.warning(
+                f"Сверка журнала: расхождения у {report.drifted_users} "
+                f"пользователей, сумма {report.drift_abs_total}"
+                + (" (исправлено)" if repair else "")
+            )
+        return report
+
+    def _chunk_query(self, after: int, now: datetime):
+        balances = Balance.__table__
+        tx_t = BalanceTransaction.__table__
+        cp_t = LedgerCheckpoint.__table__
+        archive_t = BalanceTransactionArchive.__table__
+
+        today = now.astimezone(MOSCOW_TZ).date()
+        open_from = today - timedelta(days=1)
+        settle_before = now - SETTLE_LAG
+        # нижняя граница created_at для отсечения секций: и агрегированные строки
+        # (начало дня period_date), и свежие проводки не старше неё
+        recent_from = min(
+            datetime.combine(open_from, time.min, tzinfo=MOSCOW_TZ), settle_before
+        )
+
+        chunk = (
+            select(balances.c.user_id, balances.c.amount)
+            .where(balances.c.user_id > after)
+            .order_by(balances.c.user_id)
+            .limit(self.chunk_size)
+            .cte("chunk")
+        )
+        chunk_users = select(chunk.c.user_id)
+
+        unsettled = (
+            select(tx_t.c.user_id, func.min(tx_t.c.id).label("first_id"))
+            .where(
+                tx_t.c.user_id.in_(chunk_users),
+                tx_t.c.created_at >= recent_from,
+                or_(
+                    tx_t.c.period_date >= open_from,
+                    tx_t.c.created_at >= settle_before,
+                ),
+            )
+            .group_by(tx_t.c.user_id)
+            .cte("unsettled")
+        )
+
+        settled = or_(
+            unsettled.c.first_id.is_(None), tx_t.c.id < unsettled.c.first_id
+        )
+        new_rows = (
+            select(
+                tx_t.c.user_id,
+                func.count().label("rows"),
+                func.sum(case((settled, tx_t.c.delta), else_=0)).label("settled_sum"),
+                func.max(case((settled, tx_t.c.id))).label("settled_last_id"),
+                func.sum(case((settled, 0), else_=tx_t.c.delta)).label("pending_sum"),
+            )
+            .select_from(
+                tx_t.outerjoin(cp_t, cp_t.c.user_id == tx_t.c.user_id).outerjoin(
+                    unsettled, unsettled.c.user_id == tx_t.c.user_id
+                )
+            )
+            .where(
+                tx_t.c.user_id.in_(chunk_users),
+                tx_t.c.id > func.coalesce(cp_t.c.last_tx_id, 0),
+            )
+            .group_by(tx_t.c.user_id)
+            .cte("new_rows")
+        )
+
+        archived = (
+            select(
+                archive_t.c.user_id,
+                func.sum(archive_t.c.credit_sum + archive_t.c.debit_sum).label("total"),
+            )
+            .where(archive_t.c.user_id.in_(chunk_users))
+            .group_by(archive_t.c.user_id)
+            .cte("archived")
+        )
+
+        return (
+            select(
+                chunk.c.user_id,
+                chunk.c.amount,
+                cp_t.c.last_tx_id,
+                cp_t.c.ledger_sum,
+                cp_t.c.drift,
+                archived.c.total.label("archived"),
+                new_rows.c.rows,
+                new_rows.c.settled_sum,
+                new_rows.c.settled_last_id,
+                new_rows.c.pending_sum,
+            )
+            .select_from(
+                chunk.outerjoin(cp_t, cp_t.c.user_id == chunk.c.user_id)
+                .outerjoin(new_rows, new_rows.c.user_id == chunk.c.user_id)
+                .outerjoin(archived, archived.c.user_id == chunk.c.user_id)
+            )
+            .order_by(chunk.c.user_id)
+        )
+
+    async def _reconcile_chunk(
+        self,
+        after: int,
+        now: datetime,
+        repair: bool,
+        report: ReconciliationReport,
+    ) -> int | None:
+        """Сверяет одну пачку пользователей; возвращает последний user_id или None."""
+        async with session_scope("ledger.reconcile", self._session_factory) as db:
+            await advisory_xact_lock(db, LEDGER_RECONCILE_LOCK_KEY)
+            rows = (await db.execute(self._chunk_query(after, now))).all()
+            if not rows:
+                return None
+
+            checkpoints: list[dict] = []
+            for row in rows:
+                has_checkpoint = row.last_tx_id is not None
+                base = row.ledger_sum if has_checkpoint else int(row.archived or 0)
+                settled_sum = int(row.settled_sum or 0)
+                ledger = base + settled_sum + int(row.pending_sum or 0)
+                drift = row.amount - ledger
+
+                report.users_checked += 1
+                report.rows_checked += row.rows or 0
+                if drift:
+                    report.drifted_users += 1
+                    report.drift_abs_total += abs(drift)
+                    if len(report.drifts) < MAX_REPORTED_DRIFTS:
+                        report.drifts.append(
+                            UserDrift(
+                                user_id=row.user_id, balance=row.amount, ledger=ledger
+                            )
+                        )
+                    if repair:
+                        await db.execute(
+                            update(Balance.__table__)
+                            .where(Balance.__table__.c.user_id == row.user_id)
+                            .values(amount=Balance.__table__.c.amount - drift)
+                        )
+                        metrics.inc("ledger_drift_repaired")
+                        drift = 0
+
+                if (
+                    has_checkpoint
+                    and row.settled_last_id is None
+                    and drift == row.drift
+                ):
+                    continue
+                checkpoints.append(
+                    {
+                        "user_id": row.user_id,
+                        "last_tx_id": row.settled_last_id or row.last_tx_id or 0,
+                        "ledger_sum": base + settled_sum,
+                        "drift": drift,
+                        "checked_at": now,
+                    }
+                )
+
+            if checkpoints:
+                cp_t = LedgerCheckpoint.__table__
+                stmt = upsert_insert(db, cp_t).values(checkpoints)
+                await db.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[cp_t.c.user_id],
+                        set_={
+                            "last_tx_id": stmt.excluded.last_tx_id,
+                            "ledger_sum": stmt.excluded.ledger_sum,
+                            "drift": stmt.excluded.drift,
+                            "checked_at": stmt.excluded.checked_at,
+                        },
+                    )
+                )
+            await db.commit()
+            return rows[-1].user_id
+
+
+ledger_reconciler = LedgerReconciler()
@@ -0,0 +1,74 @@
+"""
+Массовое начисление бонусов из CSV.
+
+Запуск:
+    python -m src.award_bonuses awards.csv --type admin_adjust
+
+CSV — с заголовком telegram_id,delta[,description]. Начисления идут пачками
+(CAMPBOT_BONUS_AWARD_CHUNK_SIZE); пачка применяется целиком или не применяется
+вовсе, неудавшиеся строки пишутся в <файл>.failed.csv для повторного запуска.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import sys
+from pathlib import Path
+
+from src.app.models.balance_models import TransactionType
+from src.app.services.bonus_award_service import (
+    BULK_AWARD_TYPES,
+    BonusAwardService,
+    parse_awards_csv,
+)
+
+
+def _print_progress(done: int, total: int) -> None:
+    print(f"\r{done}/{total}", end="", flush=True)
+
+
+async def main(path: Path, tx_type: TransactionType, allow_negative: bool) -> int:
+    awards = parse_awards_csv(path.read_text(encoding="utf-8"))
+    result = await BonusAwardService().award(
+        awards,
+        tx_type=tx_type,
+        allow_negative=allow_negative,
+        progress=_print_progress,
+    )
+    print()
+    print(f"Начислено: {result.applied} из {result.total}")
+
+    if result.unknown_telegram_ids:
+        print(f"Не найдены telegram_id: {result.unknown_telegram_ids}")
+    for error in result.errors:
+        print(f"Ошибка: {error}", file=sys.stderr)
+
+    if result.failed:
+        failed_path = path.with_suffix(".failed.csv")
+        with failed_path.open("w", encoding="utf-8", newline="") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(["telegram_id", "delta", "description"])
+            for award in result.failed:
+                writer.writerow([award.telegram_id, award.delta, award.description or ""])
+        print(f"Неприменённые строки: {failed_path}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("csv_path", type=Path)
+    parser.add_argument(
+        "--type",
+        default=TransactionType.ADMIN_ADJUST.value,
+        choices=sorted(tx_type.value for tx_type in BULK_AWARD_TYPES),
+    )
+    parser.add_argument("--allow-negative", action="store_true")
+    args = parser.parse_args()
+
+    sys.exit(
+        asyncio.run(main(args.csv_path, TransactionType(args.type), args.allow_negative))
+    )
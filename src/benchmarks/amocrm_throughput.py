@@ -0,0 +1,252 @@
+"""
+Пропускная способность отправки заказов в AmoCRM, без живой AmoCRM.
+
+Запуск:
+    python -m src.benchmarks.amocrm_throughput --orders 200 --latency-ms 50
+
+AmoCRM заменяет FakeAmoCRM (src/testing/fake_amocrm.py) с заданной задержкой,
+лимитом запросов и долей ошибок; токен берётся через её /oauth2/access_token.
+По умолчанию клиент ходит в неё через ASGITransport (без сети), с --tcp фейк
+поднимается под uvicorn на 127.0.0.1 и запросы идут через пул соединений
+AmoCRMHttp — так виден эффект keep-alive.
+
+Варианты:
+    single — AmoCRMService.send_order_to_amocrm на каждый заказ,
+             --concurrency одновременно;
+    batch  — AmoCRMService.push_orders пачками по LEADS_COMPLEX_MAX_BATCH
+             (как outbox); задержка заказа — время его пачки.
+
+Заказы создаются в --database-url или во временной SQLite-базе через
+create_all, поэтому базу лучше брать отдельную, не рабочую.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import uvicorn
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.app import models  # noqa: F401
+from src.app.core.metrics import metrics
+from src.app.db.base import Base
+from src.app.models.shop_models import Order, OrderItem, PaymentMethod, Product
+from src.app.models.user_models import User, UserRole
+from src.app.services.amocrm_circuit import AmoCRMCircuitBreaker
+from src.app.services.amocrm_client import (
+    LEADS_COMPLEX_MAX_BATCH,
+    AmoCRMClient,
+    AmoCRMTokenStorage,
+)
+from src.app.services.amocrm_http import AmoCRMHttp
+from src.app.services.amocrm_rate_limit import AmoCRMRateLimiter
+from src.app.services.amocrm_service import AmoCRMService
+from src.testing.fake_amocrm import FAKE_BASE_URL, FakeAmoCRM
+
+# telegram_id покупателя, чтобы не пересекаться с живыми
+BENCH_TELEGRAM_ID = 9_100_000_000
+
+
+async def _create_orders(
+    session_factory: async_sessionmaker[AsyncSession], count: int
+) -> list[int]:
+    async with session_factory() as db:
+        user = await db.scalar(select(User).where(User.telegram_id == BENCH_TELEGRAM_ID))
+        if user is None:
+            user = User(telegram_id=BENCH_TELEGRAM_ID, role=UserRole.PARENT)
+            db.add(user)
+        product = Product(
+            name="Бенчмарк AmoCRM",
+            price_bonus=0,
+            price_money=1500,
+            category="bench",
+            is_active=True,
+        )
+        db.add(product)
+        await db.flush()
+
+        orders = []
+        for i in range(count):
+            order = Order(
+                user_id=user.id,
+                total_money=1500,
+                payment_method=PaymentMethod.CARD_ONLY,
+                customer_name=f"Покупатель {i}",
+                customer_phone=f"+7999{i:07d}",
+            )
+            order.items.append(
+                OrderItem(
+                    product_id=product.id,
+                    quantity=1,
+                    unit_price_bonus=0,
+                    unit_price_money=1500,
+                )
+            )
+            orders.append(order)
+        db.add_all(orders)
+        await db.commit()
+        return [order.id for order in orders]
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+async def _run_variant(
+    name: str,
+    client: AmoCRMClient,
+    fake: FakeAmoCRM,
+    session_factory: async_sessionmaker[AsyncSession],
+    orders: int,
+    concurrency: int,
+) -> None:
+    order_ids = await _create_orders(session_factory, orders)
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(order_id: int) -> None:
+        async with semaphore, session_factory() as db:
+            started = time.perf_counter()
+            order = await db.get(Order, order_id)
+            await AmoCRMService(db, client=client).send_order_to_amocrm(order)
+            latencies.append(time.perf_counter() - started)
+
+    async def send_batch(batch: list[int]) -> None:
+        async with semaphore, session_factory() as db:
+            started = time.perf_counter()
+            await AmoCRMService(db, client=client).push_orders(batch)
+            latencies.extend([time.perf_counter() - started] * len(batch))
+
+    if name == "single":
+        jobs = [send_one(order_id) for order_id in order_ids]
+    else:
+        jobs = [
+            send_batch(order_ids[start:start + LEADS_COMPLEX_MAX_BATCH])
+            for start in range(0, len(order_ids), LEADS_COMPLEX_MAX_BATCH)
+        ]
+
+    metrics.reset()
+    requests_before = fake.requests_total
+    rejected_before = fake.rejected_429
+    errors_before = fake.errors_injected
+    started = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started
+
+    async with session_factory() as db:
+        sent = await db.scalar(
+            select(func.count())
+            .select_from(Order)
+            .where(Order.id.in_(order_ids), Order.amocrm_lead_id.is_not(None))
+        )
+
+    latencies.sort()
+    print(
+        f"{name:>6}: {orders / elapsed:8.1f} orders/s, "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms, "
+        f"p99 {_percentile(latencies, 0.99) * 1000:7.1f} ms, "
+        f"{fake.requests_total - requests_before} requests "
+        f"({fake.rejected_429 - rejected_before} x429, "
+        f"{fake.errors_injected - errors_before} x5xx, "
+        f"{metrics.counters.get('amocrm_http_retries', 0)} retries), "
+        f"sent {sent}/{orders}, circuit {client.breaker.state.value}"
+    )
+
+
+async def _start_server(fake: FakeAmoCRM, port: int) -> tuple[uvicorn.Server, asyncio.Task]:
+    server = uvicorn.Server(
+        uvicorn.Config(fake.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+async def main(args: argparse.Namespace) -> None:
+    fake = FakeAmoCRM(
+        latency=args.latency_ms / 1000,
+        rate_limit=args.server_rate_limit or None,
+        error_rate=args.error_rate,
+        retry_after="1",
+        seed=1,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = args.database_url or f"sqlite+aiosqlite:///{Path(tmp_dir) / 'bench.db'}"
+        engine = create_async_engine(url)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        server = server_task = None
+        if args.tcp:
+            server, server_task = await _start_server(fake, args.port)
+            holder = AmoCRMHttp(max_connections=args.concurrency)
+            http, base_url = holder.client, f"http://127.0.0.1:{args.port}"
+        else:
+            http, base_url = fake.http_client(), FAKE_BASE_URL
+
+        client = AmoCRMClient(
+            http=http,
+            rate_limiter=AmoCRMRateLimiter(
+                rate_per_second=args.client_rate, burst=max(int(args.client_rate), 1)
+            ),
+            breaker=AmoCRMCircuitBreaker(),
+        )
+        client.base_url = base_url
+        client.client_id = client.client_secret = client.redirect_uri = "bench"
+        client.token_storage = AmoCRMTokenStorage(Path(tmp_dir) / "amocrm_token.json")
+
+        try:
+            await client.exchange_code_for_tokens("bench-code")
+            print(
+                f"{engine.dialect.name}, {'tcp' if args.tcp else 'asgi'}: "
+                f"{args.orders} orders, concurrency {args.concurrency}, "
+                f"latency {args.latency_ms} ms, server limit "
+                f"{args.server_rate_limit or '-'} rps, client limit "
+                f"{args.client_rate} rps, error rate {args.error_rate:.0%}"
+            )
+            for variant in args.variants.split(","):
+                await _run_variant(
+                    variant,
+                    client,
+                    fake,
+                    session_factory,
+                    args.orders,
+                    args.concurrency,
+                )
+        finally:
+            await http.aclose()
+            if server is not None:
+                server.should_exit = True
+                await server_task
+            await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument(
+        "--server-rate-limit", type=int, default=7, help="0 — без лимита"
+    )
+    parser.add_argument("--client-rate", type=float, default=7)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--variants", default="single,batch")
+    parser.add_argument("--tcp", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
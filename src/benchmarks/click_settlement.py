@@ -0,0 +1,178 @@
+"""
+Сравнение прежнего ORM-пути клика с GameRepository.settle_clicks.
+
+Запуск:
+    python -m src.benchmarks.click_settlement --database-url postgresql+asyncpg://...
+
+Без --database-url используется временная SQLite-база (для PostgreSQL-пути
+результаты показательны только на PostgreSQL). Таблицы создаются через
+create_all, поэтому базу лучше брать отдельную, не рабочую.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from src.app import models  # noqa: F401
+from src.app.core.constants import MAX_DAILY_ENERGY, MOSCOW_TZ
+from src.app.db.base import Base
+from src.app.models.balance_models import Balance, BalanceTransaction, TransactionType
+from src.app.models.game_models import GameStats
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.balance_repo import BalanceRepository
+from src.app.repositories.game_repo import GameRepository
+
+# telegram_id тестовых игроков, чтобы не пересекаться с живыми
+BENCH_TELEGRAM_ID_BASE = 9_000_000_000
+
+
+async def legacy_click(db: AsyncSession, user: User) -> tuple[int, int]:
+    """Прежняя обработка клика: статистика в Python + отдельный change_balance."""
+    stmt = select(GameStats).where(GameStats.user_id == user.id)
+    stats = (await db.execute(stmt)).scalar_one_or_none()
+    if stats is None:
+        stats = GameStats(user_id=user.id, total_clicks=0, clicks_today=0)
+        db.add(stats)
+        await db.flush()
+        await db.refresh(stats)
+
+    today_msk = datetime.now(MOSCOW_TZ).date()
+    if stats.clicks_today_date != today_msk:
+        stats.clicks_today = 0
+        stats.clicks_today_date = today_msk
+
+    balance_repo = BalanceRepository(db)
+    if stats.clicks_today >= MAX_DAILY_ENERGY:
+        return await balance_repo.get_balance(user), 0
+
+    stats.total_clicks += 1
+    stats.clicks_today += 1
+    stats.last_click_at = datetime.now(MOSCOW_TZ)
+
+    await balance_repo.change_balance(
+        user=user,
+        delta=1,
+        tx_type=TransactionType.GAME_CLICK,
+        description="Game click reward",
+    )
+    db.add(stats)
+    await db.flush()
+    await db.commit()
+
+    new_balance = await balance_repo.get_balance(user)
+    return new_balance, max(MAX_DAILY_ENERGY - stats.clicks_today, 0)
+
+
+async def settle_click(db: AsyncSession, user: User) -> tuple[int, int]:
+    settlement = await GameRepository(db).settle_clicks(user.id, 1)
+    await db.commit()
+    return settlement.balance, settlement.energy
+
+
+class StatementCounter:
+    """Считает SQL-запросы, ушедшие в БД через движок."""
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.count = 0
+        self._engine = engine.sync_engine
+        event.listen(self._engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        self.count += 1
+
+    def close(self) -> None:
+        event.remove(self._engine, "before_cursor_execute", self._on_execute)
+
+
+async def _prepare_users(
+    session_factory: async_sessionmaker[AsyncSession], users: int
+) -> list[User]:
+    ids = range(BENCH_TELEGRAM_ID_BASE, BENCH_TELEGRAM_ID_BASE + users)
+    async with session_factory() as db:
+        existing = (
+            await db.scalars(select(User.id).where(User.telegram_id.in_(ids)))
+        ).all()
+        if existing:
+            for model in (BalanceTransaction, Balance, GameStats):
+                await db.execute(delete(model).where(model.user_id.in_(existing)))
+            await db.execute(delete(User).where(User.id.in_(existing)))
+
+        players = [User(telegram_id=tg_id, role=UserRole.CHILD) for tg_id in ids]
+        db.add_all(players)
+        await db.commit()
+    return players
+
+
+async def _run_variant(
+    name: str,
+    click: Callable[[AsyncSession, User], Awaitable[tuple[int, int]]],
+    engine: AsyncEngine,
+    session_factory: async_sessionmaker[AsyncSession],
+    users: int,
+    clicks: int,
+) -> None:
+    players = await _prepare_users(session_factory, users)
+    counter = StatementCounter(engine)
+    latencies: list[float] = []
+
+    async def player_loop(user: User) -> None:
+        for _ in range(clicks):
+            started = time.perf_counter()
+            async with session_factory() as db:
+                await click(db, user)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(player_loop(user) for user in players))
+    elapsed = time.perf_counter() - started
+    counter.close()
+
+    total = users * clicks
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:>8}: {total / elapsed:8.1f} clicks/s, "
+        f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+        f"p99 {p99 * 1000:6.2f} ms, "
+        f"{counter.count / total:4.1f} statements/click"
+    )
+
+
+async def main(database_url: str | None, users: int, clicks: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = database_url or f"sqlite+aiosqlite:///{Path(tmp_dir) / 'bench.db'}"
+        engine = create_async_engine(url)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        print(f"{engine.dialect.name}: {users} users x {clicks} clicks")
+        await _run_variant("orm", legacy_click, engine, session_factory, users, clicks)
+        await _run_variant("settle", settle_click, engine, session_factory, users, clicks)
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--clicks", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.database_url, args.users, args.clicks))
@@ -0,0 +1,231 @@
+"""
+Поддельная AmoCRM для тестов и бенчмарков.
+
+ASGI-приложение с теми ручками AmoCRM, которыми пользуется AmoCRMClient:
+/oauth2/access_token, /api/v4/leads/complex и список сделок /api/v4/leads.
+Клиент ходит в него по настоящему HTTP-стеку httpx через ASGITransport —
+без сети, но с сериализацией, заголовками и статусами как у живого API, —
+или по TCP, если приложение поднято под uvicorn (src.benchmarks).
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import secrets
+import time
+from typing import Any
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+FAKE_BASE_URL = "https://fake.amocrm.ru"
+
+
+class FakeAmoCRM:
+    """
+    latency — задержка каждого ответа, секунды.
+    rate_limit/window — не больше rate_limit принятых запросов за window
+    секунд, сверх — 429 (как настоящий лимит ~7 rps на аккаунт).
+    fail_first_with_429 — столько первых запросов получают 429 без условий.
+    retry_after — значение заголовка Retry-After у 429 (None — без него).
+    error_rate — доля принятых запросов, на которые отвечаем error_status
+    (по умолчанию 503); seed делает последовательность ошибок повторяемой.
+
+    /api/v4 требует заголовок Authorization; после того как фейк выдал
+    токены через /oauth2/access_token, принимаются только выданные им.
+
+    Созданные сделки хранятся в leads со status_id и updated_at; статус
+    меняет set_lead_status (как менеджер в интерфейсе AmoCRM).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        rate_limit: int | None = None,
+        window: float = 1.0,
+        fail_first_with_429: int = 0,
+        retry_after: str | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int | None = None,
+        access_token_ttl: int = 86400,
+    ) -> None:
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = window
+        self.fail_first_with_429 = fail_first_with_429
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.access_token_ttl = access_token_ttl
+        self._random = random.Random(seed)
+
+        self.requests_total = 0
+        self.rejected_429 = 0
+        self.errors_injected = 0
+        self.access_tokens: set[str] = set()
+        self.refresh_tokens: set[str] = set()
+        self.leads: dict[int, dict[str, Any]] = {}
+        self._accepted_at: list[float] = []
+        self._ids = itertools.count(1)
+
+        self.app = self._build_app()
+
+    def set_lead_status(
+        self, lead_id: int, status_id: int, updated_at: int | None = None
+    ) -> None:
+        lead = self.leads.setdefault(lead_id, {"id": lead_id})
+        lead["status_id"] = status_id
+        lead["updated_at"] = updated_at if updated_at is not None else int(time.time())
+
+    def _issue_token(self) -> dict[str, Any]:
+        access_token = secrets.token_hex(16)
+        refresh_token = secrets.token_hex(16)
+        self.access_tokens.add(access_token)
+        self.refresh_tokens.add(refresh_token)
+        return {
+            "token_type": "Bearer",
+            "expires_in": self.access_token_ttl,
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+        }
+
+    def _authorized(self, request: Request) -> bool:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme != "Bearer" or not token:
+            return False
+        return not self.access_tokens or token in self.access_tokens
+
+    def http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app))
+
+    # ---------- поведение ----------
+
+    def _throttle(self) -> JSONResponse | None:
+        self.requests_total += 1
+        now = time.monotonic()
+        self._accepted_at = [t for t in self._accepted_at if t > now - self.window]
+
+        over_limit = (
+            self.rate_limit is not None and len(self._accepted_at) >= self.rate_limit
+        )
+        if self.requests_total <= self.fail_first_with_429 or over_limit:
+            self.rejected_429 += 1
+            headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+            return JSONResponse(
+                {"title": "Too Many Requests", "status": 429},
+                status_code=429,
+                headers=headers,
+            )
+
+        self._accepted_at.append(now)
+        return None
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def limits(request: Request, call_next):
+            rejected = self._throttle()
+            if rejected is not None:
+                return rejected
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors_injected += 1
+                return JSONResponse(
+                    {"title": "Service Unavailable", "status": self.error_status},
+                    status_code=self.error_status,
+                )
+            if request.url.path.startswith("/api/v4/") and not self._authorized(
+                request
+            ):
+                return JSONResponse(
+                    {"title": "Unauthorized", "status": 401}, status_code=401
+                )
+            return await call_next(request)
+
+        @app.post("/oauth2/access_token")
+        async def access_token(request: Request) -> Any:
+            payload = await request.json()
+            grant_type = payload.get("grant_type")
+            if grant_type == "authorization_code":
+                valid = bool(payload.get("code"))
+            elif grant_type == "refresh_token":
+                # refresh token одноразовый, как в AmoCRM
+                valid = payload.get("refresh_token") in self.refresh_tokens
+                self.refresh_tokens.discard(payload.get("refresh_token"))
+            else:
+                valid = False
+            if not valid:
+                return JSONResponse(
+                    {"title": "Bad Request", "status": 400, "hint": grant_type},
+                    status_code=400,
+                )
+            return self._issue_token()
+
+        @app.post("/api/v4/leads/complex")
+        async def leads_complex(request: Request) -> list[dict[str, Any]]:
+            payload = await request.json()
+            created = []
+            for lead in payload:
+                lead_id = next(self._ids)
+                self.leads[lead_id] = {
+                    **lead,
+                    "id": lead_id,
+                    "status_id": 1,
+                    "updated_at": int(time.time()),
+                }
+                item: dict[str, Any] = {
+                    "id": lead_id,
+                    "contact_id": lead_id,
+                    "company_id": None,
+                    "merged": False,
+                }
+                if "request_id" in lead:
+                    item["request_id"] = [lead["request_id"]]
+                created.append(item)
+            return created
+
+        @app.get("/api/v4/leads")
+        async def list_leads(request: Request) -> Any:
+            params = request.query_params
+            updated_from = int(params.get("filter[updated_at][from]", 0))
+            page = int(params.get("page", 1))
+            limit = min(int(params.get("limit", 50)), 250)
+
+            matching = sorted(
+                (
+                    lead
+                    for lead in self.leads.values()
+                    if lead.get("updated_at", 0) >= updated_from
+                ),
+                key=lambda lead: (lead["updated_at"], lead["id"]),
+            )
+            chunk = matching[(page - 1) * limit : page * limit]
+            if not chunk:
+                return Response(status_code=204)
+
+            links: dict[str, Any] = {"self": {"href": str(request.url)}}
+            if page * limit < len(matching):
+                links["next"] = {"href": f"/api/v4/leads?page={page + 1}"}
+            return {
+                "_page": page,
+                "_links": links,
+                "_embedded": {
+                    "leads": [
+                        {
+                            "id": lead["id"],
+                            "name": lead.get("name"),
+                            "price": lead.get("price"),
+                            "status_id": lead["status_id"],
+                            "updated_at": lead["updated_at"],
+                        }
+                        for lead in chunk
+                    ]
+                },
+            }
+
+        return app
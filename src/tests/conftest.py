@@ -1,16 +1,41 @@
 from __future__ import annotations
 
 import os
+from pathlib import Path
 from typing import AsyncGenerator, Generator
 
 import pytest
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 
 os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
 os.environ.setdefault("CAMPBOT_AMOCRM_SUBDOMAIN", "test")
 os.environ.setdefault("CAMPBOT_TELEGRAM_BOT_TOKEN", "123456:TESTTOKEN")
+os.environ.setdefault("CAMPBOT_SESSION_SECRET", "test-session-secret-0123456789abcdef")
+
+
+@pytest.fixture(autouse=True)
+def _clear_identity_cache() -> Generator[None, None, None]:
+    # кэш пользователей общий на процесс — не тащим его между тестами
+    yield
+    from src.app.services.identity_cache import identity_cache
+
+    identity_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_amocrm_circuit() -> Generator[None, None, None]:
+    # автомат AmoCRM тоже общий на процесс
+    yield
+    from src.app.services.amocrm_circuit import amocrm_circuit_breaker
+
+    amocrm_circuit_breaker.reset()
 
 
 @pytest.fixture
@@ -29,6 +54,24 @@ async def async_client() -> AsyncGenerator[AsyncClient, None]:
         yield client
 
 
+@pytest.fixture
+async def session_factory(
+    tmp_path: Path,
+) -> AsyncGenerator[async_sessionmaker[AsyncSession], None]:
+    # файл, а не :memory: — сервисы открывают собственные сессии
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+
+    from src.app import models  # noqa: F401
+    from src.app.db.base import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False)
+
+    await engine.dispose()
+
+
 @pytest.fixture
 def sample_transaction_webhook() -> dict:
     return {
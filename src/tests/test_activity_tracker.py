@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.models.user_models import User, UserRole
+from src.app.services.activity_tracker import ActivityTracker
+
+
+async def _create_users(
+    session_factory: async_sessionmaker[AsyncSession], count: int
+) -> list[User]:
+    async with session_factory() as db:
+        users = [User(telegram_id=1000 + i, role=UserRole.CHILD) for i in range(count)]
+        db.add_all(users)
+        await db.commit()
+    return users
+
+
+async def _stamps(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> dict[int, tuple[datetime | None, datetime | None]]:
+    async with session_factory() as db:
+        rows = await db.execute(
+            select(
+                User.id, User.last_app_interaction_at, User.last_bot_interaction_at
+            )
+        )
+        return {row.id: (row[1], row[2]) for row in rows}
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestActivityTracker:
+    async def test_touches_are_written_in_one_flush(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        users = await _create_users(session_factory, 3)
+        tracker = ActivityTracker(
+            session_factory, flush_interval_seconds=60, min_interval_seconds=60
+        )
+
+        tracker.touch_app(users[0].id)
+        tracker.touch_app(users[1].id)
+        tracker.touch_bot(users[2].id)
+
+        # до сброса ничего не записано
+        before = await _stamps(session_factory)
+        assert all(stamps == (None, None) for stamps in before.values())
+
+        await tracker.flush()
+
+        stamps = await _stamps(session_factory)
+        assert stamps[users[0].id][0] is not None
+        assert stamps[users[1].id][0] is not None
+        assert stamps[users[2].id][0] is None
+        assert stamps[users[2].id][1] is not None
+
+    async def test_recently_persisted_stamp_is_not_rewritten(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        (user,) = await _create_users(session_factory, 1)
+        tracker = ActivityTracker(
+            session_factory, flush_interval_seconds=60, min_interval_seconds=60
+        )
+
+        tracker.touch_app(user.id)
+        await tracker.flush()
+        first = (await _stamps(session_factory))[user.id][0]
+
+        tracker.touch_app(user.id)
+        await tracker.flush()
+
+        assert (await _stamps(session_factory))[user.id][0] == first
+
+    async def test_stop_flushes_pending_stamps(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        (user,) = await _create_users(session_factory, 1)
+        tracker = ActivityTracker(
+            session_factory, flush_interval_seconds=60, min_interval_seconds=60
+        )
+        await tracker.start()
+
+        tracker.touch_bot(user.id)
+        await tracker.stop()
+
+        assert (await _stamps(session_factory))[user.id][1] is not None
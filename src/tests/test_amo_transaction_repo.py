@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Iterator
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.models.amocrm_models import AmoTransaction, AmoTransactionStatus
+from src.app.repositories.amo_transaction_repo import AmoTransactionRepository
+from src.app.schemas.amocrm_schemas import TransactionWebhook
+from src.app.services.amocrm_service import AmoCRMService
+
+
+@contextmanager
+def count_statements(db: AsyncSession) -> Iterator[list[str]]:
+    statements: list[str] = []
+    engine = db.get_bind()
+
+    def before_execute(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoTransactionIngest:
+    async def test_duplicate_returns_existing_row(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        async with session_factory() as db:
+            repo = AmoTransactionRepository(db)
+            first = await repo.ingest({"id": 1}, "add:1", amocrm_lead_id=10)
+            assert first.inserted
+            assert first.status == AmoTransactionStatus.NEW
+
+            await repo.mark_processed(first.id)
+            with count_statements(db) as statements:
+                again = await repo.ingest({"id": 1}, "add:1", amocrm_lead_id=10)
+            assert len(statements) == 1
+            assert not again.inserted
+            assert again.id == first.id
+            assert again.status == AmoTransactionStatus.PROCESSED
+
+            await repo.mark_error(first.id, "boom")
+            await db.commit()
+
+            tx = await db.get(AmoTransaction, first.id)
+            assert tx.status == AmoTransactionStatus.ERROR
+            assert tx.error_message == "boom"
+
+    async def test_duplicate_webhook_costs_one_statement(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        sample_transaction_webhook: dict,
+    ) -> None:
+        webhook = TransactionWebhook.model_validate(sample_transaction_webhook)
+        async with session_factory() as db:
+            service = AmoCRMService(db)
+            result = await service.handle_transaction_webhook(webhook)
+            assert result.message == "Stored transaction processed"
+
+            with count_statements(db) as statements:
+                result = await service.handle_transaction_webhook(webhook)
+            assert result.message == "Transaction already processed"
+            assert len(statements) == 1
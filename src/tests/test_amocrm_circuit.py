@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import AsyncGenerator
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.api import deps
+from src.app.core.metrics import metrics
+from src.app.db.session import get_db
+from src.app.models.amocrm_models import AmoOutbox, AmoOutboxStatus
+from src.app.models.shop_models import Order, PaymentMethod
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.amocrm_outbox_repo import AmoOutboxRepository
+from src.app.services.amocrm_circuit import (
+    AmoCRMCircuitBreaker,
+    AmoCRMUnavailable,
+    CircuitState,
+    amocrm_circuit_breaker,
+)
+from src.app.services.amocrm_client import AmoCRMClient
+from src.app.services.amocrm_outbox import AmoCRMOutboxDispatcher
+from src.app.services.amocrm_rate_limit import AmoCRMRateLimiter
+from src.app.services.identity_cache import UserIdentity
+from src.tests.test_amocrm_client import make_token
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+class UnavailableAmoCRMService:
+    """push_orders, которому автомат не дал дойти до AmoCRM."""
+
+    calls = 0
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def push_orders(self, order_ids: list[int]) -> dict[int, Exception]:
+        UnavailableAmoCRMService.calls += 1
+        return {order_id: AmoCRMUnavailable(retry_in=15) for order_id in order_ids}
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+async def outbox_ids(session_factory: async_sessionmaker[AsyncSession]) -> list[int]:
+    async with session_factory() as db:
+        user = User(telegram_id=7000, role=UserRole.PARENT)
+        db.add(user)
+        await db.flush()
+        orders = [
+            Order(user_id=user.id, payment_method=PaymentMethod.CARD_ONLY)
+            for _ in range(2)
+        ]
+        db.add_all(orders)
+        await db.flush()
+        entries = [AmoOutboxRepository(db).enqueue_order(order.id) for order in orders]
+        for entry in entries:
+            entry.next_attempt_at = NOW
+        await db.commit()
+        return [entry.id for entry in entries]
+
+
+def test_breaker_opens_half_opens_and_closes() -> None:
+    breaker = AmoCRMCircuitBreaker(failure_threshold=2, reset_timeout_seconds=0.05)
+    states: list[CircuitState] = []
+    breaker.add_listener(states.append)
+
+    breaker.record_failure("timeout")
+    breaker.allow()
+    breaker.record_failure("timeout")
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(AmoCRMUnavailable):
+        breaker.allow()
+    assert breaker.snapshot()["last_error"] == "timeout"
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitState.HALF_OPEN
+    # пробный запрос один, остальные пока отклоняются
+    breaker.allow()
+    with pytest.raises(AmoCRMUnavailable):
+        breaker.allow()
+
+    # пробный не удался — снова разомкнут
+    breaker.record_failure("status 503")
+    assert breaker.state == CircuitState.OPEN
+
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert states == [
+        CircuitState.OPEN,
+        CircuitState.HALF_OPEN,
+        CircuitState.OPEN,
+        CircuitState.HALF_OPEN,
+        CircuitState.CLOSED,
+    ]
+    assert metrics.counters["amocrm_circuit_opened"] == 2
+    assert metrics.gauges["amocrm_circuit_state"] == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoCRMCircuit:
+    async def test_open_circuit_fails_fast_without_requests(self) -> None:
+        calls = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            raise httpx.ReadTimeout("AmoCRM is slow", request=request)
+
+        breaker = AmoCRMCircuitBreaker(failure_threshold=2, reset_timeout_seconds=60)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = AmoCRMClient(
+                http=http,
+                rate_limiter=AmoCRMRateLimiter(rate_per_second=100, burst=10),
+                breaker=breaker,
+            )
+            client.max_retries = 0
+            with patch.object(
+                AmoCRMClient, "get_valid_token", new=AsyncMock(return_value=make_token())
+            ):
+                for _ in range(2):
+                    with pytest.raises(httpx.ReadTimeout):
+                        await client.create_lead_with_contact("Заказ", 100, None)
+
+                started = time.monotonic()
+                with pytest.raises(AmoCRMUnavailable):
+                    await client.create_lead_with_contact("Заказ", 100, None)
+                assert time.monotonic() - started < 0.05
+
+        assert calls == 2
+        assert breaker.state == CircuitState.OPEN
+
+    async def test_outbox_waits_while_open_and_defers_rejected(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        outbox_ids: list[int],
+    ) -> None:
+        breaker = AmoCRMCircuitBreaker(failure_threshold=1, reset_timeout_seconds=60)
+        UnavailableAmoCRMService.calls = 0
+        dispatcher = AmoCRMOutboxDispatcher(
+            session_factory,
+            max_attempts=1,
+            service_factory=UnavailableAmoCRMService,
+            breaker=breaker,
+        )
+
+        # автомат разомкнут — очередь не трогаем
+        breaker.record_failure("timeout")
+        assert await dispatcher.run_once(NOW) == 0
+        assert UnavailableAmoCRMService.calls == 0
+
+        # отклонённая автоматом пачка откладывается без траты попыток
+        breaker.record_success()
+        assert await dispatcher.run_once(NOW) == 2
+        async with session_factory() as db:
+            entries = (await db.scalars(select(AmoOutbox).order_by(AmoOutbox.id))).all()
+        assert [entry.status for entry in entries] == [AmoOutboxStatus.PENDING] * 2
+        assert [entry.attempts for entry in entries] == [0, 0]
+        assert metrics.counters["amocrm_outbox_deferred"] == 2
+
+    async def test_recovery_wakes_the_outbox(self) -> None:
+        breaker = AmoCRMCircuitBreaker(failure_threshold=1, reset_timeout_seconds=60)
+        dispatcher = AmoCRMOutboxDispatcher(breaker=breaker, interval_seconds=60)
+        with patch.object(dispatcher, "run_once", new=AsyncMock(return_value=0)):
+            await dispatcher.start()
+            try:
+                await asyncio.sleep(0)
+                breaker.record_failure("timeout")
+                assert not dispatcher._wakeup.is_set()
+                breaker.record_success()
+                assert dispatcher._wakeup.is_set()
+            finally:
+                await dispatcher.stop()
+
+
+@pytest.mark.anyio
+@pytest.mark.api
+async def test_health_reports_circuit_state() -> None:
+    from src.app.main import health_check
+
+    assert (await health_check())["status"] == "healthy"
+
+    for _ in range(amocrm_circuit_breaker.failure_threshold):
+        amocrm_circuit_breaker.record_failure("timeout")
+    health = await health_check()
+    assert health["status"] == "degraded"
+    assert health["amocrm"]["state"] == "open"
+    assert health["amocrm"]["retry_in_seconds"] > 0
+
+
+@pytest.mark.anyio
+async def test_metrics_require_admin(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:
+    from src.app.main import app
+
+    async with session_factory() as db:
+        db.add(User(id=1, telegram_id=1, role=UserRole.ADMIN))
+        await db.commit()
+
+    async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            anonymous = await client.get("/metrics")
+            app.dependency_overrides[deps.get_verified_identity] = lambda: (
+                UserIdentity(id=1, telegram_id=1, role=UserRole.ADMIN)
+            )
+            admin = await client.get("/metrics")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert anonymous.status_code == 401
+    assert admin.status_code == 200
+    assert "counters" in admin.json()
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import json
 from datetime import datetime, timedelta, timezone
-from unittest.mock import AsyncMock, MagicMock, patch
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
 
 import httpx
 import pytest
 
-from src.app.services.amocrm_client import AmoCRMClient, AmoCRMToken
+from src.app.services.amocrm_client import (
+    AmoCRMClient,
+    AmoCRMToken,
+    AmoCRMTokenStorage,
+)
+from src.app.services.amocrm_http import AmoCRMHttp
+
+
+def make_token(access_token: str = "test_token") -> AmoCRMToken:
+    return AmoCRMToken(
+        access_token=access_token,
+        refresh_token="refresh_token",
+        token_type="Bearer",
+        expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+    )
 
 
 @pytest.mark.anyio
@@ -14,40 +31,22 @@ from src.app.services.amocrm_client import AmoCRMClient, AmoCRMToken
 @pytest.mark.amocrm
 class TestAmoCRMClient:
     async def test_create_lead_with_contact_success(self):
-        # create_lead_with_contact ожидает, что .json() вернёт список с лидами
-        mock_response_data = [
-            {
-                "id": 123,
-            }
-        ]
-
-        with patch("src.app.services.amocrm_client.httpx.AsyncClient") as mock_client:
-            mock_instance = AsyncMock()
-            # Клиент — это AsyncMock, а не контекстный менеджер
-            mock_client.return_value = mock_instance
-
-            mock_http_response = AsyncMock(spec=httpx.Response)
-            mock_http_response.status_code = 200
-            mock_http_response.json.return_value = mock_response_data
-            mock_http_response.raise_for_status = MagicMock()
-
-            mock_instance.post.return_value = mock_http_response
-
-            client = AmoCRMClient()
+        requests: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            # create_lead_with_contact ожидает, что ответ — список с лидами
+            return httpx.Response(200, json=[{"id": 123}])
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = AmoCRMClient(http=http)
             client.base_url = "https://test.amocrm.ru"
 
             # Мокаем валидный токен, чтобы не лезть в файловое хранилище
-            valid_token = AmoCRMToken(
-                access_token="test_token",
-                refresh_token="refresh_token",
-                token_type="Bearer",
-                expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
-            )
-
             with patch.object(
                 AmoCRMClient,
                 "get_valid_token",
-                new=AsyncMock(return_value=valid_token),
+                new=AsyncMock(return_value=make_token()),
             ) as mock_get_token:
                 result = await client.create_lead_with_contact(
                     name="Заказ #1",
@@ -63,55 +62,41 @@ class TestAmoCRMClient:
                     tags=["MiniApp"],
                 )
 
-            # Теперь метод возвращает id лида, а не весь JSON
-            assert result == 123
+        # Метод возвращает id лида, а не весь JSON
+        assert result == 123
 
-            # Проверяем, что токен запрошен
-            mock_get_token.assert_awaited_once()
+        # Проверяем, что токен запрошен
+        mock_get_token.assert_awaited_once()
 
-            # Проверяем, что запрос к /leads/complex ушёл ровно один раз
-            mock_instance.post.assert_awaited_once()
-            post_args, post_kwargs = mock_instance.post.call_args
-            assert post_args[0] == "/leads/complex"
-            assert "json" in post_kwargs
+        # Запрос к /leads/complex ушёл ровно один раз
+        [request] = requests
+        assert request.method == "POST"
+        assert str(request.url) == "https://test.amocrm.ru/api/v4/leads/complex"
+        [lead] = json.loads(request.content)
+        assert lead["name"] == "Заказ #1"
+        assert lead["price"] == 15000
 
-            # Проверяем, как создали AsyncClient
-            _, client_kwargs = mock_client.call_args
-            assert client_kwargs["base_url"] == "https://test.amocrm.ru/api/v4"
-            headers = client_kwargs["headers"]
-            assert headers["Authorization"] == "Bearer test_token"
-            assert headers["Content-Type"] == "application/json"
+        # Авторизация — заголовками конкретного запроса, а не клиента
+        assert request.headers["Authorization"] == "Bearer test_token"
+        assert request.headers["Content-Type"] == "application/json"
+        assert "Authorization" not in http.headers
 
     async def test_create_lead_with_contact_http_error(self):
-        with patch("src.app.services.amocrm_client.httpx.AsyncClient") as mock_client:
-            mock_instance = AsyncMock()
-            # То же самое: клиент = AsyncMock
-            mock_client.return_value = mock_instance
-
-            mock_http_response = AsyncMock(spec=httpx.Response)
-            mock_http_response.status_code = 400
-            http_error = httpx.HTTPStatusError(
-                "Bad Request",
-                request=MagicMock(),
-                response=mock_http_response,
-            )
-            mock_http_response.raise_for_status = MagicMock(side_effect=http_error)
-            mock_instance.post.return_value = mock_http_response
+        calls = 0
 
-            client = AmoCRMClient()
-            client.base_url = "https://test.amocrm.ru"
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            return httpx.Response(400, json={"title": "Bad Request"})
 
-            valid_token = AmoCRMToken(
-                access_token="test_token",
-                refresh_token="refresh_token",
-                token_type="Bearer",
-                expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
-            )
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = AmoCRMClient(http=http)
+            client.base_url = "https://test.amocrm.ru"
 
             with patch.object(
                 AmoCRMClient,
                 "get_valid_token",
-                new=AsyncMock(return_value=valid_token),
+                new=AsyncMock(return_value=make_token()),
             ):
                 with pytest.raises(httpx.HTTPStatusError):
                     await client.create_lead_with_contact(
@@ -123,7 +108,112 @@ class TestAmoCRMClient:
                         tags=None,
                     )
 
-            # Убедимся, что вызов к API был
-            mock_instance.post.assert_awaited_once()
-            # И что клиент корректно закрывается (aclose тоже awaitable)
-            mock_instance.aclose.assert_awaited_once()
+            # Вызов к API был, а общий клиент после ошибки остаётся рабочим
+            assert calls == 1
+            assert not http.is_closed
+
+    async def test_token_refresh_reuses_the_same_http_client(self):
+        seen_tokens: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen_tokens.append(request.headers["Authorization"])
+            return httpx.Response(200, json=[{"id": len(seen_tokens)}])
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = AmoCRMClient(http=http)
+            tokens = AsyncMock(side_effect=[make_token("first"), make_token("second")])
+            with patch.object(AmoCRMClient, "get_valid_token", new=tokens):
+                await client.create_lead_with_contact("A", 1, None)
+                await client.create_lead_with_contact("B", 1, None)
+
+            assert client.http is http
+
+        assert seen_tokens == ["Bearer first", "Bearer second"]
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+async def test_shared_http_client_lifecycle() -> None:
+    holder = AmoCRMHttp(max_connections=5, max_keepalive_connections=2, http2=True)
+
+    await holder.start()
+    client = holder.client
+    # один и тот же пул на все обращения
+    assert holder.client is client
+
+    await holder.stop()
+    assert client.is_closed
+
+    # вне lifespan клиент создаётся лениво
+    lazy = holder.client
+    assert not lazy.is_closed and lazy is not client
+    await holder.stop()
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoCRMTokenCache:
+    async def test_storage_rereads_file_only_after_change(self, tmp_path):
+        storage = AmoCRMTokenStorage(tmp_path / "amocrm_token.json")
+        storage.save(make_token("first"))
+        # запись атомарная — временных файлов не остаётся
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["amocrm_token.json"]
+
+        reader = AmoCRMTokenStorage(storage.path)
+        with patch.object(Path, "read_text", autospec=True, wraps=Path.read_text) as read:
+            assert reader.load().access_token == "first"
+            assert reader.load().access_token == "first"
+            assert read.call_count == 1
+
+            # файл обновил другой воркер
+            storage.save(make_token("second-token"))
+            assert reader.load().access_token == "second-token"
+            assert read.call_count == 2
+
+    async def test_concurrent_refresh_is_single_flight(self, tmp_path):
+        client = AmoCRMClient(http=httpx.AsyncClient())
+        client.token_storage = AmoCRMTokenStorage(tmp_path / "amocrm_token.json")
+        client.token_storage.save(
+            AmoCRMToken(
+                access_token="old",
+                refresh_token="refresh_token",
+                expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+            )
+        )
+
+        async def fake_refresh(refresh_token: str) -> AmoCRMToken:
+            await asyncio.sleep(0.01)
+            token = make_token("new")
+            client.token_storage.save(token)
+            return token
+
+        refresh = AsyncMock(side_effect=fake_refresh)
+        with patch.object(client, "refresh_access_token", new=refresh):
+            tokens = await asyncio.gather(
+                *(client.get_valid_token() for _ in range(10))
+            )
+            assert {token.access_token for token in tokens} == {"new"}
+            refresh.assert_awaited_once_with("refresh_token")
+
+            # свежий токен берётся из памяти без обновления
+            assert (await client.get_valid_token()).access_token == "new"
+            refresh.assert_awaited_once()
+
+    async def test_failed_proactive_refresh_keeps_valid_token(self, tmp_path):
+        client = AmoCRMClient(http=httpx.AsyncClient())
+        client.token_storage = AmoCRMTokenStorage(tmp_path / "amocrm_token.json")
+        # действует ещё минуту — уже внутри окна заблаговременного обновления
+        client.token_storage.save(
+            AmoCRMToken(
+                access_token="current",
+                refresh_token="refresh_token",
+                expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+            )
+        )
+
+        refresh = AsyncMock(side_effect=httpx.ConnectError("AmoCRM is down"))
+        with patch.object(client, "refresh_access_token", new=refresh):
+            assert (await client.get_valid_token()).access_token == "current"
+        refresh.assert_awaited_once()
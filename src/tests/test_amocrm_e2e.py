@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from typing import AsyncGenerator
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock
 
 import pytest
 from sqlalchemy import select
@@ -92,39 +92,38 @@ async def test_send_order_to_amocrm_e2e(db_session: AsyncSession) -> None:
     )
     order_db = result.scalar_one()
 
-    with patch("src.app.services.amocrm_service.AmoCRMClient") as mock_client_cls:
-        mock_client = AsyncMock()
-        mock_client_cls.return_value = mock_client
+    # клиент передаётся в сервис явно (в приложении — общий get_amocrm_client)
+    mock_client = AsyncMock()
 
-        service = AmoCRMService(db_session)
-        await service.send_order_to_amocrm(order_db)
+    service = AmoCRMService(db_session, client=mock_client)
+    await service.send_order_to_amocrm(order_db)
 
-        mock_client.create_lead_with_contact.assert_awaited_once()
-        _, kwargs = mock_client.create_lead_with_contact.call_args
+    mock_client.create_lead_with_contact.assert_awaited_once()
+    _, kwargs = mock_client.create_lead_with_contact.call_args
 
-        expected_name = f"Заказ #{order_db.id} от {order_db.customer_name}"
-        assert kwargs["name"] == expected_name
+    expected_name = f"Заказ #{order_db.id} от {order_db.customer_name}"
+    assert kwargs["name"] == expected_name
 
-        assert kwargs["price"] == int(float(order_db.total_money))
-        assert kwargs["phone"] == order_db.customer_phone
+    assert kwargs["price"] == int(float(order_db.total_money))
+    assert kwargs["phone"] == order_db.customer_phone
 
-        lead_custom_fields = kwargs["lead_custom_fields"]
-        assert any(
-            f["field_name"] == "Local order ID"
-            and f["values"][0]["value"] == order_db.id
-            for f in lead_custom_fields
-        )
-        assert any(
-            f["field_name"] == "Order items"
-            and "Тестовый товар x 2" in f["values"][0]["value"]
-            for f in lead_custom_fields
-        )
-        assert any(
-            f["field_name"] == "Bonus spent"
-            and f["values"][0]["value"] == order_db.total_bonus
-            for f in lead_custom_fields
-        )
+    lead_custom_fields = kwargs["lead_custom_fields"]
+    assert any(
+        f["field_name"] == "Local order ID"
+        and f["values"][0]["value"] == order_db.id
+        for f in lead_custom_fields
+    )
+    assert any(
+        f["field_name"] == "Order items"
+        and "Тестовый товар x 2" in f["values"][0]["value"]
+        for f in lead_custom_fields
+    )
+    assert any(
+        f["field_name"] == "Bonus spent"
+        and f["values"][0]["value"] == order_db.total_bonus
+        for f in lead_custom_fields
+    )
 
-        tags = kwargs["tags"]
-        assert "MiniApp" in tags
-        assert "Лагерь" in tags
+    tags = kwargs["tags"]
+    assert "MiniApp" in tags
+    assert "Лагерь" in tags
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.models.amocrm_models import SyncCursor
+from src.app.models.shop_models import Order, OrderStatus, PaymentMethod
+from src.app.models.user_models import User, UserRole
+from src.app.services.amocrm_client import AmoCRMClient
+from src.app.services.amocrm_lead_sync import CURSOR_NAME, AmoCRMLeadSync
+from src.app.services.amocrm_rate_limit import AmoCRMRateLimiter
+from src.testing.fake_amocrm import FAKE_BASE_URL, FakeAmoCRM
+from src.tests.test_amocrm_client import make_token
+
+PAID, CANCELED, IN_PROGRESS = 142, 143, 1
+# сделки «изменены» за последний час, первый прогон смотрит на два часа назад
+T0 = int(time.time()) - 3600
+
+
+@pytest.fixture(autouse=True)
+def _valid_token():
+    with patch.object(
+        AmoCRMClient, "get_valid_token", new=AsyncMock(return_value=make_token())
+    ):
+        yield
+
+
+def make_sync(
+    session_factory: async_sessionmaker[AsyncSession],
+    fake: FakeAmoCRM,
+    limiter: AmoCRMRateLimiter | None = None,
+) -> AmoCRMLeadSync:
+    client = AmoCRMClient(
+        http=fake.http_client(),
+        rate_limiter=limiter or AmoCRMRateLimiter(rate_per_second=100, burst=10),
+    )
+    client.base_url = FAKE_BASE_URL
+    return AmoCRMLeadSync(
+        session_factory,
+        client=client,
+        page_size=2,
+        lookback_seconds=7200,
+        paid_status_ids=[PAID],
+        canceled_status_ids=[CANCELED],
+    )
+
+
+async def create_orders(
+    session_factory: async_sessionmaker[AsyncSession],
+    statuses: dict[int, OrderStatus],
+) -> None:
+    """Заказы со сделками lead_id -> статус заказа."""
+    async with session_factory() as db:
+        user = User(telegram_id=6000, role=UserRole.PARENT)
+        db.add(user)
+        await db.flush()
+        db.add_all(
+            Order(
+                user_id=user.id,
+                payment_method=PaymentMethod.CARD_ONLY,
+                amocrm_lead_id=lead_id,
+                status=status,
+            )
+            for lead_id, status in statuses.items()
+        )
+        await db.commit()
+
+
+async def order_statuses(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> dict[int, OrderStatus]:
+    async with session_factory() as db:
+        result = await db.execute(select(Order.amocrm_lead_id, Order.status))
+        return dict(result.all())
+
+
+async def stored_cursor(session_factory: async_sessionmaker[AsyncSession]) -> int:
+    async with session_factory() as db:
+        return await db.scalar(
+            select(SyncCursor.value).where(SyncCursor.name == CURSOR_NAME)
+        )
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoCRMLeadSync:
+    async def test_statuses_follow_leads_page_by_page(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        await create_orders(
+            session_factory,
+            {
+                1: OrderStatus.NEW,
+                2: OrderStatus.PENDING_PAYMENT,
+                3: OrderStatus.NEW,
+                4: OrderStatus.PAID,
+                5: OrderStatus.NEW,
+            },
+        )
+        fake = FakeAmoCRM()
+        fake.set_lead_status(1, PAID, updated_at=T0)
+        fake.set_lead_status(2, CANCELED, updated_at=T0 + 1)
+        fake.set_lead_status(3, IN_PROGRESS, updated_at=T0 + 2)
+        # оплаченный заказ отменой сделки не откатывается
+        fake.set_lead_status(4, CANCELED, updated_at=T0 + 3)
+        # сделка без локального заказа
+        fake.set_lead_status(99, PAID, updated_at=T0 + 4)
+        sync = make_sync(session_factory, fake)
+
+        assert await sync.run_once() == 2
+        assert await order_statuses(session_factory) == {
+            1: OrderStatus.PAID,
+            2: OrderStatus.CANCELED,
+            3: OrderStatus.NEW,
+            4: OrderStatus.PAID,
+            5: OrderStatus.NEW,
+        }
+        assert await stored_cursor(session_factory) == T0 + 4
+
+        # следующий прогон читает только изменённое после курсора
+        requests_before = fake.requests_total
+        fake.set_lead_status(5, PAID, updated_at=T0 + 100)
+        assert await sync.run_once() == 1
+        assert (await order_statuses(session_factory))[5] == OrderStatus.PAID
+        assert await stored_cursor(session_factory) == T0 + 100
+        assert fake.requests_total - requests_before == 1
+
+    async def test_page_of_equal_updated_at_is_paged_by_number(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        await create_orders(
+            session_factory, {lead_id: OrderStatus.NEW for lead_id in range(1, 6)}
+        )
+        fake = FakeAmoCRM()
+        for lead_id in range(1, 6):
+            fake.set_lead_status(lead_id, PAID, updated_at=T0)
+        sync = make_sync(session_factory, fake)
+
+        assert await sync.run_once() == 5
+        assert set((await order_statuses(session_factory)).values()) == {
+            OrderStatus.PAID
+        }
+        assert await stored_cursor(session_factory) == T0
+
+    async def test_polling_respects_rate_limit(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        # сервер пускает 2 запроса за 0.25 с, общий лимитер держит 6 rps
+        fake = FakeAmoCRM(rate_limit=2, window=0.25)
+        for lead_id in range(1, 6):
+            fake.set_lead_status(lead_id, IN_PROGRESS, updated_at=T0 + lead_id)
+        sync = make_sync(
+            session_factory, fake, AmoCRMRateLimiter(rate_per_second=6, burst=1)
+        )
+
+        assert await sync.run_once() == 0
+        assert fake.requests_total == 4
+        assert fake.rejected_429 == 0
+        assert await stored_cursor(session_factory) == T0 + 5
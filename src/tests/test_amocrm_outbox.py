@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import httpx
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.models.amocrm_models import AmoOutbox, AmoOutboxStatus
+from src.app.models.shop_models import Order, PaymentMethod
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.amocrm_outbox_repo import AmoOutboxRepository
+from src.app.services.amocrm_client import AmoCRMClient
+from src.app.services.amocrm_outbox import AmoCRMOutboxDispatcher
+from src.app.services.amocrm_service import AmoCRMService
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeAmoCRMService:
+    """Вместо AmoCRM: первые fail_times вызовов для заказа падают."""
+
+    calls: list[int] = []
+    batches: list[list[int]] = []
+    fail_times: int = 0
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def push_orders(self, order_ids: list[int]) -> dict[int, int | Exception]:
+        FakeAmoCRMService.batches.append(list(order_ids))
+        results: dict[int, int | Exception] = {}
+        for order_id in order_ids:
+            FakeAmoCRMService.calls.append(order_id)
+            if FakeAmoCRMService.calls.count(order_id) <= FakeAmoCRMService.fail_times:
+                results[order_id] = RuntimeError("AmoCRM is down")
+            else:
+                results[order_id] = 1000 + order_id
+        return results
+
+
+class FakeAmoCRMClient:
+    """/leads/complex в памяти; пачка с «плохим» заказом отклоняется целиком."""
+
+    build_complex_lead = staticmethod(AmoCRMClient.build_complex_lead)
+
+    def __init__(self, bad_names: set[str] = frozenset()) -> None:
+        self.bad_names = bad_names
+        self.batches: list[list[str]] = []
+        self.singles: list[str] = []
+
+    async def create_leads_complex(self, leads: list[dict]) -> list[dict[str, Any]]:
+        self.batches.append([lead["name"] for lead in leads])
+        if any(lead["name"] in self.bad_names for lead in leads):
+            request = httpx.Request("POST", "http://amocrm.test/leads/complex")
+            raise httpx.HTTPStatusError(
+                "Bad Request",
+                request=request,
+                response=httpx.Response(400, request=request),
+            )
+        # AmoCRM отвечает не обязательно в порядке запроса
+        return [
+            {"id": 5000 + int(lead["request_id"]), "request_id": [lead["request_id"]]}
+            for lead in reversed(leads)
+        ]
+
+    async def create_lead_with_contact(self, name: str, **kwargs: Any) -> int:
+        self.singles.append(name)
+        if name in self.bad_names:
+            raise RuntimeError("validation failed")
+        return 7000 + len(self.singles)
+
+
+@pytest.fixture
+async def order_ids(session_factory: async_sessionmaker[AsyncSession]) -> list[int]:
+    FakeAmoCRMService.calls = []
+    FakeAmoCRMService.batches = []
+    FakeAmoCRMService.fail_times = 0
+    async with session_factory() as db:
+        user = User(telegram_id=4000, role=UserRole.PARENT)
+        db.add(user)
+        await db.flush()
+        orders = [
+            Order(user_id=user.id, payment_method=PaymentMethod.CARD_ONLY)
+            for _ in range(3)
+        ]
+        db.add_all(orders)
+        await db.flush()
+        repo = AmoOutboxRepository(db)
+        for order in orders:
+            entry = repo.enqueue_order(order.id)
+            entry.next_attempt_at = NOW
+        await db.commit()
+        return [order.id for order in orders]
+
+
+def make_dispatcher(
+    session_factory: async_sessionmaker[AsyncSession], **kwargs
+) -> AmoCRMOutboxDispatcher:
+    options = dict(
+        batch_size=2,
+        max_attempts=3,
+        backoff_base_seconds=10,
+        backoff_max_seconds=25,
+        lease_seconds=60,
+        service_factory=FakeAmoCRMService,
+    )
+    options.update(kwargs)
+    return AmoCRMOutboxDispatcher(session_factory, **options)
+
+
+async def load_entries(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> list[AmoOutbox]:
+    async with session_factory() as db:
+        result = await db.scalars(select(AmoOutbox).order_by(AmoOutbox.id))
+        return list(result.all())
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoCRMOutboxDispatcher:
+    async def test_batches_are_sent_in_order(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        order_ids: list[int],
+    ) -> None:
+        dispatcher = make_dispatcher(session_factory)
+
+        assert await dispatcher.run_once(NOW) == 2
+        assert await dispatcher.run_once(NOW) == 1
+        assert await dispatcher.run_once(NOW) == 0
+
+        assert FakeAmoCRMService.batches == [order_ids[:2], order_ids[2:]]
+        entries = await load_entries(session_factory)
+        assert {entry.status for entry in entries} == {AmoOutboxStatus.SENT}
+        assert [entry.attempts for entry in entries] == [1, 1, 1]
+
+    async def test_failures_back_off_then_go_dead(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        order_ids: list[int],
+    ) -> None:
+        FakeAmoCRMService.fail_times = 10
+        dispatcher = make_dispatcher(session_factory, batch_size=10)
+
+        await dispatcher.run_once(NOW)
+        [entry, *_] = await load_entries(session_factory)
+        assert entry.status == AmoOutboxStatus.PENDING
+        assert entry.attempts == 1
+        assert "AmoCRM is down" in entry.last_error
+        assert entry.next_attempt_at.replace(tzinfo=timezone.utc) == NOW + timedelta(
+            seconds=10
+        )
+
+        # пауза ещё не прошла — строки не трогаем
+        assert await dispatcher.run_once(NOW + timedelta(seconds=5)) == 0
+
+        await dispatcher.run_once(NOW + timedelta(seconds=10))
+        [entry, *_] = await load_entries(session_factory)
+        assert entry.next_attempt_at.replace(
+            tzinfo=timezone.utc
+        ) == NOW + timedelta(seconds=30)
+
+        await dispatcher.run_once(NOW + timedelta(seconds=30))
+        entries = await load_entries(session_factory)
+        assert {entry.status for entry in entries} == {AmoOutboxStatus.DEAD}
+        assert [entry.attempts for entry in entries] == [3, 3, 3]
+
+        # ручной возврат в очередь
+        FakeAmoCRMService.fail_times = 0
+        later = NOW + timedelta(hours=1)
+        async with session_factory() as db:
+            assert await AmoOutboxRepository(db).requeue_dead(later, [entries[0].id]) == 1
+            await db.commit()
+        assert await dispatcher.run_once(later) == 1
+        statuses = [entry.status for entry in await load_entries(session_factory)]
+        assert statuses == [
+            AmoOutboxStatus.SENT,
+            AmoOutboxStatus.DEAD,
+            AmoOutboxStatus.DEAD,
+        ]
+
+    async def test_claimed_entry_is_leased(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        order_ids: list[int],
+    ) -> None:
+        async with session_factory() as db:
+            repo = AmoOutboxRepository(db)
+            claimed = await repo.claim_due(NOW, 10, timedelta(seconds=60))
+            await db.commit()
+            assert [row.order_id for row in claimed] == order_ids
+
+            # пока аренда не истекла, второй воркер ничего не получит
+            assert await repo.claim_due(NOW, 10, timedelta(seconds=60)) == []
+            # воркер «упал» — после аренды строки снова доступны
+            again = await repo.claim_due(
+                NOW + timedelta(seconds=60), 10, timedelta(seconds=60)
+            )
+            assert [row.attempts for row in again] == [2, 2, 2]
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestPushOrders:
+    async def test_leads_are_created_in_one_batch(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        order_ids: list[int],
+    ) -> None:
+        async with session_factory() as db:
+            service = AmoCRMService(db)
+            service.client = FakeAmoCRMClient()
+            results = await service.push_orders([*order_ids, 999])
+
+            assert service.client.batches == [
+                [f"Заказ #{order_id}" for order_id in order_ids]
+            ]
+            assert results == {
+                **{order_id: 5000 + order_id for order_id in order_ids},
+                999: None,
+            }
+
+            # повтор ничего не отправляет — сделки уже привязаны
+            assert await service.push_orders(order_ids) == {
+                order_id: 5000 + order_id for order_id in order_ids
+            }
+            assert len(service.client.batches) == 1
+
+        async with session_factory() as db:
+            lead_ids = (
+                await db.scalars(select(Order.amocrm_lead_id).order_by(Order.id))
+            ).all()
+        assert lead_ids == [5000 + order_id for order_id in order_ids]
+
+    async def test_rejected_batch_falls_back_to_single_leads(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        order_ids: list[int],
+    ) -> None:
+        bad = f"Заказ #{order_ids[1]}"
+        async with session_factory() as db:
+            service = AmoCRMService(db)
+            service.client = FakeAmoCRMClient(bad_names={bad})
+            results = await service.push_orders(order_ids)
+
+        assert len(service.client.batches) == 1
+        assert service.client.singles == [f"Заказ #{order_id}" for order_id in order_ids]
+        assert results[order_ids[0]] == 7001
+        assert isinstance(results[order_ids[1]], RuntimeError)
+        assert results[order_ids[2]] == 7003
+
+        async with session_factory() as db:
+            lead_ids = (
+                await db.scalars(select(Order.amocrm_lead_id).order_by(Order.id))
+            ).all()
+        assert lead_ids == [7001, None, 7003]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from src.app.core.metrics import metrics
+from src.app.services.amocrm_client import AmoCRMClient, AmoCRMTokenStorage
+from src.app.services.amocrm_rate_limit import (
+    AmoCRMRateLimiter,
+    backoff_delay,
+    retry_after_seconds,
+)
+from src.testing.fake_amocrm import FAKE_BASE_URL, FakeAmoCRM
+from src.tests.test_amocrm_client import make_token
+
+
+def make_client(fake: FakeAmoCRM, limiter: AmoCRMRateLimiter) -> AmoCRMClient:
+    client = AmoCRMClient(http=fake.http_client(), rate_limiter=limiter)
+    client.base_url = FAKE_BASE_URL
+    client.backoff_base = 0.01
+    client.backoff_max = 0.05
+    return client
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture(autouse=True)
+def _valid_token():
+    with patch.object(
+        AmoCRMClient, "get_valid_token", new=AsyncMock(return_value=make_token())
+    ):
+        yield
+
+
+def test_retry_after_and_backoff() -> None:
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "2"})) == 2
+    assert retry_after_seconds(httpx.Response(429)) is None
+    past = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": past})) == 0
+
+    for attempt in range(6):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=4) <= min(4, 0.5 * 2**attempt)
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoCRMRateLimiter:
+    async def test_requests_are_spaced_by_rate(self) -> None:
+        limiter = AmoCRMRateLimiter(rate_per_second=50, burst=1)
+
+        started = time.monotonic()
+        waits = await asyncio.gather(*(limiter.acquire() for _ in range(5)))
+        elapsed = time.monotonic() - started
+
+        # первый из запаса, остальные через 1/50 секунды друг за другом
+        assert waits[0] == 0
+        assert waits == sorted(waits)
+        assert elapsed >= 0.07
+        assert metrics.timings["amocrm_rate_limit_wait"].count == 5
+        assert metrics.gauges["amocrm_rate_limit_queue"] == 0
+        assert limiter.waiting == 0
+
+    async def test_cancelled_waiter_does_not_free_an_extra_slot(self) -> None:
+        limiter = AmoCRMRateLimiter(rate_per_second=10, burst=1)
+        await limiter.acquire()
+        started = time.monotonic()
+        # очередь на 0.1, 0.2 и 0.3 с; первый передумал
+        queued = [asyncio.create_task(limiter.acquire()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        queued[0].cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued[0]
+
+        await limiter.acquire()
+        # следующий слот — после последнего в очереди, а не вместе с ним
+        assert time.monotonic() - started >= 0.39
+        await asyncio.gather(*queued[1:])
+        assert limiter.waiting == 0
+
+    async def test_pause_holds_everyone(self) -> None:
+        limiter = AmoCRMRateLimiter(rate_per_second=100, burst=10)
+        limiter.pause(0.1)
+        started = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoCRMClientAgainstFake:
+    async def test_429_is_retried_honouring_retry_after(self) -> None:
+        fake = FakeAmoCRM(fail_first_with_429=2, retry_after="0.05")
+        client = make_client(fake, AmoCRMRateLimiter(rate_per_second=100, burst=5))
+
+        started = time.monotonic()
+        lead_id = await client.create_lead_with_contact("Заказ #1", 100, None)
+
+        assert lead_id == 1
+        assert fake.requests_total == 3
+        assert time.monotonic() - started >= 0.1
+        assert metrics.counters["amocrm_http_429"] == 2
+        assert metrics.counters["amocrm_http_retries"] == 2
+
+    async def test_limiter_keeps_under_server_limit(self) -> None:
+        # сервер пускает 2 запроса за 0.25 с (8 rps), клиент держит 6 rps
+        fake = FakeAmoCRM(rate_limit=2, window=0.25, latency=0.005)
+        client = make_client(fake, AmoCRMRateLimiter(rate_per_second=6, burst=1))
+
+        lead_ids = await asyncio.gather(
+            *(client.create_lead_with_contact(f"Заказ #{i}", 100, None) for i in range(5))
+        )
+
+        assert sorted(lead_ids) == [1, 2, 3, 4, 5]
+        assert fake.rejected_429 == 0
+
+    async def test_gives_up_after_max_retries(self) -> None:
+        fake = FakeAmoCRM(fail_first_with_429=100)
+        client = make_client(fake, AmoCRMRateLimiter(rate_per_second=100, burst=5))
+        client.max_retries = 2
+
+        with pytest.raises(httpx.HTTPStatusError) as exc:
+            await client.create_lead_with_contact("Заказ #1", 100, None)
+
+        assert exc.value.response.status_code == 429
+        assert fake.requests_total == 3
+        assert fake.leads == {}
+
+    async def test_oauth_and_injected_errors(self, tmp_path) -> None:
+        fake = FakeAmoCRM(error_rate=1.0, seed=1)
+        client = make_client(fake, AmoCRMRateLimiter(rate_per_second=100, burst=5))
+        client.client_id = client.client_secret = client.redirect_uri = "test"
+        client.token_storage = AmoCRMTokenStorage(tmp_path / "amocrm_token.json")
+        client.max_retries = 1
+
+        # ошибки только на API: OAuth на время проверки пускаем
+        fake.error_rate = 0.0
+        token = await client.exchange_code_for_tokens("code")
+        assert token.access_token in fake.access_tokens
+        assert client.token_storage.load().access_token == token.access_token
+
+        # выданы свои токены — чужой (test_token из фикстуры) отклоняется
+        with pytest.raises(httpx.HTTPStatusError) as exc:
+            await client.create_lead_with_contact("Заказ #1", 100, None)
+        assert exc.value.response.status_code == 401
+
+        # GET при 5xx повторяется, пока не кончатся попытки
+        fake.error_rate = 1.0
+        with pytest.raises(httpx.HTTPStatusError) as exc:
+            await client.list_leads(0)
+        assert exc.value.response.status_code == 503
+        assert fake.errors_injected == 2
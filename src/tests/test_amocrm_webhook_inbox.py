@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.models.amocrm_models import (
+    AmoTransaction,
+    AmoTransactionStatus,
+    AmoWebhookInbox,
+    AmoWebhookStatus,
+)
+from src.app.models.shop_models import Order, OrderStatus, PaymentMethod
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.amocrm_webhook_inbox_repo import AmoWebhookInboxRepository
+from src.app.schemas.amocrm_schemas import TransactionWebhook, WebhookResponse
+from src.app.services.amocrm_webhook_inbox import AmoCRMWebhookWorkers
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+class FailingAmoCRMService:
+    """Обработка, которая всегда заканчивается ошибкой."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def handle_transaction_webhook(
+        self, webhook: TransactionWebhook
+    ) -> WebhookResponse:
+        return WebhookResponse(status="error", message="Failed to process transaction")
+
+
+def make_webhook(transaction_id: int, customer_id: int = 888) -> dict:
+    return {
+        "account_id": 12345678,
+        "event": "add",
+        "transaction": {
+            "id": transaction_id,
+            "customer_id": customer_id,
+            "price": 15000,
+            "created_at": 1704067200,
+        },
+    }
+
+
+async def append(
+    session_factory: async_sessionmaker[AsyncSession],
+    *payloads: dict,
+    now: datetime = NOW,
+) -> list[bool]:
+    async with session_factory() as db:
+        repo = AmoWebhookInboxRepository(db)
+        inserted = [
+            await repo.append(
+                TransactionWebhook.model_validate(payload).event_id, payload, now
+            )
+            for payload in payloads
+        ]
+        await db.commit()
+        return inserted
+
+
+async def load_inbox(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> list[AmoWebhookInbox]:
+    async with session_factory() as db:
+        result = await db.scalars(select(AmoWebhookInbox).order_by(AmoWebhookInbox.id))
+        return list(result.all())
+
+
+@pytest.fixture
+async def order_id(session_factory: async_sessionmaker[AsyncSession]) -> int:
+    async with session_factory() as db:
+        user = User(telegram_id=5000, role=UserRole.PARENT)
+        db.add(user)
+        await db.flush()
+        order = Order(
+            user_id=user.id,
+            payment_method=PaymentMethod.CARD_ONLY,
+            amocrm_lead_id=888,
+        )
+        db.add(order)
+        await db.commit()
+        return order.id
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.amocrm
+class TestAmoCRMWebhookInbox:
+    async def test_duplicate_events_are_stored_once(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        assert await append(session_factory, make_webhook(1), make_webhook(1)) == [
+            True,
+            False,
+        ]
+        assert await append(session_factory, make_webhook(1), make_webhook(2)) == [
+            False,
+            True,
+        ]
+        entries = await load_inbox(session_factory)
+        assert [entry.amocrm_event_id for entry in entries] == ["add:1", "add:2"]
+
+    async def test_worker_processes_event_and_records_transaction(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        order_id: int,
+    ) -> None:
+        await append(session_factory, make_webhook(1), make_webhook(2, customer_id=1))
+        workers = AmoCRMWebhookWorkers(session_factory, batch_size=10)
+
+        assert await workers.run_once(NOW) == 2
+        assert await workers.run_once(NOW) == 0
+
+        entries = await load_inbox(session_factory)
+        assert {entry.status for entry in entries} == {AmoWebhookStatus.DONE}
+        async with session_factory() as db:
+            order = await db.get(Order, order_id)
+            assert order.status == OrderStatus.PAID
+            transactions = (
+                await db.scalars(select(AmoTransaction).order_by(AmoTransaction.id))
+            ).all()
+        assert [tx.amocrm_event_id for tx in transactions] == ["add:1", "add:2"]
+        assert {tx.status for tx in transactions} == {AmoTransactionStatus.PROCESSED}
+
+    async def test_failures_back_off_then_fail(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        await append(session_factory, make_webhook(1))
+        workers = AmoCRMWebhookWorkers(
+            session_factory,
+            max_attempts=2,
+            backoff_base_seconds=10,
+            lease_seconds=60,
+            service_factory=FailingAmoCRMService,
+        )
+
+        assert await workers.run_once(NOW) == 1
+        [entry] = await load_inbox(session_factory)
+        assert entry.status == AmoWebhookStatus.PENDING
+        assert entry.last_error == "Failed to process transaction"
+        assert entry.next_attempt_at.replace(tzinfo=timezone.utc) == NOW + timedelta(
+            seconds=10
+        )
+
+        assert await workers.run_once(NOW + timedelta(seconds=5)) == 0
+        assert await workers.run_once(NOW + timedelta(seconds=10)) == 1
+        [entry] = await load_inbox(session_factory)
+        assert entry.status == AmoWebhookStatus.FAILED
+        assert entry.attempts == 2
+
+    async def test_pool_drains_inbox_after_notify(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        workers = AmoCRMWebhookWorkers(
+            session_factory, workers=3, batch_size=2, interval_seconds=60
+        )
+        await workers.start()
+        try:
+            await append(
+                session_factory,
+                *(make_webhook(i) for i in range(1, 8)),
+                now=datetime.now(timezone.utc),
+            )
+            workers.notify()
+            for _ in range(100):
+                entries = await load_inbox(session_factory)
+                if all(entry.status == AmoWebhookStatus.DONE for entry in entries):
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await workers.stop()
+
+        entries = await load_inbox(session_factory)
+        assert len(entries) == 7
+        assert {entry.status for entry in entries} == {AmoWebhookStatus.DONE}
+        assert {entry.attempts for entry in entries} == {1}
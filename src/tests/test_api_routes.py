@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import json
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi import FastAPI, status
 from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from src.app.db.session import get_db
+from src.app.models.amocrm_models import AmoWebhookInbox, AmoWebhookStatus
 from src.app.schemas.amocrm_schemas import TransactionWebhook
 
 
@@ -25,30 +30,53 @@ def test_client() -> Generator[TestClient, None, None]:
 @pytest.mark.api
 @pytest.mark.amocrm
 class TestAmoCRMWebhookEndpoint:
-    def test_receive_transaction_webhook_success(
+    @pytest.mark.anyio
+    async def test_receive_transaction_webhook_success(
         self,
-        test_client: TestClient,
+        session_factory: async_sessionmaker[AsyncSession],
         sample_transaction_webhook: dict,
     ) -> None:
+        from src.app.api.routes import amocrm_router
+
+        app = FastAPI()
+        app.include_router(amocrm_router.router)
+
+        async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+            async with session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+
         with patch(
             "src.app.api.routes.amocrm_router.AmoCRMService.handle_transaction_webhook",
             new_callable=AsyncMock,
         ) as mock_handler:
-            mock_handler.return_value = None
-
-            response = test_client.post(
-                "/amocrm/webhooks/transaction",
-                json=sample_transaction_webhook,
-            )
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                response = await client.post(
+                    "/amocrm/webhooks/transaction",
+                    json=sample_transaction_webhook,
+                )
+                # AmoCRM повторяет доставку — второй раз строка не добавляется
+                repeated = await client.post(
+                    "/amocrm/webhooks/transaction",
+                    json=sample_transaction_webhook,
+                )
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert data["status"] == "ok"
         assert data["message"] == "Webhook accepted for processing"
-
-        mock_handler.assert_awaited_once()
-        args, kwargs = mock_handler.call_args
-        assert isinstance(args[0], TransactionWebhook)
+        assert repeated.json() == {"status": "ok", "message": "Webhook already received"}
+
+        # обработка — дело воркеров inbox, не запроса
+        mock_handler.assert_not_awaited()
+        async with session_factory() as db:
+            [entry] = (await db.scalars(select(AmoWebhookInbox))).all()
+        assert entry.amocrm_event_id == "add:999"
+        assert entry.status == AmoWebhookStatus.PENDING
+        assert TransactionWebhook.model_validate(entry.payload).transaction.id == 999
 
     def test_receive_invalid_webhook_payload(self, test_client: TestClient) -> None:
         invalid_payload = {"invalid": "data"}
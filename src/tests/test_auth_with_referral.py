@@ -1,37 +1,23 @@
 from __future__ import annotations
 
 from typing import Any
-from unittest.mock import AsyncMock, patch
+from unittest.mock import patch
 
 import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from starlette.requests import Request
 
 from src.app.api import deps
+from src.app.core.config import settings
 from src.app.models.user_models import User, UserRole
 
 
-class DummyDB:
-    """
-    Минимальный фейк AsyncSession, достаточный для get_current_user.
-    """
-
-    def __init__(self) -> None:
-        self.added: list[Any] = []
-        self.commits = 0
-        self.refreshed: list[Any] = []
-
-    def add(self, obj: Any) -> None:
-        self.added.append(obj)
-
-    async def commit(self) -> None:
-        self.commits += 1
-
-    async def refresh(self, obj: Any) -> None:
-        # эмулируем, что объект уже в БД и имеет id
-        if isinstance(obj, User) and getattr(obj, "id", None) is None:
-            obj.id = 100  # любой фиктивный id
-        self.refreshed.append(obj)
 
+@pytest.fixture(autouse=True)
+def _allow_telegram_id_header(monkeypatch: pytest.MonkeyPatch) -> None:
+    # здесь проверяется старая схема с X-Telegram-Id, по умолчанию выключенная
+    monkeypatch.setattr(settings, "auth_allow_telegram_id_header", True)
 
 def make_scope(
     telegram_id: int | None,
@@ -51,149 +37,124 @@ def make_scope(
     }
 
 
+async def _get_current_user(
+    session_factory: async_sessionmaker[AsyncSession],
+    telegram_id: int,
+    referral_code: str | None = None,
+) -> User:
+    request = Request(make_scope(telegram_id, referral_code))
+    async with session_factory() as db:
+        with patch.object(deps, "activity_tracker") as mock_tracker:
+            user = await deps.get_current_user(
+                request=request,
+                db=db,
+                telegram_id=telegram_id,
+            )
+        mock_tracker.touch_app.assert_called_once_with(user.id)
+    return user
+
+
+@pytest.fixture
+async def referrer(session_factory: async_sessionmaker[AsyncSession]) -> User:
+    async with session_factory() as db:
+        user = User(
+            telegram_id=999999,
+            full_name="Referrer User",
+            role=UserRole.PARENT,
+            referral_code="ref_abc123",
+        )
+        db.add(user)
+        await db.commit()
+    return user
+
+
 @pytest.mark.anyio
 @pytest.mark.unit
 @pytest.mark.referral
 class TestGetCurrentUserWithReferral:
-    async def test_new_user_without_referral_becomes_parent(self) -> None:
+    async def test_new_user_without_referral_becomes_parent(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
         """
         Если пользователя нет и X-Referral-Code не передан:
         - создаётся новый пользователь
         - role = PARENT
         - referrer_id = None
         """
-        db = DummyDB()
-        scope = make_scope(telegram_id=123456)
-        request = Request(scope)
-
-        with patch.object(
-            deps, "UserRepository"
-        ) as MockUserRepo, patch.object(
-            deps, "ReferralService"
-        ) as MockRefService:
-            user_repo_instance = MockUserRepo.return_value
-            # пользователя ещё нет
-            user_repo_instance.get_by_telegram_id = AsyncMock(return_value=None)
-            user_repo_instance.touch_app_activity = AsyncMock()
-
-            ref_service_instance = MockRefService.return_value
-            ref_service_instance.get_user_by_referral = AsyncMock()
-
-            user = await deps.get_current_user(
-                request=request,
-                db=db,  # type: ignore[arg-type]
-                telegram_id=123456,
-            )
+        user = await _get_current_user(session_factory, 123456)
 
         assert isinstance(user, User)
         assert user.telegram_id == 123456
         assert user.role == UserRole.PARENT
-        # поле referrer_id может быть None, если ты его добавил в модель
-        assert getattr(user, "referrer_id", None) is None
+        assert user.referrer_id is None
 
-        # ReferralService вообще не должен вызываться, т.к. X-Referral-Code нет
-        ref_service_instance.get_user_by_referral.assert_not_awaited()
-
-        # Пользователь был создан и activity протрогали
-        user_repo_instance.get_by_telegram_id.assert_awaited_once()
-        user_repo_instance.touch_app_activity.assert_awaited_once_with(user)
-        # commit вызывается: один раз после создания юзера, один раз после touch_app_activity
-        assert db.commits == 2
-
-    async def test_new_user_with_valid_referral_becomes_child(self) -> None:
+    async def test_new_user_with_valid_referral_becomes_child(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        referrer: User,
+    ) -> None:
         """
         Если пользователя нет и X-Referral-Code указывает на реального пригласившего:
         - создаётся новый пользователь
         - role = CHILD
         - referrer_id = referrer.id
         """
-        db = DummyDB()
-        scope = make_scope(telegram_id=222222, referral_code="ref_abc123")
-        request = Request(scope)
+        user = await _get_current_user(session_factory, 222222, "ref_abc123")
 
-        referrer = User(
-            id=10,
-            telegram_id=999999,
-            full_name="Referrer User",
-            phone="+79990000000",
-            role=UserRole.PARENT,
-        )
-
-        with patch.object(
-            deps, "UserRepository"
-        ) as MockUserRepo, patch.object(
-            deps, "ReferralService"
-        ) as MockRefService:
-            user_repo_instance = MockUserRepo.return_value
-            user_repo_instance.get_by_telegram_id = AsyncMock(return_value=None)
-            user_repo_instance.touch_app_activity = AsyncMock()
-
-            ref_service_instance = MockRefService.return_value
-            ref_service_instance.get_user_by_referral = AsyncMock(
-                return_value=referrer
-            )
-
-            user = await deps.get_current_user(
-                request=request,
-                db=db,  # type: ignore[arg-type]
-                telegram_id=222222,
-            )
-
-        assert isinstance(user, User)
         assert user.telegram_id == 222222
         assert user.role == UserRole.CHILD
-        assert getattr(user, "referrer_id", None) == referrer.id
+        assert user.referrer_id == referrer.id
 
-        ref_service_instance.get_user_by_referral.assert_awaited_once_with(
-            "ref_abc123"
-        )
-        user_repo_instance.touch_app_activity.assert_awaited_once_with(user)
-        assert db.commits == 2
+    async def test_unknown_referral_code_keeps_parent_role(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        referrer: User,
+    ) -> None:
+        user = await _get_current_user(session_factory, 222223, "ref_unknown")
+
+        assert user.role == UserRole.PARENT
+        assert user.referrer_id is None
 
-    async def test_existing_user_ignores_referral_code(self) -> None:
+    async def test_existing_user_ignores_referral_code(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        referrer: User,
+    ) -> None:
         """
         Если пользователь уже существует:
         - X-Referral-Code игнорируется
         - роль и referrer_id не меняются
         """
-        db = DummyDB()
-        scope = make_scope(telegram_id=333333, referral_code="ref_should_be_ignored")
-        request = Request(scope)
-
-        existing_user = User(
-            id=20,
-            telegram_id=333333,
-            full_name="Existing User",
-            phone="+79990000003",
-            role=UserRole.PARENT,
-        )
-
-        with patch.object(
-            deps, "UserRepository"
-        ) as MockUserRepo, patch.object(
-            deps, "ReferralService"
-        ) as MockRefService:
-            user_repo_instance = MockUserRepo.return_value
-            user_repo_instance.get_by_telegram_id = AsyncMock(
-                return_value=existing_user
-            )
-            user_repo_instance.touch_app_activity = AsyncMock()
-
-            ref_service_instance = MockRefService.return_value
-            ref_service_instance.get_user_by_referral = AsyncMock()
-
-            user = await deps.get_current_user(
-                request=request,
-                db=db,  # type: ignore[arg-type]
+        async with session_factory() as db:
+            existing_user = User(
                 telegram_id=333333,
+                full_name="Existing User",
+                role=UserRole.PARENT,
             )
+            db.add(existing_user)
+            await db.commit()
 
-        # Вернулся тот же юзер, без изменений роли
-        assert user is existing_user
+        user = await _get_current_user(session_factory, 333333, "ref_abc123")
+
+        assert user.id == existing_user.id
         assert user.role == UserRole.PARENT
-        assert getattr(user, "referrer_id", None) is None
+        assert user.referrer_id is None
+        assert user.full_name == "Existing User"
+
+    async def test_repeated_creation_returns_same_row(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        """
+        Повторные «первые» запросы (mini-app, бот, игра) не падают на
+        уникальности telegram_id и возвращают одну и ту же строку.
+        """
+        first = await _get_current_user(session_factory, 444444)
+        second = await _get_current_user(session_factory, 444444)
+
+        async with session_factory() as db:
+            count = await db.scalar(
+                select(func.count()).select_from(User).where(User.telegram_id == 444444)
+            )
 
-        # ReferralService не должен вызываться
-        ref_service_instance.get_user_by_referral.assert_not_awaited()
-        user_repo_instance.touch_app_activity.assert_awaited_once_with(existing_user)
-        assert db.commits == 1  # только commit после touch_app_activity
+        assert first.id == second.id
+        assert count == 1
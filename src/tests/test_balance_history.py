@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import AsyncGenerator
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.api import deps
+from src.app.api.routes import balance_router
+from src.app.db.session import get_db
+from src.app.models.balance_models import BalanceTransaction, TransactionType
+from src.app.models.user_models import User, UserRole
+from src.app.services.identity_cache import UserIdentity
+
+
+@pytest.fixture
+async def history_client(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> AsyncGenerator[AsyncClient, None]:
+    async with session_factory() as db:
+        user = User(telegram_id=3000, role=UserRole.CHILD)
+        other = User(telegram_id=3001, role=UserRole.CHILD)
+        db.add_all([user, other])
+        await db.flush()
+
+        base = datetime(2026, 10, 1, 12)
+        for i in range(25):
+            db.add(
+                BalanceTransaction(
+                    user_id=user.id,
+                    delta=i,
+                    resulting_balance=i,
+                    type=(
+                        TransactionType.REFERRAL if i % 5 == 0 else TransactionType.OTHER
+                    ),
+                    # по две проводки на одну секунду — порядок решает id
+                    created_at=base + timedelta(seconds=i // 2),
+                )
+            )
+        db.add(
+            BalanceTransaction(
+                user_id=other.id, delta=1, resulting_balance=1, created_at=base
+            )
+        )
+        await db.commit()
+        identity = UserIdentity.from_user(user)
+
+    async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(balance_router.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[deps.get_current_identity] = lambda: identity
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+@pytest.mark.anyio
+@pytest.mark.api
+class TestBalanceHistory:
+    async def test_pages_follow_cursor_without_gaps(
+        self, history_client: AsyncClient
+    ) -> None:
+        deltas: list[int] = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 10}
+            if cursor:
+                params["cursor"] = cursor
+            response = await history_client.get(
+                "/api/balance/transactions", params=params
+            )
+            assert response.status_code == 200
+            body = response.json()
+            deltas.extend(item["delta"] for item in body["items"])
+            pages += 1
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+
+        assert pages == 3
+        assert deltas == list(range(24, -1, -1))
+
+    async def test_type_filter(self, history_client: AsyncClient) -> None:
+        response = await history_client.get(
+            "/api/balance/transactions", params={"type": "referral", "limit": 3}
+        )
+        body = response.json()
+        assert [item["delta"] for item in body["items"]] == [20, 15, 10]
+        assert {item["type"] for item in body["items"]} == {"referral"}
+
+        response = await history_client.get(
+            "/api/balance/transactions",
+            params={"type": "referral", "limit": 3, "cursor": body["next_cursor"]},
+        )
+        body = response.json()
+        assert [item["delta"] for item in body["items"]] == [5, 0]
+        assert body["next_cursor"] is None
+
+    async def test_bad_cursor(self, history_client: AsyncClient) -> None:
+        response = await history_client.get(
+            "/api/balance/transactions", params={"cursor": "not-a-cursor"}
+        )
+        assert response.status_code == 400
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import AsyncGenerator
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.app.db.base import Base
+from src.app.models.balance_models import Balance, BalanceTransaction, TransactionType
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.balance_repo import BalanceRepository, NotEnoughBalanceError
+
+
+@pytest.fixture
+async def parent(session_factory: async_sessionmaker[AsyncSession]) -> User:
+    async with session_factory() as db:
+        user = User(telegram_id=777, role=UserRole.PARENT)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    return user
+
+
+# отдельная пустая БД PostgreSQL для проверок конкуренции; не задана — такие
+# тесты идут только на SQLite
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+async def concurrent_session_factory(
+    request: pytest.FixtureRequest,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> AsyncGenerator[async_sessionmaker[AsyncSession], None]:
+    if request.param == "sqlite":
+        yield session_factory
+        return
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL не задан")
+
+    engine = create_async_engine(TEST_POSTGRES_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestChangeBalance:
+    async def test_accrual_creates_balance_row(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        parent: User,
+    ) -> None:
+        async with session_factory() as db:
+            repo = BalanceRepository(db)
+            assert await repo.change_balance(parent, 30, TransactionType.REFERRAL) == 30
+            assert await repo.change_balance(parent, 5, TransactionType.OTHER) == 35
+            await db.commit()
+
+        async with session_factory() as db:
+            assert await BalanceRepository(db).get_balance(parent) == 35
+            txs = (
+                await db.scalars(
+                    select(BalanceTransaction).order_by(BalanceTransaction.id)
+                )
+            ).all()
+        assert [(tx.delta, tx.resulting_balance) for tx in txs] == [(30, 30), (5, 35)]
+
+    async def test_spend_without_funds_changes_nothing(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        parent: User,
+    ) -> None:
+        async with session_factory() as db:
+            repo = BalanceRepository(db)
+            with pytest.raises(NotEnoughBalanceError):
+                await repo.change_balance(parent, -1, TransactionType.SHOP_PURCHASE)
+
+            await repo.change_balance(parent, 10, TransactionType.REFERRAL)
+            with pytest.raises(NotEnoughBalanceError):
+                await repo.change_balance(parent, -11, TransactionType.SHOP_PURCHASE)
+            assert await repo.get_balance(parent) == 10
+
+            # с allow_negative проверка отключена
+            assert (
+                await repo.change_balance(
+                    parent, -11, TransactionType.ADMIN_ADJUST, allow_negative=True
+                )
+                == -1
+            )
+            await db.commit()
+
+    async def test_concurrent_spends_never_overdraw(
+        self,
+        concurrent_session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        """
+        На SQLite писатели и так идут по одному, так что там проверяется лишь
+        ветка для SQLite. Гонку в PostgreSQL-ветке (UPDATE ... WHERE amount + d
+        >= 0 RETURNING вместе с проводкой одним запросом) ловит только прогон
+        с TEST_POSTGRES_URL.
+        """
+        session_factory = concurrent_session_factory
+        async with session_factory() as db:
+            parent = User(telegram_id=777, role=UserRole.PARENT)
+            db.add(parent)
+            await db.flush()
+            await BalanceRepository(db).change_balance(
+                parent, 100, TransactionType.REFERRAL
+            )
+            await db.commit()
+
+        async def spend() -> bool:
+            async with session_factory() as db:
+                try:
+                    await BalanceRepository(db).change_balance(
+                        parent, -30, TransactionType.SHOP_PURCHASE
+                    )
+                except NotEnoughBalanceError:
+                    await db.rollback()
+                    return False
+                await db.commit()
+                return True
+
+        results = await asyncio.gather(*(spend() for _ in range(10)))
+
+        assert results.count(True) == 3
+        async with session_factory() as db:
+            amount = await db.scalar(
+                select(Balance.amount).where(Balance.user_id == parent.id)
+            )
+            ledger_sum = await db.scalar(select(func.sum(BalanceTransaction.delta)))
+            spends = await db.scalar(
+                select(func.count()).where(
+                    BalanceTransaction.type == TransactionType.SHOP_PURCHASE
+                )
+            )
+        assert amount == 10
+        assert ledger_sum == amount
+        assert spends == 3
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.models.balance_models import BalanceTransaction, TransactionType
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.balance_repo import BalanceRepository
+from src.app.services.bonus_award_service import (
+    DESCRIPTION_MAX_LENGTH,
+    BonusAward,
+    BonusAwardService,
+    parse_awards_csv,
+)
+
+
+@pytest.fixture
+async def users(session_factory: async_sessionmaker[AsyncSession]) -> list[User]:
+    async with session_factory() as db:
+        users = [User(telegram_id=2000 + i, role=UserRole.PARENT) for i in range(4)]
+        db.add_all(users)
+        await db.commit()
+        for user in users:
+            await db.refresh(user)
+        await BalanceRepository(db).change_balance(users[0], 100, TransactionType.OTHER)
+        await db.commit()
+    return users
+
+
+def test_parse_awards_csv() -> None:
+    awards = parse_awards_csv(
+        "\ufefftelegram_id,delta,description\n2000,50,Конкурс\n2001,-5,\n"
+    )
+    assert awards == [
+        BonusAward(telegram_id=2000, delta=50, description="Конкурс"),
+        BonusAward(telegram_id=2001, delta=-5, description=None),
+    ]
+
+    with pytest.raises(ValueError, match="row 2"):
+        parse_awards_csv("telegram_id,delta\nabc,1\n")
+    with pytest.raises(ValueError, match="header"):
+        parse_awards_csv("id,amount\n1,1\n")
+    # длина description проверяется при разборе, а не на INSERT
+    with pytest.raises(ValueError, match="row 3.*longer"):
+        parse_awards_csv(
+            "telegram_id,delta,description\n"
+            f"2000,1,ok\n2001,1,{'x' * (DESCRIPTION_MAX_LENGTH + 1)}\n"
+        )
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestBonusAwardService:
+    async def test_awards_are_applied_with_ledger(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        users: list[User],
+    ) -> None:
+        progress: list[tuple[int, int]] = []
+        result = await BonusAwardService(session_factory, chunk_size=2).award(
+            [
+                BonusAward(2000, 10, "Конкурс"),
+                BonusAward(2001, 20),
+                BonusAward(2000, 5),
+                BonusAward(9999, 1),
+            ],
+            progress=lambda done, total: progress.append((done, total)),
+        )
+
+        assert (result.total, result.applied) == (4, 3)
+        assert result.unknown_telegram_ids == [9999]
+        assert progress == [(2, 4), (4, 4)]
+
+        async with session_factory() as db:
+            repo = BalanceRepository(db)
+            assert await repo.get_balance(users[0]) == 115
+            assert await repo.get_balance(users[1]) == 20
+            txs = (
+                await db.scalars(
+                    select(BalanceTransaction)
+                    .where(BalanceTransaction.type == TransactionType.ADMIN_ADJUST)
+                    .order_by(BalanceTransaction.id)
+                )
+            ).all()
+        assert [(tx.user_id, tx.delta, tx.resulting_balance) for tx in txs] == [
+            (users[0].id, 10, 110),
+            (users[1].id, 20, 20),
+            (users[0].id, 5, 115),
+        ]
+
+    async def test_chunk_is_rolled_back_as_a_whole(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        users: list[User],
+    ) -> None:
+        result = await BonusAwardService(session_factory, chunk_size=2).award(
+            [
+                BonusAward(2002, 7),
+                BonusAward(2003, -1),  # ушёл бы в минус — вся пачка откатывается
+                BonusAward(2001, 3),
+            ]
+        )
+
+        assert result.applied == 1
+        assert [award.telegram_id for award in result.failed] == [2002, 2003]
+        assert (result.applied_rows, result.failed_rows) == ([(3, 3)], [(1, 2)])
+        assert len(result.errors) == 1
+
+        async with session_factory() as db:
+            repo = BalanceRepository(db)
+            assert await repo.get_balance(users[2]) == 0
+            assert await repo.get_balance(users[1]) == 3
+
+    async def test_db_error_in_chunk_does_not_abort_run(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        users: list[User],
+    ) -> None:
+        service = BonusAwardService(session_factory, chunk_size=1)
+        apply_chunk = service._apply_chunk
+        calls = 0
+
+        async def flaky_apply_chunk(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                raise OperationalError("INSERT", {}, Exception("connection lost"))
+            return await apply_chunk(*args, **kwargs)
+
+        with patch.object(service, "_apply_chunk", new=flaky_apply_chunk):
+            result = await service.award(
+                [BonusAward(2001, 1), BonusAward(2002, 2), BonusAward(2003, 3)]
+            )
+
+        assert result.applied == 2
+        assert result.applied_rows == [(1, 1), (3, 3)]
+        assert result.failed_rows == [(2, 2)]
+        assert [award.telegram_id for award in result.failed] == [2002]
+        assert "connection lost" in result.errors[0]
+
+    async def test_rejects_non_bulk_types(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        with pytest.raises(ValueError):
+            await BonusAwardService(session_factory).award(
+                [BonusAward(2000, 1)], tx_type=TransactionType.GAME_CLICK
+            )
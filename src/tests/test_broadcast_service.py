@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.metrics import metrics
+from src.app.models.broadcast_models import Broadcast, BroadcastStatus
+from src.app.models.user_models import User, UserRole
+from src.app.services.broadcast_service import BroadcastService
+
+NOW = datetime(2026, 10, 17, 12, 0)
+
+
+class RecordingBot:
+    """Бот, который запоминает получателей и открытые в момент отправки сессии."""
+
+    def __init__(self, failing_chat_id: int | None = None) -> None:
+        self.sent: list[tuple[int, str]] = []
+        self.open_sessions: set[float] = set()
+        self.failing_chat_id = failing_chat_id
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        self.open_sessions.add(metrics.gauges.get("db_sessions_open", 0))
+        if chat_id == self.failing_chat_id:
+            raise RuntimeError("bot was blocked by the user")
+        self.sent.append((chat_id, text))
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+async def test_due_broadcasts_stream_recipients_in_batches(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:
+    subscribed = [1005, 1001, 1007, 1003, 1002, 1006, 1004]
+    async with session_factory() as db:
+        db.add_all(
+            User(telegram_id=telegram_id, role=UserRole.PARENT, is_subscribed=True)
+            for telegram_id in subscribed
+        )
+        db.add_all(
+            User(telegram_id=telegram_id, role=UserRole.PARENT, is_subscribed=False)
+            for telegram_id in (1000, 1008)
+        )
+        db.add_all(
+            [
+                Broadcast(text="Первая", scheduled_at=NOW - timedelta(hours=2)),
+                Broadcast(text="Вторая", scheduled_at=NOW - timedelta(hours=1)),
+                Broadcast(text="Завтра", scheduled_at=NOW + timedelta(days=1)),
+            ]
+        )
+        await db.commit()
+
+    bot = RecordingBot(failing_chat_id=1003)
+    async with session_factory() as db:
+        service = BroadcastService(
+            db, bot, session_factory=session_factory, batch_size=3
+        )
+        await service.send_due_broadcasts(now=NOW)
+
+    # ошибка одному получателю не прерывает рассылку
+    expected = [chat_id for chat_id in sorted(subscribed) if chat_id != 1003]
+    assert bot.sent == [(chat_id, "Первая") for chat_id in expected] + [
+        (chat_id, "Вторая") for chat_id in expected
+    ]
+    # соединение не держится, пока идёт отправка
+    assert bot.open_sessions == {0}
+
+    async with session_factory() as db:
+        broadcasts = (await db.scalars(select(Broadcast).order_by(Broadcast.id))).all()
+    assert [broadcast.status for broadcast in broadcasts] == [
+        BroadcastStatus.SENT,
+        BroadcastStatus.SENT,
+        BroadcastStatus.SCHEDULED,
+    ]
+    assert broadcasts[0].sent_at is not None
+    assert broadcasts[2].sent_at is None
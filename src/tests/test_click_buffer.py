@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.constants import MAX_DAILY_ENERGY
+from src.app.core.metrics import metrics
+from src.app.models.balance_models import Balance, BalanceTransaction
+from src.app.models.game_models import GameStats
+from src.app.models.user_models import User, UserRole
+from src.app.services.click_buffer import ClickBuffer, TapRateGuard
+from src.app.services.identity_cache import UserIdentity
+
+
+@pytest.fixture
+async def child(session_factory: async_sessionmaker[AsyncSession]) -> UserIdentity:
+    async with session_factory() as db:
+        user = User(telegram_id=555, role=UserRole.CHILD)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    return UserIdentity.from_user(user)
+
+
+async def _db_state(
+    session_factory: async_sessionmaker[AsyncSession], user_id: int
+) -> tuple[int, int, int]:
+    async with session_factory() as db:
+        amount = await db.scalar(select(Balance.amount).where(Balance.user_id == user_id))
+        clicks = await db.scalar(
+            select(GameStats.clicks_today).where(GameStats.user_id == user_id)
+        )
+        tx_count = await db.scalar(
+            select(func.count()).select_from(BalanceTransaction).where(
+                BalanceTransaction.user_id == user_id
+            )
+        )
+    return amount or 0, clicks or 0, tx_count or 0
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.game
+class TestClickBuffer:
+    async def test_clicks_are_answered_from_memory_and_flushed_in_batch(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: UserIdentity,
+    ) -> None:
+        """
+        Клики сразу возвращают прогноз, а в БД уходят одной проводкой на пачку.
+        """
+        buffer = ClickBuffer(session_factory, flush_interval_ms=60_000, flush_max_clicks=100)
+
+        initial = await buffer.attach(child)
+        assert initial.new_bonus_balance == 0
+        assert initial.current_energy == MAX_DAILY_ENERGY
+
+        for _ in range(5):
+            result = await buffer.click(child.id)
+
+        assert result.new_bonus_balance == 5
+        assert result.current_energy == MAX_DAILY_ENERGY - 5
+
+        # до сброса в БД ничего не записано
+        assert await _db_state(session_factory, child.id) == (0, 0, 0)
+
+        await buffer.flush()
+
+        assert await _db_state(session_factory, child.id) == (5, 5, 1)
+        # соединение бралось только на время сброса, и это видно в метриках
+        assert metrics.timings["db_session_hold.click_buffer.flush"].count >= 1
+        assert metrics.gauges["db_sessions_open"] == 0
+
+    async def test_detach_flushes_pending_clicks(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: UserIdentity,
+    ) -> None:
+        buffer = ClickBuffer(session_factory, flush_interval_ms=60_000, flush_max_clicks=100)
+
+        await buffer.attach(child)
+        await buffer.click(child.id)
+        await buffer.click(child.id)
+        await buffer.detach(child.id)
+
+        assert await _db_state(session_factory, child.id) == (2, 2, 1)
+
+    async def test_stop_flushes_pending_clicks(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: UserIdentity,
+    ) -> None:
+        buffer = ClickBuffer(session_factory, flush_interval_ms=60_000, flush_max_clicks=100)
+        await buffer.start()
+
+        await buffer.attach(child)
+        await buffer.click(child.id)
+        await buffer.stop()
+
+        assert await _db_state(session_factory, child.id) == (1, 1, 1)
+
+    async def test_energy_limit_enforced_in_memory(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: UserIdentity,
+    ) -> None:
+        buffer = ClickBuffer(
+            session_factory,
+            flush_interval_ms=60_000,
+            flush_max_clicks=MAX_DAILY_ENERGY * 2,
+        )
+
+        await buffer.attach(child)
+        for _ in range(MAX_DAILY_ENERGY + 10):
+            result = await buffer.click(child.id)
+
+        assert result.current_energy == 0
+        assert result.new_bonus_balance == MAX_DAILY_ENERGY
+
+        await buffer.flush()
+        assert await _db_state(session_factory, child.id) == (
+            MAX_DAILY_ENERGY,
+            MAX_DAILY_ENERGY,
+            1,
+        )
+
+    async def test_click_many_is_clamped_by_energy(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: UserIdentity,
+    ) -> None:
+        buffer = ClickBuffer(
+            session_factory,
+            flush_interval_ms=60_000,
+            flush_max_clicks=MAX_DAILY_ENERGY * 2,
+        )
+
+        await buffer.attach(child)
+        accepted, result = await buffer.click_many(child.id, MAX_DAILY_ENERGY - 3)
+        assert accepted == MAX_DAILY_ENERGY - 3
+        assert result.current_energy == 3
+
+        accepted, result = await buffer.click_many(child.id, 10)
+        assert accepted == 3
+        assert result.current_energy == 0
+        assert result.new_bonus_balance == MAX_DAILY_ENERGY
+
+
+@pytest.mark.unit
+@pytest.mark.game
+def test_tap_rate_guard_limits_burst() -> None:
+    guard = TapRateGuard(rate_per_second=20, window_ms=1000)
+
+    assert guard.allow(15) == 15
+    # в запасе осталось ~5 кликов, остальное отбрасывается
+    assert guard.allow(15) == 5
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.core.config import settings
+from src.app.core.constants import MAX_DAILY_ENERGY, MOSCOW_TZ
+from src.app.models.balance_models import BalanceTransaction, TransactionType
+from src.app.models.game_models import GameStats
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.balance_repo import BalanceRepository
+from src.app.repositories.game_repo import GameRepository
+
+
+@pytest.fixture
+async def child(session_factory: async_sessionmaker[AsyncSession]) -> User:
+    async with session_factory() as db:
+        user = User(telegram_id=556, role=UserRole.CHILD)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    return user
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+@pytest.mark.game
+class TestSettleClicks:
+    async def test_first_click_creates_stats_balance_and_ledger(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: User,
+    ) -> None:
+        async with session_factory() as db:
+            settlement = await GameRepository(db).settle_clicks(child.id, 3)
+            await db.commit()
+
+        assert settlement.accepted == 3
+        assert settlement.balance == 3
+        assert settlement.energy == MAX_DAILY_ENERGY - 3
+
+        async with session_factory() as db:
+            stats = await db.scalar(
+                select(GameStats).where(GameStats.user_id == child.id)
+            )
+            txs = (
+                await db.scalars(
+                    select(BalanceTransaction).where(
+                        BalanceTransaction.user_id == child.id
+                    )
+                )
+            ).all()
+
+        assert stats.total_clicks == 3
+        assert stats.clicks_today == 3
+        assert [(tx.delta, tx.resulting_balance, tx.type) for tx in txs] == [
+            (3, 3, TransactionType.GAME_CLICK)
+        ]
+
+    async def test_energy_cap_and_daily_reset(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: User,
+    ) -> None:
+        yesterday = datetime.now(MOSCOW_TZ) - timedelta(days=1)
+
+        async with session_factory() as db:
+            repo = GameRepository(db)
+            capped = await repo.settle_clicks(
+                child.id, MAX_DAILY_ENERGY + 5, now=yesterday
+            )
+            exhausted = await repo.settle_clicks(child.id, 1, now=yesterday)
+            # новый московский день — энергия восстановлена
+            today = await repo.settle_clicks(child.id, 2)
+            await db.commit()
+
+        assert capped.accepted == MAX_DAILY_ENERGY
+        assert capped.energy == 0
+        assert exhausted.accepted == 0
+        assert exhausted.balance == MAX_DAILY_ENERGY
+        assert today.accepted == 2
+        assert today.balance == MAX_DAILY_ENERGY + 2
+        assert today.energy == MAX_DAILY_ENERGY - 2
+
+        async with session_factory() as db:
+            tx_count = len(
+                (
+                    await db.scalars(
+                        select(BalanceTransaction.id).where(
+                            BalanceTransaction.user_id == child.id
+                        )
+                    )
+                ).all()
+            )
+        # клик без энергии проводку не создаёт; по одной строке на каждый день
+        assert tx_count == 2
+
+    async def test_game_rewards_rolled_up_per_day(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: User,
+    ) -> None:
+        async with session_factory() as db:
+            repo = GameRepository(db)
+            await repo.settle_clicks(child.id, 3)
+            await repo.settle_clicks(child.id, 4)
+            # покупки и прочие начисления по-прежнему построчно
+            await BalanceRepository(db).change_balance(
+                child, -2, TransactionType.SHOP_PURCHASE, "Shop purchase"
+            )
+            await db.commit()
+
+        async with session_factory() as db:
+            txs = (
+                await db.scalars(
+                    select(BalanceTransaction)
+                    .where(BalanceTransaction.user_id == child.id)
+                    .order_by(BalanceTransaction.id)
+                )
+            ).all()
+
+        today = datetime.now(MOSCOW_TZ).date()
+        assert [
+            (tx.type, tx.delta, tx.entries_count, tx.period_date, tx.resulting_balance)
+            for tx in txs
+        ] == [
+            (TransactionType.GAME_CLICK, 7, 7, today, 7),
+            (TransactionType.SHOP_PURCHASE, -2, 1, None, 5),
+        ]
+        assert sum(tx.delta for tx in txs) == 5
+
+    async def test_itemised_mode_writes_row_per_settlement(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        child: User,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(settings, "ledger_aggregate_game_clicks", False)
+
+        async with session_factory() as db:
+            repo = GameRepository(db)
+            await repo.settle_clicks(child.id, 3)
+            await repo.settle_clicks(child.id, 4)
+            await db.commit()
+
+        async with session_factory() as db:
+            txs = (
+                await db.scalars(
+                    select(BalanceTransaction)
+                    .where(BalanceTransaction.user_id == child.id)
+                    .order_by(BalanceTransaction.id)
+                )
+            ).all()
+
+        assert [(tx.delta, tx.entries_count, tx.period_date) for tx in txs] == [
+            (3, 3, None),
+            (4, 4, None),
+        ]
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -8,29 +9,40 @@ from fastapi import FastAPI, WebSocketDisconnect, status
 from fastapi.testclient import TestClient
 
 from src.app.api.routes import game_router
-from src.app.api.deps import get_current_user
+from src.app.api.deps import get_current_identity
+from src.app.core.security import issue_session_token
 from src.app.db.session import get_db
 from src.app.models.user_models import User, UserRole
 from src.app.schemas.miniapp_schemas import GameClickResponse
+from src.app.services.identity_cache import UserIdentity
 
 
 class DummyDB:
     """Простейший объект вместо AsyncSession для зависимостей get_db."""
-    pass
+
+    async def commit(self) -> None:
+        pass
 
 
 @pytest.fixture
-def app() -> FastAPI:
+def app(monkeypatch: pytest.MonkeyPatch) -> FastAPI:
     app = FastAPI()
     app.include_router(game_router.router)
 
-    # подменяем get_db, чтобы не дергать настоящую БД
+    # подменяем get_db и короткие сессии сокета, чтобы не дергать настоящую БД
     dummy_db = DummyDB()
 
     def override_get_db() -> DummyDB:
         return dummy_db
 
+    @asynccontextmanager
+    async def dummy_session_scope(name: str) -> AsyncIterator[DummyDB]:
+        yield dummy_db
+
     app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(game_router, "session_scope", dummy_session_scope)
+    # сокет в тестах в основном подключается по старой схеме с X-Telegram-Id
+    monkeypatch.setattr(game_router.settings, "auth_allow_telegram_id_header", True)
     return app
 
 
@@ -47,8 +59,57 @@ class TestGameWebSocket:
         Если не передан X-Telegram-Id — соединение закрывается с 4401.
         """
         with pytest.raises(WebSocketDisconnect) as exc:
-            with client.websocket_connect("/api/game/ws") as ws:  # noqa: F841
-                pass
+            with client.websocket_connect("/api/game/ws") as ws:
+                ws.receive_json()
+
+        assert exc.value.code == 4401
+
+    def test_ws_rejects_when_connection_cap_reached(
+        self, client: TestClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """
+        Сверх game_ws_max_connections новый сокет закрывается с 1013.
+        """
+        monkeypatch.setattr(game_router.settings, "game_ws_max_connections", 0)
+
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect(
+                "/api/game/ws",
+                headers={"X-Telegram-Id": "123"},
+            ) as ws:
+                ws.receive_json()
+
+        assert exc.value.code == 1013
+        assert game_router._active_sockets == 0
+
+    def test_ws_accepts_session_token(self, client: TestClient) -> None:
+        """
+        С ?token=... пользователь определяется по подписи токена, без БД.
+        """
+        identity = UserIdentity(id=42, telegram_id=555, role=UserRole.CHILD)
+        token = issue_session_token(identity.to_claims())
+
+        with patch("src.app.api.routes.game_router.UserRepository") as MockUserRepo, patch(
+            "src.app.api.routes.game_router.click_buffer"
+        ) as mock_buffer:
+            mock_buffer.attach = AsyncMock()
+            mock_buffer.detach = AsyncMock()
+            mock_buffer.click_many = AsyncMock(
+                return_value=(1, GameClickResponse(new_bonus_balance=1, current_energy=9))
+            )
+
+            with client.websocket_connect(f"/api/game/ws?token={token}") as ws:
+                ws.send_json({"type": "click"})
+                data = ws.receive_json()
+
+        assert data["new_bonus_balance"] == 1
+        MockUserRepo.assert_not_called()
+        mock_buffer.attach.assert_awaited_once_with(identity)
+
+    def test_ws_rejects_bad_token(self, client: TestClient) -> None:
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect("/api/game/ws?token=bad.token") as ws:
+                ws.receive_json()
 
         assert exc.value.code == 4401
 
@@ -66,26 +127,26 @@ class TestGameWebSocket:
 
         with patch("src.app.api.routes.game_router.UserRepository") as MockUserRepo:
             user_repo_instance = MockUserRepo.return_value
-            user_repo_instance.get_by_telegram_id = AsyncMock(
+            user_repo_instance.get_or_create = AsyncMock(
                 return_value=non_child_user
             )
-            user_repo_instance.touch_app_activity = AsyncMock()
 
             with pytest.raises(WebSocketDisconnect) as exc:
                 with client.websocket_connect(
                     "/api/game/ws",
                     headers={"X-Telegram-Id": "123"},
-                ) as ws:  # noqa: F841
-                    pass
+                ) as ws:
+                    ws.receive_json()
 
         assert exc.value.code == 4403
 
     def test_ws_click_flow_for_child(self, client: TestClient) -> None:
         """
         Для ребёнка:
-        - соединение устанавливается,
-        - при сообщении {"type": "click"} вызывается _process_click,
-        - клиент получает event="click" с корректными данными.
+        - соединение регистрируется в буфере кликов,
+        - при сообщении {"type": "click"} клик засчитывается через буфер,
+        - клиент получает event="click" с корректными данными,
+        - при отключении буфер сбрасывается.
         """
         child_user = User(
             id=42,
@@ -97,20 +158,20 @@ class TestGameWebSocket:
 
         fake_response = GameClickResponse(
             new_bonus_balance=10,
-            game_progress=3,
+            current_energy=3,
         )
 
         with patch("src.app.api.routes.game_router.UserRepository") as MockUserRepo, patch(
-            "src.app.api.routes.game_router._process_click",
-            new_callable=AsyncMock,
-        ) as mock_process_click:
+            "src.app.api.routes.game_router.click_buffer"
+        ) as mock_buffer:
             user_repo_instance = MockUserRepo.return_value
-            user_repo_instance.get_by_telegram_id = AsyncMock(
+            user_repo_instance.get_or_create = AsyncMock(
                 return_value=child_user
             )
-            user_repo_instance.touch_app_activity = AsyncMock()
 
-            mock_process_click.return_value = fake_response
+            mock_buffer.attach = AsyncMock()
+            mock_buffer.detach = AsyncMock()
+            mock_buffer.click_many = AsyncMock(return_value=(1, fake_response))
 
             with client.websocket_connect(
                 "/api/game/ws",
@@ -121,14 +182,78 @@ class TestGameWebSocket:
 
         assert data["event"] == "click"
         assert data["new_bonus_balance"] == 10
-        assert data["game_progress"] == 3
+        assert data["current_energy"] == 3
 
-        assert mock_process_click.await_count == 1
-        args, kwargs = mock_process_click.call_args
-        # args[0] — db, args[1] — user
-        assert isinstance(args[1], User)
-        assert args[1].id == child_user.id
-        assert args[1].role == UserRole.CHILD
+        mock_buffer.attach.assert_awaited_once_with(UserIdentity.from_user(child_user))
+        mock_buffer.click_many.assert_awaited_once_with(child_user.id, 1)
+        mock_buffer.detach.assert_awaited_once_with(child_user.id)
+
+    def test_ws_batched_clicks_single_reply(self, client: TestClient) -> None:
+        """
+        Пакет {"type": "clicks", "count": N, "window_ms": T} засчитывается
+        одним вызовом буфера и получает один ответ event="clicks".
+        """
+        child_user = User(id=43, telegram_id=556, role=UserRole.CHILD)
+
+        with patch("src.app.api.routes.game_router.UserRepository") as MockUserRepo, patch(
+            "src.app.api.routes.game_router.click_buffer"
+        ) as mock_buffer:
+            user_repo_instance = MockUserRepo.return_value
+            user_repo_instance.get_or_create = AsyncMock(
+                return_value=child_user
+            )
+
+            mock_buffer.attach = AsyncMock()
+            mock_buffer.detach = AsyncMock()
+            mock_buffer.click_many = AsyncMock(
+                return_value=(
+                    10,
+                    GameClickResponse(new_bonus_balance=110, current_energy=890),
+                )
+            )
+
+            with client.websocket_connect(
+                "/api/game/ws",
+                headers={"X-Telegram-Id": "556"},
+            ) as ws:
+                ws.send_json({"type": "clicks", "count": 10, "window_ms": 1000})
+                data = ws.receive_json()
+
+        assert data == {
+            "event": "clicks",
+            "accepted": 10,
+            "new_bonus_balance": 110,
+            "current_energy": 890,
+        }
+        mock_buffer.click_many.assert_awaited_once_with(child_user.id, 10)
+
+    def test_ws_batched_clicks_rejects_implausible_rate(
+        self, client: TestClient
+    ) -> None:
+        child_user = User(id=44, telegram_id=557, role=UserRole.CHILD)
+
+        with patch("src.app.api.routes.game_router.UserRepository") as MockUserRepo, patch(
+            "src.app.api.routes.game_router.click_buffer"
+        ) as mock_buffer:
+            user_repo_instance = MockUserRepo.return_value
+            user_repo_instance.get_or_create = AsyncMock(
+                return_value=child_user
+            )
+
+            mock_buffer.attach = AsyncMock()
+            mock_buffer.detach = AsyncMock()
+            mock_buffer.click_many = AsyncMock()
+
+            with client.websocket_connect(
+                "/api/game/ws",
+                headers={"X-Telegram-Id": "557"},
+            ) as ws:
+                ws.send_json({"type": "clicks", "count": 500, "window_ms": 100})
+                data = ws.receive_json()
+
+        assert data["event"] == "error"
+        assert data["detail"] == "Implausible tap rate"
+        mock_buffer.click_many.assert_not_awaited()
 
     def test_ws_unsupported_message_type(self, client: TestClient) -> None:
         """
@@ -143,19 +268,16 @@ class TestGameWebSocket:
         )
 
         with patch("src.app.api.routes.game_router.UserRepository") as MockUserRepo, patch(
-            "src.app.api.routes.game_router._process_click",
-            new_callable=AsyncMock,
-        ) as mock_process_click:
+            "src.app.api.routes.game_router.click_buffer"
+        ) as mock_buffer:
             user_repo_instance = MockUserRepo.return_value
-            user_repo_instance.get_by_telegram_id = AsyncMock(
+            user_repo_instance.get_or_create = AsyncMock(
                 return_value=child_user
             )
-            user_repo_instance.touch_app_activity = AsyncMock()
 
-            mock_process_click.return_value = GameClickResponse(
-                new_bonus_balance=100,
-                game_progress=50,
-            )
+            mock_buffer.attach = AsyncMock()
+            mock_buffer.detach = AsyncMock()
+            mock_buffer.click_many = AsyncMock()
 
             with client.websocket_connect(
                 "/api/game/ws",
@@ -166,7 +288,7 @@ class TestGameWebSocket:
 
         assert data["event"] == "error"
         assert "Unsupported message type" in data["detail"]
-        mock_process_click.assert_not_awaited()
+        mock_buffer.click_many.assert_not_awaited()
 
 
 @pytest.mark.api
@@ -184,14 +306,14 @@ class TestGameHttpClick:
             role=UserRole.CHILD,
         )
 
-        async def override_get_current_user() -> User:
-            return child_user
+        async def override_get_current_identity() -> UserIdentity:
+            return UserIdentity.from_user(child_user)
 
-        app.dependency_overrides[get_current_user] = override_get_current_user
+        app.dependency_overrides[get_current_identity] = override_get_current_identity
 
         fake_response = GameClickResponse(
             new_bonus_balance=123,
-            game_progress=7,
+            current_energy=7,
         )
 
         with patch(
@@ -205,9 +327,9 @@ class TestGameHttpClick:
         assert resp.status_code == status.HTTP_200_OK
         data = resp.json()
         assert data["new_bonus_balance"] == 123
-        assert data["game_progress"] == 7
+        assert data["current_energy"] == 7
 
         mock_process_click.assert_awaited_once()
         args, kwargs = mock_process_click.call_args
-        assert isinstance(args[1], User)
+        assert isinstance(args[1], UserIdentity)
         assert args[1].id == child_user.id
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.requests import Request
+
+from src.app.api import deps
+from src.app.core.config import settings
+from src.app.models.user_models import User, UserRole
+from src.app.services.identity_cache import IdentityCache, UserIdentity, identity_cache
+
+
+
+@pytest.fixture(autouse=True)
+def _allow_telegram_id_header(monkeypatch: pytest.MonkeyPatch) -> None:
+    # здесь проверяется старая схема с X-Telegram-Id, по умолчанию выключенная
+    monkeypatch.setattr(settings, "auth_allow_telegram_id_header", True)
+
+def _identity(telegram_id: int, role: UserRole = UserRole.CHILD) -> UserIdentity:
+    return UserIdentity(id=telegram_id, telegram_id=telegram_id, role=role)
+
+
+@pytest.mark.unit
+class TestIdentityCache:
+    def test_entries_expire_after_ttl(self) -> None:
+        cache = IdentityCache(ttl_seconds=10, max_size=10)
+        cache.put(_identity(1))
+
+        with patch("src.app.services.identity_cache.time.monotonic") as monotonic:
+            monotonic.return_value = 10**9
+            assert cache.get(1) is None
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        cache = IdentityCache(ttl_seconds=60, max_size=2)
+        cache.put(_identity(1))
+        cache.put(_identity(2))
+        # 1 использовали недавно — вытесняется 2
+        assert cache.get(1) is not None
+        cache.put(_identity(3))
+
+        assert cache.get(1) is not None
+        assert cache.get(2) is None
+        assert cache.get(3) is not None
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestIdentityCacheWithDb:
+    async def test_cached_identity_resolved_without_db(self) -> None:
+        identity_cache.put(_identity(777))
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+        # db=None: при попадании в кэш сессия не используется вовсе
+        identity = await deps.get_current_identity(
+            request=request,
+            db=None,  # type: ignore[arg-type]
+            telegram_id=777,
+        )
+
+        assert identity == _identity(777)
+
+    async def test_role_change_invalidates_identity(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        async with session_factory() as db:
+            user = User(telegram_id=888, role=UserRole.PARENT)
+            db.add(user)
+            await db.commit()
+            identity_cache.put(UserIdentity.from_user(user))
+
+        async with session_factory() as db:
+            user = await db.scalar(select(User).where(User.telegram_id == 888))
+            user.role = UserRole.CHILD
+            await db.commit()
+
+        assert identity_cache.get(888) is None
+
+    async def test_unrelated_update_keeps_identity(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        async with session_factory() as db:
+            user = User(telegram_id=889, role=UserRole.PARENT)
+            db.add(user)
+            await db.commit()
+            identity_cache.put(UserIdentity.from_user(user))
+
+            user.first_name = "Иван"
+            await db.commit()
+
+        assert identity_cache.get(889) is not None
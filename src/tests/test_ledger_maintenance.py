@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.models.balance_models import (
+    BalanceTransaction,
+    BalanceTransactionArchive,
+    TransactionType,
+)
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.balance_repo import BalanceRepository
+from src.app.services.ledger_maintenance import (
+    DEFAULT_PARTITION,
+    LedgerMaintenance,
+    add_months,
+    month_bounds,
+)
+
+
+class RecordedResult(list):
+    """Пустой результат: строк нет, rowcount — «перенесено» 3 строки."""
+
+    rowcount = 3
+
+
+class RecordingPgSession:
+    """
+    Сессия «PostgreSQL» без сервера: записывает SQL и отвечает на проверки
+    существования таблиц и строк в секции по умолчанию.
+    """
+
+    def __init__(self, tables: set[str], stray_months: set[date]) -> None:
+        self.tables = tables
+        self.stray_starts = {month_bounds(month)[0] for month in stray_months}
+        self.statements: list[str] = []
+
+    def __call__(self) -> "RecordingPgSession":
+        return self
+
+    async def __aenter__(self) -> "RecordingPgSession":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        pass
+
+    def get_bind(self) -> Any:
+        return SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+    async def scalar(self, stmt: Any, params: dict[str, Any] | None = None) -> Any:
+        sql = str(stmt)
+        self.statements.append(sql)
+        if "to_regclass" in sql:
+            return params["name"] in self.tables
+        if "EXISTS" in sql:
+            return params["start"] in self.stray_starts
+        return None
+
+    async def execute(self, stmt: Any, params: dict[str, Any] | None = None) -> Any:
+        self.statements.append(str(stmt))
+        return RecordedResult()
+
+    async def commit(self) -> None:
+        pass
+
+    def ddl(self) -> list[str]:
+        return [
+            sql.split(" FOR VALUES")[0].split(" WHERE")[0]
+            for sql in self.statements
+            if sql.startswith(("ALTER", "CREATE", "WITH"))
+        ]
+
+
+@pytest.fixture
+async def parent(session_factory: async_sessionmaker[AsyncSession]) -> User:
+    async with session_factory() as db:
+        user = User(telegram_id=901, role=UserRole.PARENT)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    return user
+
+
+def _tx(user: User, delta: int, tx_type: TransactionType, at: datetime) -> BalanceTransaction:
+    return BalanceTransaction(
+        user_id=user.id,
+        delta=delta,
+        resulting_balance=0,
+        type=tx_type,
+        created_at=at,
+    )
+
+
+def test_add_months_wraps_year() -> None:
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 2, 1), -3) == date(2025, 11, 1)
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestArchiveClosedMonths:
+    async def test_old_months_move_to_archive(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        parent: User,
+    ) -> None:
+        async with session_factory() as db:
+            db.add_all(
+                [
+                    _tx(parent, 50, TransactionType.REFERRAL, datetime(2026, 1, 10, 12)),
+                    _tx(parent, 20, TransactionType.REFERRAL, datetime(2026, 1, 20, 12)),
+                    _tx(parent, -30, TransactionType.SHOP_PURCHASE, datetime(2026, 1, 21, 12)),
+                    _tx(parent, 5, TransactionType.REFERRAL, datetime(2026, 2, 15, 12)),
+                    _tx(parent, 7, TransactionType.REFERRAL, datetime(2026, 9, 15, 12)),
+                ]
+            )
+            await db.commit()
+            before = await BalanceRepository(db).get_credited_total(
+                parent.id, TransactionType.REFERRAL
+            )
+
+        maintenance = LedgerMaintenance(session_factory, retention_months=6)
+        archived = await maintenance.run_once(today=date(2026, 10, 17))
+
+        assert archived == [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)]
+        async with session_factory() as db:
+            live = (await db.scalars(select(BalanceTransaction))).all()
+            rows = (
+                await db.scalars(
+                    select(BalanceTransactionArchive).order_by(
+                        BalanceTransactionArchive.period_month,
+                        BalanceTransactionArchive.type,
+                    )
+                )
+            ).all()
+            after = await BalanceRepository(db).get_credited_total(
+                parent.id, TransactionType.REFERRAL
+            )
+
+        assert [tx.delta for tx in live] == [7]
+        assert [
+            (row.period_month, row.type, row.credit_sum, row.debit_sum, row.entries_count)
+            for row in rows
+        ] == [
+            (date(2026, 1, 1), TransactionType.REFERRAL, 70, 0, 2),
+            (date(2026, 1, 1), TransactionType.SHOP_PURCHASE, 0, -30, 1),
+            (date(2026, 2, 1), TransactionType.REFERRAL, 5, 0, 1),
+        ]
+        assert before == after == 82
+
+    async def test_rerun_adds_to_existing_archive_rows(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        parent: User,
+    ) -> None:
+        maintenance = LedgerMaintenance(session_factory, retention_months=6)
+        for delta in (10, 15):
+            async with session_factory() as db:
+                db.add(_tx(parent, delta, TransactionType.REFERRAL, datetime(2026, 1, 10, 12)))
+                await db.commit()
+            await maintenance.run_once(today=date(2026, 10, 17))
+
+        async with session_factory() as db:
+            row = await db.scalar(select(BalanceTransactionArchive))
+        assert (row.credit_sum, row.entries_count) == (25, 2)
+        assert await maintenance.run_once(today=date(2026, 10, 17)) == []
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestEnsurePartitions:
+    async def test_rows_in_default_move_into_late_partition(self) -> None:
+        session = RecordingPgSession(
+            tables={DEFAULT_PARTITION, "balance_transactions_p202612"},
+            stray_months={date(2026, 10, 1)},
+        )
+        await LedgerMaintenance(session, partitions_ahead=2).ensure_partitions(
+            date(2026, 10, 17)
+        )
+
+        assert session.ddl() == [
+            f"ALTER TABLE balance_transactions DETACH PARTITION {DEFAULT_PARTITION}",
+            "CREATE TABLE balance_transactions_p202610 "
+            "PARTITION OF balance_transactions",
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION}",
+            f"ALTER TABLE balance_transactions ATTACH PARTITION {DEFAULT_PARTITION} "
+            "DEFAULT",
+            # в ноябре строк в секции по умолчанию нет, декабрь уже есть
+            "CREATE TABLE balance_transactions_p202611 "
+            "PARTITION OF balance_transactions",
+        ]
+
+    async def test_missing_default_partition_is_not_queried(self) -> None:
+        session = RecordingPgSession(tables=set(), stray_months=set())
+        maintenance = LedgerMaintenance(session, retention_months=6)
+
+        assert await maintenance.archive_closed_months(date(2026, 10, 17)) == []
+        assert not any("min(created_at)" in sql for sql in session.statements)
+        assert not any("EXISTS" in sql for sql in session.statements)
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestArchiveLock:
+    async def test_archive_takes_the_lock_before_reading(self) -> None:
+        partition = "balance_transactions_p202601"
+        session = RecordingPgSession(tables={partition}, stray_months=set())
+        await LedgerMaintenance(session).archive_month(date(2026, 1, 1), partition)
+
+        assert session.statements[0].startswith("SELECT pg_advisory_xact_lock")
+        assert f"DROP TABLE {partition}" in session.statements
+
+    async def test_archive_skips_partition_dropped_by_another_process(self) -> None:
+        session = RecordingPgSession(tables=set(), stray_months=set())
+        await LedgerMaintenance(session).archive_month(
+            date(2026, 1, 1), "balance_transactions_p202601"
+        )
+
+        assert session.ddl() == []
+        assert not any("INSERT" in sql for sql in session.statements)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import AsyncGenerator
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.api import deps
+from src.app.api.routes import admin_router
+from src.app.core.constants import LEDGER_RECONCILE_LOCK_KEY
+from src.app.db.session import get_db
+from src.app.models.balance_models import Balance, LedgerCheckpoint, TransactionType
+from src.app.models.user_models import User, UserRole
+from src.app.repositories.balance_repo import BalanceRepository
+from src.app.repositories.game_repo import GameRepository
+from src.app.services.identity_cache import UserIdentity
+from src.app.services import ledger_reconciler
+from src.app.services.ledger_reconciler import LedgerReconciler
+
+
+def _later() -> datetime:
+    # сверка «через час»: все проводки уже устоялись
+    return datetime.now(timezone.utc) + timedelta(hours=1)
+
+
+@pytest.fixture
+async def users(session_factory: async_sessionmaker[AsyncSession]) -> list[User]:
+    async with session_factory() as db:
+        users = [User(telegram_id=1000 + i, role=UserRole.CHILD) for i in range(3)]
+        db.add_all(users)
+        await db.commit()
+        for user in users:
+            await db.refresh(user)
+    return users
+
+
+async def _accrue(
+    session_factory: async_sessionmaker[AsyncSession], user: User, delta: int
+) -> None:
+    async with session_factory() as db:
+        await BalanceRepository(db).change_balance(user, delta, TransactionType.OTHER)
+        await db.commit()
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestLedgerReconciler:
+    async def test_clean_ledger_creates_checkpoints_and_reads_only_new_rows(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        users: list[User],
+    ) -> None:
+        for user in users:
+            await _accrue(session_factory, user, 10)
+            await _accrue(session_factory, user, -3)
+
+        reconciler = LedgerReconciler(session_factory, chunk_size=2)
+        report = await reconciler.run(now=_later())
+        assert (report.users_checked, report.rows_checked) == (3, 6)
+        assert report.drifted_users == 0
+
+        async with session_factory() as db:
+            checkpoints = (await db.scalars(select(LedgerCheckpoint))).all()
+        assert sorted(cp.ledger_sum for cp in checkpoints) == [7, 7, 7]
+
+        await _accrue(session_factory, users[0], 5)
+        report = await reconciler.run(now=_later())
+        assert (report.users_checked, report.rows_checked) == (3, 1)
+        assert report.drifted_users == 0
+
+    async def test_drift_is_reported_and_repaired(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        users: list[User],
+    ) -> None:
+        await _accrue(session_factory, users[0], 10)
+        reconciler = LedgerReconciler(session_factory)
+        await reconciler.run(now=_later())
+
+        # баланс изменён мимо журнала
+        async with session_factory() as db:
+            await db.execute(
+                update(Balance)
+                .where(Balance.user_id == users[0].id)
+                .values(amount=Balance.amount + 4)
+            )
+            await db.commit()
+
+        report = await reconciler.run(now=_later())
+        assert report.drifted_users == 1
+        assert [(d.user_id, d.drift) for d in report.drifts] == [(users[0].id, 4)]
+
+        report = await reconciler.run(repair=True, now=_later())
+        assert report.drift_abs_total == 4
+        async with session_factory() as db:
+            assert await BalanceRepository(db).get_balance(users[0]) == 10
+
+        report = await reconciler.run(now=_later())
+        assert report.drifted_users == 0
+
+    async def test_open_click_rollup_stays_out_of_checkpoint(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        users: list[User],
+    ) -> None:
+        child = users[0]
+        await _accrue(session_factory, child, 10)
+        async with session_factory() as db:
+            await GameRepository(db).settle_clicks(child.id, 3)
+            await db.commit()
+
+        reconciler = LedgerReconciler(session_factory)
+        assert (await reconciler.run(now=_later())).drifted_users == 0
+        async with session_factory() as db:
+            checkpoint = await db.get(LedgerCheckpoint, child.id)
+        assert checkpoint.ledger_sum == 10
+
+        # строка кликов за сегодня растёт на месте — расхождения нет
+        async with session_factory() as db:
+            await GameRepository(db).settle_clicks(child.id, 2)
+            await db.commit()
+        report = await reconciler.run(now=_later())
+        assert report.drifted_users == 0
+
+    async def test_every_chunk_is_read_under_the_advisory_lock(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        users: list[User],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        for user in users:
+            await _accrue(session_factory, user, 10)
+        locks: list[int] = []
+
+        async def record_lock(db: AsyncSession, key: int) -> None:
+            # первым запросом транзакции: до него сессия ещё ничего не читала
+            assert not db.in_transaction()
+            locks.append(key)
+
+        monkeypatch.setattr(ledger_reconciler, "advisory_xact_lock", record_lock)
+        await LedgerReconciler(session_factory, chunk_size=2).run(
+            repair=True, now=_later()
+        )
+        # пачки из двух и одного пользователя и пустая последняя
+        assert locks == [LEDGER_RECONCILE_LOCK_KEY] * 3
+
+
+@pytest.fixture
+async def admin_client(
+    session_factory: async_sessionmaker[AsyncSession],
+    monkeypatch: pytest.MonkeyPatch,
+) -> AsyncGenerator[tuple[FastAPI, AsyncClient], None]:
+    monkeypatch.setattr(
+        admin_router, "ledger_reconciler", LedgerReconciler(session_factory)
+    )
+    async with session_factory() as db:
+        db.add_all(
+            [
+                User(id=1, telegram_id=1, role=UserRole.ADMIN),
+                User(id=2, telegram_id=2, role=UserRole.PARENT),
+            ]
+        )
+        await db.commit()
+
+    async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(admin_router.router)
+    app.dependency_overrides[get_db] = override_get_db
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield app, client
+
+
+@pytest.mark.anyio
+@pytest.mark.api
+class TestReconciliationEndpoints:
+    async def test_requires_admin(
+        self, admin_client: tuple[FastAPI, AsyncClient]
+    ) -> None:
+        app, client = admin_client
+        # роль в токене не в счёт — смотрим в БД
+        app.dependency_overrides[deps.get_verified_identity] = lambda: UserIdentity(
+            id=2, telegram_id=2, role=UserRole.ADMIN
+        )
+        response = await client.post("/api/admin/ledger/reconciliation")
+        assert response.status_code == 403
+
+    async def test_admin_runs_and_reads_report(
+        self, admin_client: tuple[FastAPI, AsyncClient]
+    ) -> None:
+        app, client = admin_client
+        app.dependency_overrides[deps.get_verified_identity] = lambda: UserIdentity(
+            id=1, telegram_id=1, role=UserRole.ADMIN
+        )
+        assert (await client.get("/api/admin/ledger/reconciliation")).status_code == 404
+
+        response = await client.post("/api/admin/ledger/reconciliation")
+        assert response.status_code == 200
+        assert response.json()["drifted_users"] == 0
+
+        response = await client.get("/api/admin/ledger/reconciliation")
+        assert response.status_code == 200
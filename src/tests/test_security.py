@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import time
+from typing import AsyncGenerator
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import FastAPI, HTTPException, status
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.requests import Request
+
+from src.app.api import deps
+from src.app.api.routes import auth_router
+from src.app.core.config import Settings, settings
+from src.app.core.security import (
+    SESSION_SECRET_MIN_BYTES,
+    InvalidInitDataError,
+    InvalidSessionTokenError,
+    SessionSecretError,
+    check_session_secret,
+    decode_session_token,
+    issue_session_token,
+    verify_init_data,
+)
+from src.app.db.session import get_db
+from src.app.models.user_models import UserRole
+from src.app.services.identity_cache import UserIdentity
+
+BOT_TOKEN = "123456:TESTTOKEN"
+
+
+def make_init_data(
+    telegram_id: int = 4242,
+    auth_date: int | None = None,
+    bot_token: str = BOT_TOKEN,
+) -> str:
+    fields = {
+        "auth_date": str(auth_date or int(time.time())),
+        "query_id": "AAH",
+        "user": json.dumps({"id": telegram_id, "first_name": "Маша"}),
+    }
+    data_check_string = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(
+        secret_key, data_check_string.encode(), hashlib.sha256
+    ).hexdigest()
+    return urlencode(fields)
+
+
+def make_request(headers: dict[str, str]) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+@pytest.mark.unit
+class TestInitData:
+    def test_valid_init_data(self) -> None:
+        data = verify_init_data(make_init_data(), bot_token=BOT_TOKEN)
+        assert data["user"]["id"] == 4242
+
+    def test_wrong_bot_token_rejected(self) -> None:
+        with pytest.raises(InvalidInitDataError):
+            verify_init_data(
+                make_init_data(bot_token="other:token"), bot_token=BOT_TOKEN
+            )
+
+    def test_expired_init_data_rejected(self) -> None:
+        with pytest.raises(InvalidInitDataError):
+            verify_init_data(
+                make_init_data(auth_date=int(time.time()) - 3600),
+                bot_token=BOT_TOKEN,
+                max_age_seconds=60,
+            )
+
+
+@pytest.mark.unit
+class TestSessionToken:
+    def test_round_trip(self) -> None:
+        identity = UserIdentity(id=1, telegram_id=2, role=UserRole.CHILD, parent_id=3)
+        token = issue_session_token(identity.to_claims())
+
+        assert UserIdentity.from_claims(decode_session_token(token)) == identity
+
+    def test_tampered_token_rejected(self) -> None:
+        token = issue_session_token({"uid": 1, "tg": 2, "role": "child"})
+        signature = token.split(".")[1]
+        forged = issue_session_token({"uid": 1, "tg": 2, "role": "admin"}).split(".")[0]
+
+        with pytest.raises(InvalidSessionTokenError):
+            decode_session_token(f"{forged}.{signature}")
+
+    def test_expired_token_rejected(self) -> None:
+        token = issue_session_token({"uid": 1, "tg": 2, "role": "child"}, ttl_seconds=-1)
+        with pytest.raises(InvalidSessionTokenError):
+            decode_session_token(token)
+
+    def test_short_or_missing_secret_refused(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        token = issue_session_token({"uid": 1, "tg": 2, "role": "admin"})
+        for secret in ("", "x" * (SESSION_SECRET_MIN_BYTES - 1)):
+            monkeypatch.setattr(settings, "session_secret", secret)
+            with pytest.raises(SessionSecretError):
+                check_session_secret()
+            with pytest.raises(SessionSecretError):
+                issue_session_token({"uid": 1, "tg": 2, "role": "admin"})
+            with pytest.raises(SessionSecretError):
+                decode_session_token(token)
+
+    def test_secret_read_from_prefixed_env(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("CAMPBOT_SESSION_SECRET", "s" * SESSION_SECRET_MIN_BYTES)
+        monkeypatch.setenv("CAMPBOT_TELEGRAM_BOT_TOKEN", "42:ENV")
+        monkeypatch.delenv("SESSION_SECRET", raising=False)
+
+        loaded = Settings()
+        assert loaded.session_secret == "s" * SESSION_SECRET_MIN_BYTES
+        assert loaded.telegram_bot_token == "42:ENV"
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestSessionAuth:
+    async def test_bearer_token_resolves_identity_without_db(self) -> None:
+        identity = UserIdentity(id=5, telegram_id=55, role=UserRole.CHILD)
+        token = issue_session_token(identity.to_claims())
+
+        resolved = await deps.get_current_identity(
+            request=make_request({"Authorization": f"Bearer {token}"}),
+            db=None,  # type: ignore[arg-type]
+            telegram_id=None,
+        )
+
+        assert resolved == identity
+
+    async def test_legacy_header_can_be_disabled(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(settings, "auth_allow_telegram_id_header", False)
+
+        with pytest.raises(HTTPException) as exc:
+            await deps.get_current_identity(
+                request=make_request({"X-Telegram-Id": "55"}),
+                db=None,  # type: ignore[arg-type]
+                telegram_id=55,
+            )
+
+        assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_admin_never_accepts_legacy_header(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(settings, "auth_allow_telegram_id_header", True)
+
+        with pytest.raises(HTTPException) as exc:
+            await deps.get_verified_identity(
+                request=make_request({"X-Telegram-Id": "55"}),
+                db=None,  # type: ignore[arg-type]
+            )
+
+        assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.fixture
+async def auth_client(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> AsyncGenerator[AsyncClient, None]:
+    app = FastAPI()
+    app.include_router(auth_router.router)
+
+    async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+@pytest.mark.anyio
+@pytest.mark.api
+class TestSessionEndpoint:
+    async def test_init_data_exchanged_for_token(
+        self, auth_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(settings, "telegram_bot_token", BOT_TOKEN)
+
+        resp = await auth_client.post(
+            "/api/auth/session", json={"init_data": make_init_data(telegram_id=4242)}
+        )
+
+        assert resp.status_code == status.HTTP_200_OK
+        data = resp.json()
+        claims = decode_session_token(data["token"])
+        assert claims["tg"] == 4242
+        assert claims["uid"] == data["user_id"]
+        assert data["role"] == UserRole.PARENT.value
+
+    async def test_bad_init_data_rejected(
+        self, auth_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(settings, "telegram_bot_token", BOT_TOKEN)
+
+        resp = await auth_client.post(
+            "/api/auth/session",
+            json={"init_data": make_init_data(bot_token="other:token")},
+        )
+
+        assert resp.status_code == status.HTTP_401_UNAUTHORIZED
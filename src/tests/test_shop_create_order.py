@@ -19,6 +19,7 @@ from fastapi import HTTPException, status
 from unittest.mock import AsyncMock, patch
 
 from src.app.api.routes import shop_router
+from src.app.models.amocrm_models import AmoOutbox
 from src.app.models.balance_models import TransactionType
 from src.app.models.shop_models import Order, Product
 from src.app.models.user_models import User
@@ -74,6 +75,10 @@ class FakeSession:
         self.committed = True
 
 
+def outbox_entries(db: FakeSession) -> list[AmoOutbox]:
+    return [obj for obj in db.added if isinstance(obj, AmoOutbox)]
+
+
 def make_user() -> User:
     return User(
         id=1,
@@ -104,22 +109,25 @@ class TestCreateOrderFlow:
         db = FakeSession(products=[product])
         user = make_user()
 
-        with patch("src.app.api.routes.shop_router.BalanceRepository") as MockBalanceRepo:
+        with patch(
+            "src.app.api.routes.shop_router.BalanceRepository"
+        ) as MockBalanceRepo, patch.object(
+            shop_router.amocrm_outbox_dispatcher, "notify"
+        ) as notify:
             balance_instance = MockBalanceRepo.return_value
             balance_instance.change_balance = AsyncMock()
 
-            amocrm_service = AsyncMock()
-
             payload = CreateOrderRequest(
-                items=[OrderItemRequest(item_id=1, quantity=1)],
+                items=[OrderItemRequest(item=1, quantity=1)],
                 pay_with_bonus=False,
+                price=100_000,
+                bonuses=0,
             )
 
             response: OrderResponse = await shop_router.create_order(
                 payload=payload,
                 db=db,  # type: ignore[arg-type]
                 user=user,
-                amocrm_service=amocrm_service,
             )
 
         # Ответ
@@ -134,12 +142,15 @@ class TestCreateOrderFlow:
         assert kwargs["tx_type"] == TransactionType.SHOP_PURCHASE
         assert kwargs["delta"] == 5_000  # 5% от 100 000
 
-        # Заказ ушёл в AmoCRM
-        amocrm_service.send_order_to_amocrm.assert_awaited_once()
-        order_arg = amocrm_service.send_order_to_amocrm.await_args_list[0].args[0]
-        assert isinstance(order_arg, Order)
+        # Заказ поставлен в очередь на отправку в AmoCRM
+        [entry] = outbox_entries(db)
+        assert entry.order_id == 1
+        order_arg = next(obj for obj in db.added if isinstance(obj, Order))
         assert order_arg.total_money == pytest.approx(100_000.0)
         assert order_arg.total_bonus == 0
+        assert db.committed
+        # диспетчер outbox будится сразу после коммита
+        notify.assert_called_once_with()
 
     async def test_bonus_only_payment_merch(self) -> None:
         """
@@ -161,18 +172,17 @@ class TestCreateOrderFlow:
             balance_instance = MockBalanceRepo.return_value
             balance_instance.change_balance = AsyncMock()
 
-            amocrm_service = AsyncMock()
-
             payload = CreateOrderRequest(
-                items=[OrderItemRequest(item_id=2, quantity=1)],
+                items=[OrderItemRequest(item=2, quantity=1)],
                 pay_with_bonus=True,
+                price=0,
+                bonuses=3_000,
             )
 
             response: OrderResponse = await shop_router.create_order(
                 payload=payload,
                 db=db,  # type: ignore[arg-type]
                 user=user,
-                amocrm_service=amocrm_service,
             )
 
         # Полная стоимость оплачена бонусами, в деньгах 0
@@ -184,7 +194,7 @@ class TestCreateOrderFlow:
         kwargs = balance_instance.change_balance.await_args_list[0].kwargs
         assert kwargs["delta"] == -3_000
 
-        amocrm_service.send_order_to_amocrm.assert_awaited_once()
+        assert len(outbox_entries(db)) == 1
 
     async def test_mixed_payment_money_and_bonuses(self) -> None:
         """
@@ -207,18 +217,17 @@ class TestCreateOrderFlow:
             balance_instance = MockBalanceRepo.return_value
             balance_instance.change_balance = AsyncMock()
 
-            amocrm_service = AsyncMock()
-
             payload = CreateOrderRequest(
-                items=[OrderItemRequest(item_id=3, quantity=1)],
+                items=[OrderItemRequest(item=3, quantity=1)],
                 pay_with_bonus=True,
+                price=95_000,
+                bonuses=5_000,
             )
 
             response: OrderResponse = await shop_router.create_order(
                 payload=payload,
                 db=db,  # type: ignore[arg-type]
                 user=user,
-                amocrm_service=amocrm_service,
             )
 
         # 5% списали бонусами, остальное деньгами
@@ -231,7 +240,7 @@ class TestCreateOrderFlow:
         assert -5_000 in deltas
         assert 5_000 in deltas
 
-        amocrm_service.send_order_to_amocrm.assert_awaited_once()
+        assert len(outbox_entries(db)) == 1
 
     async def test_not_enough_bonuses_raises_http_error(self) -> None:
         """
@@ -256,11 +265,11 @@ class TestCreateOrderFlow:
 
             balance_instance.change_balance = AsyncMock(side_effect=_change_balance)
 
-            amocrm_service = AsyncMock()
-
             payload = CreateOrderRequest(
-                items=[OrderItemRequest(item_id=4, quantity=1)],
+                items=[OrderItemRequest(item=4, quantity=1)],
                 pay_with_bonus=True,
+                price=0,
+                bonuses=3_000,
             )
 
             with pytest.raises(HTTPException) as exc:
@@ -268,7 +277,6 @@ class TestCreateOrderFlow:
                     payload=payload,
                     db=db,  # type: ignore[arg-type]
                     user=user,
-                    amocrm_service=amocrm_service,
                 )
 
         error = exc.value
@@ -276,7 +284,7 @@ class TestCreateOrderFlow:
         assert "Not enough bonus balance" in error.detail
 
         # В AmoCRM заказ в этом случае не должен уходить
-        amocrm_service.send_order_to_amocrm.assert_not_awaited()
+        assert outbox_entries(db) == []
 
     async def test_more_than_one_item_not_allowed(self) -> None:
         """
@@ -303,14 +311,14 @@ class TestCreateOrderFlow:
             balance_instance = MockBalanceRepo.return_value
             balance_instance.change_balance = AsyncMock()
 
-            amocrm_service = AsyncMock()
-
             payload = CreateOrderRequest(
                 items=[
-                    OrderItemRequest(item_id=10, quantity=1),
-                    OrderItemRequest(item_id=11, quantity=1),
+                    OrderItemRequest(item=10, quantity=1),
+                    OrderItemRequest(item=11, quantity=1),
                 ],
                 pay_with_bonus=False,
+                price=100_000,
+                bonuses=0,
             )
 
             with pytest.raises(HTTPException) as exc:
@@ -318,7 +326,6 @@ class TestCreateOrderFlow:
                     payload=payload,
                     db=db,  # type: ignore[arg-type]
                     user=user,
-                    amocrm_service=amocrm_service,
                 )
 
         error = exc.value
@@ -326,5 +333,5 @@ class TestCreateOrderFlow:
         assert "одним товаром" in str(error.detail)
 
         balance_instance.change_balance.assert_not_awaited()
-        amocrm_service.send_order_to_amocrm.assert_not_awaited()
+        assert outbox_entries(db) == []
 
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+from aiogram.types import User as TgUser
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.app.services import telegram_user_service
+from src.app.services.telegram_user_service import TelegramUserService
+
+
+def tg_user(**fields) -> TgUser:
+    profile = {"id": 3100, "is_bot": False, "first_name": "Маша", "last_name": "Иванова"}
+    profile.update(fields)
+    return TgUser(**profile)
+
+
+async def rows_changed(db: AsyncSession) -> int:
+    # SQLite: сколько строк изменил последний INSERT/UPDATE на этом соединении
+    return await db.scalar(text("SELECT changes()"))
+
+
+@pytest.fixture(autouse=True)
+def _no_activity_tracker():
+    with patch.object(telegram_user_service, "activity_tracker"):
+        yield
+
+
+@pytest.mark.anyio
+@pytest.mark.unit
+class TestGetOrCreateFromTelegram:
+    async def test_unchanged_profile_does_not_rewrite_row(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        async with session_factory() as db:
+            service = TelegramUserService(db)
+            created = await service.get_or_create_from_telegram(tg_user(username="masha"))
+            assert await rows_changed(db) == 1
+
+            again = await service.get_or_create_from_telegram(tg_user(username="masha"))
+            assert await rows_changed(db) == 0
+            assert again.id == created.id
+            assert again.username == "masha"
+
+    async def test_cleared_profile_fields_are_cleared(
+        self, session_factory: async_sessionmaker[AsyncSession]
+    ) -> None:
+        async with session_factory() as db:
+            service = TelegramUserService(db)
+            await service.get_or_create_from_telegram(tg_user(username="masha"))
+            await db.commit()
+
+            user = await service.get_or_create_from_telegram(
+                tg_user(username=None, last_name=None)
+            )
+            assert await rows_changed(db) == 1
+            assert (user.username, user.last_name) == (None, None)
+            assert user.full_name == "Маша"